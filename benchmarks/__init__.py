@@ -0,0 +1,4 @@
+"""Offline load tests for the invite handlers.
+
+Run ``python -m benchmarks --help`` from the repository root.
+"""
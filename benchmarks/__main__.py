@@ -0,0 +1,125 @@
+"""Command line entry point: run scenarios or compare two result files.
+
+    python -m benchmarks                      # every scenario, JSON on stdout
+    python -m benchmarks raid -o raid.json    # one scenario
+    python -m benchmarks --compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import REPO_ROOT, Harness, quiet_logging, version_info
+from benchmarks.scenarios import SCENARIOS
+
+def run_scenario(name: str, args) -> Dict:
+    scenario, guilds = SCENARIOS[name]
+    harness = Harness(
+        guild_count=max(1, int(guilds * args.scale)),
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        rate_limit=args.rate_limit,
+        seed=args.seed
+    )
+
+    async def main():
+        try:
+            params = await scenario(harness, scale=args.scale)
+            return {"scenario": name, "params": params, **harness.results()}
+        finally:
+            harness.close()
+
+    return asyncio.run(main())
+
+def run_isolated(name: str, args) -> Dict:
+    """Run one scenario in a fresh interpreter so module state and memory start clean"""
+    command = [sys.executable, "-m", "benchmarks", name, "--output", "-", "--scale", str(args.scale),
+               "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+               "--rate-limit", str(args.rate_limit), "--seed", str(args.seed)]
+    completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"scenario": name, "error": completed.stderr.strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(completed.stdout)["results"][0]
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """Print p50/p99, REST calls per event and blocking per scenario; 1 if anything regressed"""
+    with open(old_path, encoding='utf-8') as f:
+        old = {result["scenario"]: result for result in json.load(f)["results"]}
+    with open(new_path, encoding='utf-8') as f:
+        new = {result["scenario"]: result for result in json.load(f)["results"]}
+
+    regressed = False
+
+    def row(label: str, before, after):
+        nonlocal regressed
+        if before is None or after is None:
+            return
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag, regressed = "  ⚠️ regression", True
+        print(f"  {label:<32} {before:>10.2f} -> {after:>10.2f} ({change:+.1f}%){flag}")
+
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name], new[name]
+        print(f"{name}")
+        for handler in sorted(set(before.get("handlers", {})) & set(after.get("handlers", {}))):
+            for key in ("p50_ms", "p99_ms"):
+                row(f"{handler} {key}", before["handlers"][handler][key], after["handlers"][handler][key])
+        row("rest calls per event", before.get("rest", {}).get("per_event"), after.get("rest", {}).get("per_event"))
+        row("loop blocked ms", before.get("loop", {}).get("blocked_ms"), after.get("loop", {}).get("blocked_ms"))
+        row("peak memory kb", before.get("memory", {}).get("peak_kb"), after.get("memory", {}).get("peak_kb"))
+    return 1 if regressed else 0
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Offline invite handler benchmarks")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"scenarios to run (default: all of {', '.join(sorted(SCENARIOS))})")
+    parser.add_argument("-o", "--output", default="-", help="result file (default: stdout)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply event and guild counts")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean simulated REST latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="uniform jitter around the latency")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of REST calls answered with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=25.0, help="percent change flagged by --compare")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    quiet_logging()
+    names = args.scenarios or sorted(SCENARIOS)
+    started = time.time()
+    if len(names) == 1:
+        results = [run_scenario(names[0], args)]
+    else:
+        results = [run_isolated(name, args) for name in names]
+
+    document = {
+        "version": version_info(),
+        "created_at": int(started),
+        "settings": {"scale": args.scale, "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                     "rate_limit": args.rate_limit, "seed": args.seed},
+        "results": results,
+    }
+    payload = json.dumps(document, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload + "\n")
+    return 0 if all("error" not in result for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
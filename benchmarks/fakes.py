@@ -0,0 +1,257 @@
+"""In-process stand-ins for the Discord objects the invite handlers touch.
+
+Every REST call (``guild.invites()``, ``bot.fetch_user``, ``member.add_roles``,
+``member.edit``, ``channel.send``) goes through one FakeRest, which adds
+latency, counts calls per route and can answer with 429s.
+"""
+import asyncio
+import itertools
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import discord
+
+class FakeRateLimit(discord.HTTPException):
+    """A 429 answer with the attributes the dispatcher reads"""
+
+    def __init__(self, retry_after: float):
+        Exception.__init__(self, f"429 Too Many Requests (retry after {retry_after:.2f}s)")
+        self.status = 429
+        self.code = 0
+        self.text = "You are being rate limited."
+        self.retry_after = retry_after
+        self.response = None
+
+class FakeRest:
+    """Simulated REST layer with latency, call counting and 429 injection"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, rate_limit: float = 0.0,
+                 retry_after: float = 0.5, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    async def call(self, route: str, result=None):
+        self.calls[route] += 1
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if self.rate_limit and self.random.random() < self.rate_limit:
+            self.rate_limited[route] += 1
+            raise FakeRateLimit(self.retry_after)
+        return result
+
+_ids = itertools.count(10 ** 17)
+
+def next_id() -> int:
+    return next(_ids)
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str, bot: bool = False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+        self.display_avatar = SimpleNamespace(url=f"https://cdn.example/avatars/{user_id}.png")
+        self.avatar_url = self.display_avatar.url
+
+class FakeRole:
+    def __init__(self, guild: "FakeGuild", role_id: int, name: str, default: bool = False):
+        self.guild = guild
+        self.id = role_id
+        self.name = name
+        self._default = default
+
+    def is_default(self) -> bool:
+        return self._default
+
+    @property
+    def members(self) -> List["FakeMember"]:
+        return [member for member in self.guild.members.values() if self in member.roles]
+
+class FakeMember(FakeUser):
+    def __init__(self, guild: "FakeGuild", user_id: int, name: str, joined_at: Optional[datetime] = None):
+        super().__init__(user_id, name)
+        self.guild = guild
+        self.joined_at = joined_at or datetime.now(timezone.utc)
+        self.roles: List[FakeRole] = [guild.default_role]
+
+    async def add_roles(self, *roles, reason: Optional[str] = None):
+        await self.guild.rest.call("add_roles")
+        for role in roles:
+            if role not in self.roles:
+                self.roles.append(role)
+
+    async def edit(self, roles=None, reason: Optional[str] = None):
+        await self.guild.rest.call("member_edit")
+        if roles is not None:
+            self.roles = [self.guild.default_role] + [role for role in roles if not role.is_default()]
+
+class FakeInvite:
+    def __init__(self, guild: "FakeGuild", code: str, inviter: Optional[FakeUser], uses: int = 0,
+                 max_uses: int = 0, max_age: int = 0):
+        self.guild = guild
+        self.code = code
+        self.inviter = inviter
+        self.uses = uses
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.temporary = False
+        self.created_at = datetime.now(timezone.utc) - timedelta(days=1)
+        self.expires_at = self.created_at + timedelta(seconds=max_age) if max_age else None
+
+class FakeChannel:
+    def __init__(self, rest: FakeRest, channel_id: int, name: str = "welcome"):
+        self.rest = rest
+        self.id = channel_id
+        self.name = name
+        self.sent: int = 0
+
+    async def send(self, content=None, embed=None, file=None):
+        await self.rest.call("channel_send")
+        self.sent += 1
+
+class FakeGuild:
+    """A guild with members, roles and invites, plus helpers to simulate traffic"""
+
+    def __init__(self, rest: FakeRest, guild_id: Optional[int] = None, name: str = "bench"):
+        self.rest = rest
+        self.id = guild_id or next_id()
+        self.name = name
+        self.filesize_limit = 25 * 1024 * 1024
+        self.members: Dict[int, FakeMember] = {}
+        self.roles: Dict[int, FakeRole] = {}
+        self._invites: Dict[str, FakeInvite] = {}
+        self.default_role = FakeRole(self, self.id, "@everyone", default=True)
+        self.roles[self.id] = self.default_role
+
+    @property
+    def member_count(self) -> int:
+        return len(self.members)
+
+    def get_member(self, user_id: int) -> Optional[FakeMember]:
+        return self.members.get(user_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self.roles.get(role_id)
+
+    async def invites(self) -> List[FakeInvite]:
+        # Copies, like fresh API objects: later uses do not leak into old lists
+        snapshot = [FakeInvite(self, invite.code, invite.inviter, invite.uses, invite.max_uses, invite.max_age)
+                    for invite in self._invites.values()]
+        return await self.rest.call("guild_invites", snapshot)
+
+    async def fetch_members(self, limit=None, after=None):
+        after_id = after.id if after is not None else 0
+        for member_id in sorted(self.members):
+            if member_id > after_id:
+                yield self.members[member_id]
+
+    # === Simulation helpers ===
+
+    def add_role(self, name: str) -> FakeRole:
+        role = FakeRole(self, next_id(), name)
+        self.roles[role.id] = role
+        return role
+
+    def add_member(self, name: Optional[str] = None, joined_at: Optional[datetime] = None) -> FakeMember:
+        user_id = next_id()
+        member = FakeMember(self, user_id, name or f"user{user_id % 100000}", joined_at)
+        self.members[user_id] = member
+        return member
+
+    def add_invite(self, inviter: Optional[FakeUser], uses: int = 0) -> FakeInvite:
+        invite = FakeInvite(self, f"c{next_id() % 10 ** 8:08d}", inviter, uses)
+        self._invites[invite.code] = invite
+        return invite
+
+    def invite_list(self) -> List[FakeInvite]:
+        return list(self._invites.values())
+
+    def use_invite(self, invite: FakeInvite) -> FakeMember:
+        """A member joins through ``invite``: count the use and cache the member"""
+        invite.uses += 1
+        return self.add_member()
+
+    def remove_member(self, member: FakeMember):
+        self.members.pop(member.id, None)
+
+class FakeCommand:
+    def __init__(self, callback, name: str):
+        self.callback = callback
+        self.name = name
+        self.on_error = None
+
+    def error(self, handler):
+        self.on_error = handler
+        return handler
+
+class FakeBot:
+    """Collects the events and commands registered by setup_invite_logger"""
+
+    def __init__(self, rest: FakeRest, guilds: List[FakeGuild], channel: FakeChannel):
+        self.rest = rest
+        self.guilds = guilds
+        self.channel = channel
+        self.user = FakeUser(next_id(), "InviteBot", bot=True)
+        self.events: Dict[str, object] = {}
+        self.commands: Dict[str, FakeCommand] = {}
+        self.users: List[FakeUser] = []
+        self._guilds = {guild.id: guild for guild in guilds}
+        self._users: Dict[int, FakeUser] = {}
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+
+    def event(self, handler):
+        self.events[handler.__name__] = handler
+        return handler
+
+    def command(self, name: Optional[str] = None, aliases=None, **kwargs):
+        def decorator(callback):
+            command = FakeCommand(callback, name or callback.__name__)
+            self.commands[command.name] = command
+            return command
+        return decorator
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channel if channel_id == self.channel.id else None
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self._guilds.get(guild_id)
+
+    def get_user(self, user_id: int) -> Optional[FakeUser]:
+        return None
+
+    def register_user(self, user: FakeUser):
+        """Make a user fetchable through fetch_user without caching it"""
+        self._users[user.id] = user
+
+    async def fetch_user(self, user_id: int) -> FakeUser:
+        user = self._users.get(user_id) or FakeUser(user_id, f"user{user_id % 100000}")
+        return await self.rest.call("fetch_user", user)
+
+class FakeContext:
+    """Enough of commands.Context to call a command callback directly"""
+
+    def __init__(self, bot: FakeBot, guild: FakeGuild, author: FakeMember):
+        self.bot = bot
+        self.guild = guild
+        self.author = author
+        self.message = SimpleNamespace(attachments=[], author=author, guild=guild)
+
+    async def send(self, content=None, embed=None, file=None):
+        await self.bot.rest.call("channel_send")
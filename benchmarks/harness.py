@@ -0,0 +1,177 @@
+"""Run the real invite handlers against the fake gateway and collect metrics"""
+import asyncio
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import FakeBot, FakeChannel, FakeContext, FakeGuild, FakeRest, next_id
+from modules.instrumentation import LoopLagMonitor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class Harness:
+    """One benchmark run: a temporary data directory, fake guilds and the real handlers.
+
+    ``setup()`` copies ``config/`` into a temporary working directory, sets
+    the environment the handlers read and calls ``setup_invite_logger`` with
+    a FakeBot. Scenarios then dispatch events with ``dispatch()`` (one task
+    per event, like the gateway) or run commands with ``command()``.
+    """
+
+    def __init__(self, guild_count: int = 1, latency: float = 0.05, jitter: float = 0.02,
+                 rate_limit: float = 0.0, seed: int = 0, env: Optional[Dict[str, str]] = None):
+        self.rest = FakeRest(latency, jitter, rate_limit, seed=seed)
+        self.guilds = [FakeGuild(self.rest, name=f"bench-{i}") for i in range(guild_count)]
+        self.channel = FakeChannel(self.rest, next_id())
+        self.bot = FakeBot(self.rest, self.guilds, self.channel)
+        self.env = env or {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.events = 0
+        # Short ticks: benchmark stalls are milliseconds, not the seconds watched in production
+        self.lag = LoopLagMonitor(interval=0.005, threshold=0.002)
+        self.invite_logger = None
+        self._tasks: List[asyncio.Task] = []
+        self._workdir: Optional[str] = None
+        self._cwd = os.getcwd()
+
+    async def setup(self):
+        self._workdir = tempfile.mkdtemp(prefix="invite-bench-")
+        shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(self._workdir, "config"))
+        os.chdir(self._workdir)
+
+        guild = self.guilds[0]
+        member_role = guild.add_role("Member")
+        milestones = [guild.add_role(f"Inviter {count}") for count in (5, 10, 25)]
+        defaults = {
+            "WELCOME_CHANNEL_ID": str(self.channel.id),
+            "MEMBER_ROLE_ID": str(member_role.id),
+            "INVITER_ROLES": ",".join(f"{count}:{role.id}" for count, role in zip((5, 10, 25), milestones)),
+            "BACKFILL_AUTO": "false",
+        }
+        os.environ.update({**defaults, **self.env})
+
+        from modules import invite_logger
+        from modules.config_manager import ConfigManager
+        self.invite_logger = invite_logger
+
+        tracemalloc.start()
+        self.lag.start()
+        await invite_logger.setup_invite_logger(self.bot, ConfigManager())
+
+    async def wait_warm(self, timeout: float = 600.0) -> float:
+        """Wait until every guild's invite cache is loaded; returns the seconds taken"""
+        started = time.perf_counter()
+        while not all(guild.id in self.invite_logger.invites for guild in self.guilds):
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError("invite cache warm-up did not finish")
+            await asyncio.sleep(0.01)
+        return time.perf_counter() - started
+
+    async def _timed(self, name: str, handler, *args):
+        started = time.perf_counter()
+        try:
+            await handler(*args)
+        except Exception:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        finally:
+            self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+    def dispatch(self, event: str, *args) -> asyncio.Task:
+        """Run an event handler in its own task, as the gateway does"""
+        self.events += 1
+        task = asyncio.get_running_loop().create_task(self._timed(event, self.bot.events[event], *args))
+        self._tasks.append(task)
+        return task
+
+    async def command(self, name: str, guild: FakeGuild, *args):
+        """Invoke a command callback with a fake context and wait for it"""
+        self.events += 1
+        author = next(iter(guild.members.values()), None) or guild.add_member("bench-author")
+        ctx = FakeContext(self.bot, guild, author)
+        await self._timed(f"!{name}", self.bot.commands[name].callback, ctx, *args)
+
+    async def drain(self, timeout: float = 30.0) -> float:
+        """Wait for dispatched handlers, then up to ``timeout`` for queued outbound actions.
+
+        Role edits are paced at the per-guild route budget, so a large burst
+        can leave a backlog; what is still queued shows in the dispatcher
+        metrics of the results.
+        """
+        started = time.perf_counter()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+            self._tasks = []
+        dispatcher = self.invite_logger.action_dispatcher
+        while dispatcher.depth or dispatcher.metrics()["in_flight"]:
+            if time.perf_counter() - started > timeout:
+                break
+            await asyncio.sleep(0.01)
+        return time.perf_counter() - started
+
+    def results(self) -> Dict:
+        current, peak = tracemalloc.get_traced_memory()
+        handlers = {}
+        bus = getattr(self.bot, "event_bus", None)
+        for name, samples in sorted(self.latencies.items()):
+            errors = self.errors.get(name, 0)
+            # The event bus isolates listener failures, so count them from its listeners
+            if bus is not None and name.startswith("on_"):
+                errors += sum(listener.errors + listener.timeouts for listener in bus.listeners(name[3:]))
+            handlers[name] = {
+                "count": len(samples),
+                "errors": errors,
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+                "max_ms": round(max(samples) * 1000, 3),
+            }
+        return {
+            "events": self.events,
+            "handlers": handlers,
+            "rest": {
+                "total": self.rest.total,
+                "per_event": round(self.rest.total / self.events, 3) if self.events else 0.0,
+                "by_route": dict(sorted(self.rest.calls.items())),
+                "rate_limited": sum(self.rest.rate_limited.values()),
+            },
+            "loop": self.lag.metrics(),
+            "memory": {
+                "current_kb": round(current / 1024, 1),
+                "peak_kb": round(peak / 1024, 1),
+            },
+            "dispatcher": self.invite_logger.get_dispatcher_metrics(),
+        }
+
+    def close(self):
+        self.lag.stop()
+        tracemalloc.stop()
+        os.chdir(self._cwd)
+        if self._workdir is not None:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+
+def version_info() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": sys.platform}
+
+def quiet_logging():
+    """Keep handler logs out of the benchmark output"""
+    logging.basicConfig(level=logging.CRITICAL, stream=sys.stderr)
+    logging.getLogger("bot").setLevel(logging.CRITICAL)
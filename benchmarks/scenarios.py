@@ -0,0 +1,250 @@
+"""Benchmark scenarios; each drives a Harness and returns the parameters it used"""
+import asyncio
+import gc
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, Dict, Tuple
+
+from benchmarks.harness import Harness
+from modules.instrumentation import LoopLagMonitor
+from modules.invite_store import InviteStore
+from modules.ledger import InviteeRecord
+
+def _invites(harness: Harness, inviters: int = 20):
+    """Give the first guild ``inviters`` members with one invite each"""
+    guild = harness.guilds[0]
+    for _ in range(inviters):
+        guild.add_invite(guild.add_member())
+    return guild, guild.invite_list()
+
+async def steady_joins(harness: Harness, scale: float = 1.0) -> Dict:
+    """Joins at a constant rate with one in ten members leaving again"""
+    joins, rate = max(1, int(200 * scale)), 5.0
+    guild, invites = _invites(harness)
+    await harness.setup()
+    await harness.wait_warm()
+
+    rng = random.Random(1)
+    joined = []
+    started = time.perf_counter()
+    for i in range(joins):
+        member = guild.use_invite(rng.choice(invites))
+        harness.dispatch("on_member_join", member)
+        joined.append(member)
+        if i % 10 == 9:
+            leaving = joined.pop(rng.randrange(len(joined)))
+            guild.remove_member(leaving)
+            harness.dispatch("on_member_remove", leaving)
+        await asyncio.sleep(1.0 / rate)
+    drain = await harness.drain()
+    return {"joins": joins, "rate_per_second": rate, "seconds": round(time.perf_counter() - started, 3),
+            "drain_seconds": round(drain, 3)}
+
+async def raid(harness: Harness, scale: float = 1.0) -> Dict:
+    """A thousand members join through a handful of invites within about a second"""
+    joins = max(1, int(1000 * scale))
+    guild, invites = _invites(harness, inviters=5)
+    await harness.setup()
+    await harness.wait_warm()
+
+    rng = random.Random(2)
+    started = time.perf_counter()
+    for i in range(joins):
+        harness.dispatch("on_member_join", guild.use_invite(rng.choice(invites)))
+        if i % 50 == 49:
+            await asyncio.sleep(0.05)
+    drain = await harness.drain()
+    return {"joins": joins, "seconds": round(time.perf_counter() - started, 3), "drain_seconds": round(drain, 3),
+            "welcome_messages": harness.channel.sent}
+
+async def leaderboard(harness: Harness, scale: float = 1.0) -> Dict:
+    """Leaderboard, rank and stats commands on a guild with 50k ranked users"""
+    users, calls = max(10, int(50000 * scale)), 100
+    guild = harness.guilds[0]
+    # Only a few ranked users are cached members; the rest need a profile fetch
+    cached = [guild.add_member() for _ in range(min(users, 500))]
+    await harness.setup()
+    await harness.wait_warm()
+
+    rng = random.Random(3)
+    counts = {str(member.id): rng.randint(1, 300) for member in cached}
+    while len(counts) < users:
+        counts[str(10 ** 17 + rng.randrange(10 ** 16))] = rng.randint(1, 300)
+    loaded = time.perf_counter()
+    harness.invite_logger.guild_states.get(guild.id).apply_batch(counts, {})
+    load_seconds = time.perf_counter() - loaded
+
+    for i in range(calls):
+        await harness.command("leaderboard", guild, 20)
+        await harness.command("rank", guild, rng.choice(cached))
+        if i % 10 == 0:
+            await harness.command("invitestats", guild)
+            await harness.command("weekly", guild)
+    await harness.drain()
+    return {"users": users, "calls": calls, "index_load_seconds": round(load_seconds, 3)}
+
+async def warmup(harness: Harness, scale: float = 1.0) -> Dict:
+    """Invite cache warm-up across many guilds, with joins arriving meanwhile"""
+    rng = random.Random(4)
+    for guild in harness.guilds:
+        for _ in range(10):
+            guild.add_invite(guild.add_member(), uses=rng.randint(0, 50))
+    await harness.setup()
+
+    # Joins during warm-up wait for their guild's snapshot and move it forward
+    for guild in rng.sample(harness.guilds, min(20, len(harness.guilds))):
+        harness.dispatch("on_member_join", guild.use_invite(rng.choice(guild.invite_list())))
+    seconds = await harness.wait_warm()
+    drain = await harness.drain()
+    return {"guilds": len(harness.guilds), "warm_seconds": round(seconds, 3), "drain_seconds": round(drain, 3)}
+
+async def reconnect(harness: Harness, scale: float = 1.0) -> Dict:
+    """Joins arriving while the invite cache is warmed up again after a reconnect"""
+    joins = max(1, int(50 * scale))
+    guild, invites = _invites(harness)
+    await harness.setup()
+    await harness.wait_warm()
+    state = harness.invite_logger.guild_states.get(guild.id)
+    before = sum(count for _, count in state.invite_counts.items())
+
+    # The ready listener re-runs the warm-up; these joins queue behind it
+    rng = random.Random(6)
+    harness.dispatch("on_ready")
+    await asyncio.sleep(0)
+    for _ in range(joins):
+        harness.dispatch("on_member_join", guild.use_invite(rng.choice(invites)))
+    drain = await harness.drain()
+    attributed = sum(count for _, count in state.invite_counts.items()) - before
+    return {"joins": joins, "attributed": attributed, "drain_seconds": round(drain, 3)}
+
+async def cold_guilds(harness: Harness, scale: float = 1.0) -> Dict:
+    """Joins in guilds whose large partitions are not loaded yet; the reads must not stall the loop"""
+    members = max(100, int(50000 * scale))
+    rng = random.Random(7)
+    invites = {guild.id: [guild.add_invite(guild.add_member()) for _ in range(5)] for guild in harness.guilds}
+    await harness.setup()
+    await harness.wait_warm()
+
+    # Partitions written straight to disk, as if left by an earlier run:
+    # a snapshot plus an event log that has not been compacted yet
+    registry = harness.invite_logger.guild_states
+    now = int(time.time())
+    for guild in harness.guilds:
+        store = InviteStore(os.path.join(registry.data_dir, str(guild.id)))
+        store.load()
+        inviters = [str(10 ** 17 + rng.randrange(10 ** 16)) for _ in range(max(1, members // 20))]
+        invited_by = {str(10 ** 17 + rng.randrange(10 ** 16)): rng.choice(inviters) for _ in range(members)}
+        store.apply_batch({user_id: rng.randint(1, 300) for user_id in inviters}, invited_by)
+        store.invitees.update({member_id: InviteeRecord(inviter_id, now - rng.randrange(86400 * 30), credited=True)
+                               for member_id, inviter_id in invited_by.items()})
+        store.compact()
+        # Joins since the last compaction wait in the event log and are replayed on load
+        for _ in range(members // 2):
+            inviter_id = rng.choice(inviters)
+            store.set_inviter(str(10 ** 17 + rng.randrange(10 ** 16)), inviter_id)
+            store.increment(inviter_id)
+        store.flush()
+        store.close()
+    cold = [guild for guild in harness.guilds if guild.id not in {state.guild_id for state in registry.loaded_states()}]
+    # Count only the stalls from here on, not the partition writes above
+    harness.lag.stop()
+    harness.lag = LoopLagMonitor(harness.lag.interval, harness.lag.threshold)
+    harness.lag.start()
+
+    # Two joins per guild, so the second waits on the load the first started
+    for guild in cold:
+        for _ in range(2):
+            harness.dispatch("on_member_join", guild.use_invite(rng.choice(invites[guild.id])))
+    drain = await harness.drain()
+    return {"guilds": len(cold), "members_per_guild": members, "joins": 2 * len(cold),
+            "guild_loads": registry.loads, "drain_seconds": round(drain, 3)}
+
+def _measure(load: Callable):
+    """Seconds taken by ``load`` and bytes still allocated by what it returned"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - started
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    del result
+    return seconds, retained
+
+async def store_load(harness: Harness, scale: float = 1.0) -> Dict:
+    """Memory per member and snapshot load time, JSON dicts against the binary store"""
+    members = max(100, int(200000 * scale))
+    await harness.setup()
+
+    rng = random.Random(5)
+    inviters = [str(10 ** 17 + rng.randrange(10 ** 16)) for _ in range(max(1, members // 20))]
+    counts = {user_id: rng.randint(1, 300) for user_id in inviters}
+    invited_by = {str(10 ** 17 + rng.randrange(10 ** 16)): rng.choice(inviters) for _ in range(members)}
+    # One ledger record per member: most credited, some left or still pending
+    now = int(time.time())
+    invitees = {}
+    for member_id, inviter_id in invited_by.items():
+        joined_at = now - rng.randrange(365 * 86400)
+        roll = rng.random()
+        left_at = joined_at + rng.randrange(86400) if roll < 0.1 else None
+        invitees[member_id] = InviteeRecord(inviter_id, joined_at, left_at, rng.randrange(3) if roll < 0.2 else 0,
+                                            left_at is None and roll < 0.95)
+
+    workdir = tempfile.mkdtemp(prefix="invite-store-")
+    try:
+        store = InviteStore(os.path.join(workdir, "binary"))
+        store.load()
+        store.apply_batch(counts, invited_by)
+        store.invitees.update(invitees)
+        store.compact()
+        store.close()
+        # The same data in the JSON snapshot format the store used before
+        json_path = os.path.join(workdir, InviteStore.JSON_SNAPSHOT_FILE)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({"seq": store.seq, "invite_counts": counts, "invited_by": invited_by,
+                       "invitees": {member_id: record.to_list() for member_id, record in invitees.items()}}, f,
+                      separators=(",", ":"))
+        snapshot_bytes = os.path.getsize(os.path.join(workdir, "binary", InviteStore.SNAPSHOT_FILE))
+        json_snapshot_bytes = os.path.getsize(json_path)
+        del counts, invited_by, invitees, store
+
+        def load_json():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            invitees = {member_id: InviteeRecord.from_list(values)
+                        for member_id, values in snapshot["invitees"].items()}
+            return defaultdict(int, snapshot["invite_counts"]), dict(snapshot["invited_by"]), invitees
+
+        def load_binary():
+            loaded = InviteStore(os.path.join(workdir, "binary"))
+            loaded.load()
+            loaded.close()
+            return loaded.invite_counts, loaded.invited_by, loaded.invitees
+
+        json_seconds, json_bytes = _measure(load_json)
+        binary_seconds, binary_bytes = _measure(load_binary)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {"members": members,
+            "json_load_seconds": round(json_seconds, 4), "binary_load_seconds": round(binary_seconds, 4),
+            "json_bytes_per_member": round(json_bytes / members, 1),
+            "binary_bytes_per_member": round(binary_bytes / members, 1),
+            "json_snapshot_bytes": json_snapshot_bytes, "binary_snapshot_bytes": snapshot_bytes}
+
+# name -> (scenario, guild count at scale 1.0)
+SCENARIOS: Dict[str, Tuple[Callable, int]] = {
+    "steady_joins": (steady_joins, 1),
+    "raid": (raid, 1),
+    "leaderboard": (leaderboard, 1),
+    "warmup": (warmup, 200),
+    "reconnect": (reconnect, 1),
+    "cold_guilds": (cold_guilds, 20),
+    "store_load": (store_load, 1),
+}
@@ -0,0 +1,104 @@
+"""Export or import one server's invite data from the command line.
+
+    python invite_data.py export <guild_id> [-f jsonl|csv] [-o FILE]
+    python invite_data.py import <guild_id> FILE [--replace]
+
+With per-server files, stop the bot before importing: a running bot keeps
+its own copy of the data in memory and would write over the imported
+partition. With the shared SQLite store (--database, or INVITE_DATABASE),
+imports are safe while the bot runs and show up within a few seconds.
+"""
+import argparse
+import os
+import sys
+
+from modules.invite_export import FORMATS, InviteImportError, format_for, import_from_file, write_export
+from modules.invite_store import InviteStore
+from modules.shared_store import SharedInviteDB
+
+DATA_DIR = os.path.join("data", "guilds")
+
+def open_partition(args, guild_id: int, create: bool = False):
+    if args.database:
+        database = SharedInviteDB(args.database)
+        if not create and not database.has_guild(guild_id):
+            database.close()
+            sys.exit(f"❌ No invite data for server {guild_id} in {args.database}")
+        store = database.store(guild_id)
+        store.load()
+        return store
+    partition_dir = os.path.join(args.data_dir, str(guild_id))
+    if not create and not os.path.isdir(partition_dir):
+        sys.exit(f"❌ No invite data for server {guild_id} in {args.data_dir}")
+    store = InviteStore(partition_dir)
+    store.load()
+    return store
+
+def close_partition(args, store):
+    store.close()
+    if args.database:
+        store.db.close()
+
+def export_command(args) -> int:
+    store = open_partition(args, args.guild_id)
+    close_partition(args, store)
+    fmt = args.format or format_for(args.output or "", "jsonl")
+    if args.output in (None, "-"):
+        rows = write_export(sys.stdout, store.invite_counts, store.invited_by, fmt, args.guild_id, args.chunk_rows)
+    else:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            rows = write_export(f, store.invite_counts, store.invited_by, fmt, args.guild_id, args.chunk_rows)
+    print(f"✅ Exported {rows} rows for server {args.guild_id}", file=sys.stderr)
+    return 0
+
+def import_command(args) -> int:
+    try:
+        batch = import_from_file(args.file, args.format)
+    except InviteImportError as e:
+        for error in e.errors:
+            print(f"❌ {error}", file=sys.stderr)
+        if e.total > len(e.errors):
+            print(f"❌ ... {e.total - len(e.errors)} more problems", file=sys.stderr)
+        print("Nothing was imported.", file=sys.stderr)
+        return 1
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"❌ Error reading {args.file}: {e}", file=sys.stderr)
+        return 1
+
+    store = open_partition(args, args.guild_id, create=True)
+    try:
+        store.apply_batch(batch.invite_counts, batch.invited_by, replace=args.replace)
+        store.flush()
+    finally:
+        close_partition(args, store)
+    mode = "replaced" if args.replace else "merged"
+    print(f"✅ {mode.capitalize()} {len(batch.invite_counts)} invite counts and "
+          f"{len(batch.invited_by)} inviter links for server {args.guild_id}", file=sys.stderr)
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export or import per-server invite data")
+    parser.add_argument("--data-dir", default=DATA_DIR, help=f"per-server data directory (default: {DATA_DIR})")
+    parser.add_argument("--database", default=os.getenv("INVITE_DATABASE"),
+                        help="shared SQLite invite store instead of per-server files (default: INVITE_DATABASE)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="write a server's invite data as JSONL or CSV")
+    export_parser.add_argument("guild_id", type=int)
+    export_parser.add_argument("-f", "--format", choices=FORMATS, help="default: from the output file name, else jsonl")
+    export_parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    export_parser.add_argument("--chunk-rows", type=int, default=1000, help="rows serialized per write")
+    export_parser.set_defaults(handler=export_command)
+
+    import_parser = subparsers.add_parser("import", help="validate a JSONL or CSV file and apply it in one step")
+    import_parser.add_argument("guild_id", type=int)
+    import_parser.add_argument("file")
+    import_parser.add_argument("-f", "--format", choices=FORMATS, help="default: from the file name")
+    import_parser.add_argument("--replace", action="store_true", help="drop existing data instead of merging")
+    import_parser.set_defaults(handler=import_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
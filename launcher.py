@@ -0,0 +1,146 @@
+"""Run the bot as several processes (shard clusters) that share one invite store.
+
+    python launcher.py --clusters 2 --shards 4
+
+Cluster N runs a contiguous slice of the shards through main.py with
+SHARD_COUNT, SHARD_IDS and CLUSTER_ID set, and every cluster uses the SQLite
+invite store at INVITE_DATABASE (default data/invites.db). A cluster that
+exits with an error is restarted with backoff; Ctrl+C or SIGTERM stops all
+of them, letting each flush its data first.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def shard_slices(shards: int, clusters: int) -> List[List[int]]:
+    """Split shard IDs into ``clusters`` contiguous, nearly equal slices"""
+    size, extra = divmod(shards, clusters)
+    slices, start = [], 0
+    for index in range(clusters):
+        end = start + size + (1 if index < extra else 0)
+        slices.append(list(range(start, end)))
+        start = end
+    return slices
+
+class Cluster:
+    """One main.py process and its restart bookkeeping"""
+
+    def __init__(self, cluster_id: int, shard_ids: List[int], env: Dict[str, str]):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.restart_at = 0.0
+        self.backoff = 5.0
+
+    def start(self):
+        # A session of its own, so a terminal Ctrl+C reaches the launcher only
+        # and each cluster is stopped exactly once
+        options = {"start_new_session": True} if os.name == "posix" else {}
+        self.process = subprocess.Popen([sys.executable, "main.py"], cwd=REPO_ROOT, env=self.env, **options)
+        self.started_at = time.monotonic()
+        print(f"🚀 Cluster {self.cluster_id} started (pid {self.process.pid}, shards {self.shard_ids})", flush=True)
+
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        # main.py flushes invite data when interrupted
+        if os.name == "posix":
+            self.process.send_signal(signal.SIGINT)
+        else:
+            self.process.terminate()
+
+def main(argv: List[str] = None) -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run the bot as several shard cluster processes")
+    parser.add_argument("--clusters", type=int, default=int(os.getenv("CLUSTER_COUNT", 2)),
+                        help="processes to run (default: CLUSTER_COUNT or 2)")
+    parser.add_argument("--shards", type=int, default=int(os.getenv("SHARD_COUNT", 0)) or None,
+                        help="total shards (default: SHARD_COUNT, else one per cluster)")
+    parser.add_argument("--database", default=os.getenv("INVITE_DATABASE") or os.path.join("data", "invites.db"),
+                        help="shared invite store (default: INVITE_DATABASE or data/invites.db)")
+    parser.add_argument("--stop-timeout", type=float, default=30.0,
+                        help="seconds to wait for clusters to flush and exit")
+    args = parser.parse_args(argv)
+
+    shards = args.shards or args.clusters
+    if args.clusters < 1 or shards < args.clusters:
+        parser.error("need at least one cluster and at least one shard per cluster")
+
+    metrics_port = int(os.getenv("METRICS_PORT", 0))
+    clusters = []
+    for cluster_id, shard_ids in enumerate(shard_slices(shards, args.clusters)):
+        env = dict(os.environ)
+        env.update({
+            "SHARD_COUNT": str(shards),
+            "SHARD_IDS": ",".join(map(str, shard_ids)),
+            "CLUSTER_ID": str(cluster_id),
+            "INVITE_DATABASE": args.database,
+        })
+        if metrics_port:
+            # One metrics endpoint per cluster on consecutive ports
+            env["METRICS_PORT"] = str(metrics_port + cluster_id)
+        clusters.append(Cluster(cluster_id, shard_ids, env))
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    for cluster in clusters:
+        cluster.start()
+
+    while not stopping:
+        time.sleep(1)
+        now = time.monotonic()
+        for cluster in clusters:
+            if cluster.process is None:
+                if now >= cluster.restart_at:
+                    cluster.start()
+                continue
+            code = cluster.process.poll()
+            if code is None:
+                continue
+            if code == 0:
+                print(f"✅ Cluster {cluster.cluster_id} exited cleanly", flush=True)
+                cluster.process = None
+                cluster.restart_at = float("inf")
+                continue
+            # Reset the backoff after a stable run, double it after a quick crash
+            cluster.backoff = 5.0 if now - cluster.started_at > 600 else min(cluster.backoff * 2, 300.0)
+            cluster.restart_at = now + cluster.backoff
+            cluster.process = None
+            print(f"❌ Cluster {cluster.cluster_id} exited with code {code}, "
+                  f"restarting in {cluster.backoff:.0f}s", flush=True)
+        if all(cluster.process is None and cluster.restart_at == float("inf") for cluster in clusters):
+            return 0
+
+    print("🔄 Stopping clusters...", flush=True)
+    for cluster in clusters:
+        cluster.stop()
+    deadline = time.monotonic() + args.stop_timeout
+    for cluster in clusters:
+        if cluster.process is None:
+            continue
+        try:
+            cluster.process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            print(f"⚠️ Cluster {cluster.cluster_id} did not stop in time, killing it", flush=True)
+            cluster.process.kill()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,32 @@
 import discord
 from discord.ext import commands
+import logging
 import os
 from dotenv import load_dotenv
-from modules.invite_logger import setup_invite_logger
+from modules.invite_logger import (
+    get_dispatcher_metrics, get_persistence_metrics, get_resolver_metrics, setup_invite_logger, shutdown_invite_logger,
+    stop_invite_logger
+)
+from modules.instrumentation import MetricsServer, instruments
+from modules.event_bus import get_event_bus
 from modules.config_manager import ConfigManager
-from datetime import datetime
+from modules.config_watcher import ConfigWatcher
+from modules.logger import setup_logging, shutdown_logging
 import sys
 
 # Load environment variables
 load_dotenv()
 
-# === FIXED LOGGING SYSTEM ===
+# === LOGGING SYSTEM ===
+# Records go through a queue to a background writer thread (JSON lines in
+# logs/bot.log), so logging never blocks the event loop.
+setup_logging()
+logger = logging.getLogger("bot")
+
 def log(message, log_type="INFO"):
-    """Simple logging function with forced file write"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_message = f"[{timestamp}] [{log_type}] {message}"
-    
-    # Print to console
-    emoji = "❌" if log_type == "ERROR" else "ℹ️"
-    print(f"{emoji} {message}")
-    
-    # Write to file with immediate flush
-    try:
-        # Ensure logs directory exists
-        if not os.path.exists("logs"):
-            os.makedirs("logs")
-            
-        # Write to file and force immediate save
-        with open("logs/bot.log", "a", encoding="utf-8") as f:
-            f.write(log_message + "\n")
-            f.flush()  # Force write to disk
-            os.fsync(f.fileno())  # Force OS to write to disk
-            
-    except Exception as e:
-        print(f"❌ Failed to write log: {e}")
+    """Log a message through the buffered logging system"""
+    level = logging.getLevelName(log_type)
+    logger.log(level if isinstance(level, int) else logging.INFO, message)
 
 # Log startup immediately when script starts
 log("=== DISCORD BOT STARTUP ===")
@@ -43,10 +36,39 @@ log("Loading environment variables...")
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+
+class ShutdownMixin:
+    """Stops background writers while the event loop still runs; bot.run calls close() on exit"""
+
+    async def close(self):
+        try:
+            await stop_invite_logger()
+        except Exception as e:
+            log(f"Error stopping invite logger: {str(e)}", "ERROR")
+        await super().close()
+
+class Bot(ShutdownMixin, commands.Bot):
+    pass
+
+class AutoShardedBot(ShutdownMixin, commands.AutoShardedBot):
+    pass
+
+# Sharding: SHARD_COUNT alone runs every shard in this process; the launcher
+# also sets SHARD_IDS so each process (cluster) runs a slice of them
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0))
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv("SHARD_IDS", "").split(",") if shard_id.strip()]
+if SHARD_COUNT:
+    bot = AutoShardedBot(command_prefix='!', intents=intents, shard_count=SHARD_COUNT,
+                                  shard_ids=SHARD_IDS or None)
+    log(f"Running shards {SHARD_IDS or 'all'} of {SHARD_COUNT}")
+else:
+    bot = Bot(command_prefix='!', intents=intents)
 
 log("Bot instance created successfully")
 
+# Modules register event listeners on the bus instead of replacing each other's handlers
+events = get_event_bus(bot, default_timeout=float(os.getenv("EVENT_LISTENER_TIMEOUT", 30)))
+
 # Initialize config manager
 try:
     config_manager = ConfigManager()
@@ -55,9 +77,22 @@ except Exception as e:
     log(f"Failed to initialize config manager: {str(e)}", "ERROR")
     sys.exit(1)
 
-@bot.event
+# Pick up edits to config/ without !reloadconfig
+config_watcher = ConfigWatcher(config_manager, interval=float(os.getenv("CONFIG_WATCH_INTERVAL", 2.0)))
+
+# Handler timings and loop lag, optionally served in Prometheus text format
+instruments.add_collector("persistence", get_persistence_metrics)
+instruments.add_collector("dispatcher", get_dispatcher_metrics)
+instruments.add_collector("resolver", get_resolver_metrics)
+instruments.add_collector("events", events.metrics)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+metrics_server = None
+services_started = False
+
+@events.listen("ready", priority=0, concurrent=False)
 async def on_ready():
     """Bot ready event - logs when bot successfully connects"""
+    global metrics_server, services_started
     log(f'Bot {bot.user} is now online and ready!')
     log(f'Connected to {len(bot.guilds)} Discord servers')
     log(f'Current communication style: {config_manager.current_style}')
@@ -66,6 +101,14 @@ async def on_ready():
     print(f'✅ Bot {bot.user} is ready!')
     print(f'📊 Connected to {len(bot.guilds)} servers')
     print(f'🎨 Current style: {config_manager.current_style}')
+    
+    # Reconnects fire ready again; everything below starts once
+    if services_started:
+        return
+    services_started = True
+    
+    if os.getenv("CONFIG_WATCH", "true").lower() != "false":
+        config_watcher.start()
         
     # Setup invite tracking system
     try:
@@ -73,6 +116,17 @@ async def on_ready():
         log("Invite tracking system initialized successfully")
     except Exception as e:
         log(f"Failed to setup invite tracking: {str(e)}", "ERROR")
+    
+    # Time every command (bus listeners are timed as they register)
+    instruments.instrument_bot(bot)
+    instruments.loop_lag.start()
+    if METRICS_PORT and metrics_server is None:
+        try:
+            metrics_server = MetricsServer(instruments.render, os.getenv("METRICS_HOST", "127.0.0.1"), METRICS_PORT)
+            await metrics_server.start()
+        except OSError as e:
+            metrics_server = None
+            log(f"Failed to start metrics endpoint on port {METRICS_PORT}: {str(e)}", "ERROR")
 
 @bot.event
 async def on_error(event, *args, **kwargs):
@@ -81,32 +135,33 @@ async def on_error(event, *args, **kwargs):
     error_msg = f"Error in event '{event}': {traceback.format_exc()}"
     log(error_msg, "ERROR")
 
-@bot.event
+@events.listen()
 async def on_guild_join(guild):
     """Log when bot joins a new server"""
     log(f"Bot joined new server: {guild.name} (ID: {guild.id}, Members: {guild.member_count})")
 
-@bot.event
+@events.listen()
 async def on_guild_remove(guild):
     """Log when bot leaves a server"""
     log(f"Bot left server: {guild.name} (ID: {guild.id})")
 
 @bot.command(name="setstyle")
+@commands.guild_only()
 @commands.has_permissions(administrator=True)
 async def set_style(ctx, style: str):
-    """Set bot communication style (admin only)"""
+    """Set bot communication style for this server (admin only); "default" resets it"""
     try:
         log(f"Style change requested by {ctx.author} in {ctx.guild.name}: {style}")
         
-        if config_manager.set_style(style):
-            style_info = config_manager.get_current_style_info()
+        if config_manager.set_guild_style(ctx.guild.id, None if style == "default" else style):
+            style_info = config_manager.for_guild(ctx.guild.id).info
             embed = discord.Embed(
                 title="✅ Style Updated",
                 description=f"**Style:** {style_info['name']}\n**Language:** {style_info['language']}\n**Tone:** {style_info['tone']}\n**Description:** {style_info['description']}",
                 color=discord.Color.green()
             )
             await ctx.send(embed=embed)
-            log(f"Communication style successfully changed to: {style}")
+            log(f"Communication style for {ctx.guild.name} successfully changed to: {style}")
         else:
             available_styles = config_manager.get_available_styles()
             styles_info = []
@@ -127,13 +182,14 @@ async def set_style(ctx, style: str):
         await ctx.send("❌ An error occurred while changing style.")
 
 @bot.command(name="styles")
+@commands.guild_only()
 async def list_styles(ctx):
     """List all available communication styles"""
     try:
         log(f"Style list requested by {ctx.author} in {ctx.guild.name}")
         
         available_styles = config_manager.get_available_styles()
-        current_style = config_manager.current_style
+        current_style = config_manager.for_guild(ctx.guild.id).name
             
         styles_info = []
         for style_name in available_styles:
@@ -146,7 +202,7 @@ async def list_styles(ctx):
             description="\n\n".join(styles_info),
             color=discord.Color.blue()
         )
-        embed.set_footer(text="🔸 = Current style | Use !setstyle <name> to change")
+        embed.set_footer(text="🔸 = This server's style | Use !setstyle <name> to change")
         await ctx.send(embed=embed)
         
     except Exception as e:
@@ -160,7 +216,9 @@ async def reload_config(ctx):
     try:
         log(f"Configuration reload requested by {ctx.author} in {ctx.guild.name}")
         
-        config_manager.reload_config()
+        # Parse off the event loop; a bad file leaves the current config in place
+        snapshot = await bot.loop.run_in_executor(None, config_manager.load_snapshot)
+        config_manager.install_snapshot(snapshot)
         style_info = config_manager.get_current_style_info()
         embed = discord.Embed(
             title="✅ Configuration Reloaded",
@@ -179,6 +237,56 @@ async def reload_config(ctx):
         )
         await ctx.send(embed=embed)
 
+@bot.command(name="perf")
+@commands.has_permissions(administrator=True)
+async def perf(ctx):
+    """Show handler latency, event loop lag and queue statistics (admin only)"""
+    rows = instruments.summary()[:10]
+    handler_lines = []
+    for row in rows:
+        name = f"!{row['name']}" if row["kind"] == "command" else row["name"]
+        errors = f" ({row['errors']} errors)" if row["errors"] else ""
+        handler_lines.append(
+            f"`{name}` ×{row['calls']}{errors}: p50 {row['p50_ms']} ms, p99 {row['p99_ms']} ms, "
+            f"local {row['local_ms']} ms / awaiting {row['awaiting_ms']} ms"
+        )
+    loop_lag = instruments.loop_lag.metrics()
+    dispatcher = get_dispatcher_metrics()
+    resolver = get_resolver_metrics()
+    persistence = get_persistence_metrics()
+    
+    embed = discord.Embed(
+        title="⏱️ Performance",
+        description="\n".join(handler_lines) or "No handler calls recorded yet.",
+        color=discord.Color.blue()
+    )
+    embed.add_field(
+        name="🔄 Event Loop",
+        value=f"Max lag: {loop_lag['max_lag_ms']} ms\np99 lag: {loop_lag['p99_lag_ms']} ms\nStalls: {loop_lag['stalls']}",
+        inline=True
+    )
+    if dispatcher:
+        embed.add_field(
+            name="📤 Outbound Queue",
+            value=f"Queued: {dispatcher['depth']}\nIn flight: {dispatcher['in_flight']}\n"
+                  f"Retried: {dispatcher['retried']}\nDropped: {dispatcher['dropped']}",
+            inline=True
+        )
+    if resolver:
+        embed.add_field(
+            name="👤 User Lookups",
+            value=f"Hit rate: {resolver['hit_rate']:.0%}\nFetches: {resolver['fetches']}",
+            inline=True
+        )
+    embed.add_field(
+        name="💾 Persistence",
+        value=f"Pending writes: {persistence['pending_writes']}\nActive guilds: {persistence['active_guilds']}\n"
+              f"Invite data: {persistence['store_bytes'] / 1048576:.1f} MiB",
+        inline=True
+    )
+    embed.set_footer(text=f"Prometheus metrics on port {METRICS_PORT}" if metrics_server else "Set METRICS_PORT to export Prometheus metrics")
+    await ctx.send(embed=embed)
+
 if __name__ == "__main__":
     log("Checking for Discord bot token...")
     TOKEN = os.getenv("DISCORD_TOKEN")
@@ -200,5 +308,10 @@ if __name__ == "__main__":
         log(f"Critical error starting bot: {str(e)}", "ERROR")
         print(f"❌ Failed to start bot: {str(e)}")
     finally:
+        config_watcher.stop()
+        config_manager.guild_styles.flush()
+        # Guaranteed final flush of buffered invite data
+        shutdown_invite_logger()
         log("=== DISCORD BOT SHUTDOWN ===")
+        shutdown_logging()
     
\ No newline at end of file
@@ -0,0 +1,318 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("bot.invites.analytics")
+
+HOUR = 3600
+DAY = 86400
+
+# Counter columns of every bucket
+JOINS, LEAVES, ATTRIBUTED = range(3)
+COUNTERS = 3
+
+def _month(day: int) -> str:
+    return datetime.fromtimestamp(day * DAY, timezone.utc).strftime("%Y-%m")
+
+class GuildAnalytics:
+    """Pre-aggregated join, leave and attribution counters for one guild.
+
+    Events are never stored individually. Each one bumps a slot in a ring of
+    hourly buckets (recent detail), a daily bucket, the inviter's daily
+    bucket and the joining member's cohort. Daily buckets older than
+    ``daily_days`` are folded into monthly rollups, so history stays small
+    and every query walks buckets rather than events.
+    """
+
+    def __init__(self, hourly_slots: int = 168, daily_days: int = 90, inviter_days: int = 35,
+                 cohort_days: int = 120):
+        self.hourly_slots = hourly_slots
+        self.daily_days = daily_days
+        self.inviter_days = inviter_days
+        self.cohort_days = cohort_days
+
+        # Ring buffer: slot i holds the hour stored in _hour_tags[i]
+        self._hour_tags = [-1] * hourly_slots
+        self._hourly = [0] * (hourly_slots * COUNTERS)
+        self.daily: Dict[int, List[int]] = {}
+        self.monthly: Dict[str, List[int]] = {}
+        # day -> inviter_id -> attributed joins
+        self.inviter_daily: Dict[int, Dict[str, int]] = {}
+        # join day -> members joined, and join day -> days stayed -> members who left
+        self.cohort_joins: Dict[int, int] = {}
+        self.cohort_leaves: Dict[int, Dict[int, int]] = {}
+        self._compacted_day = 0
+
+    # === Recording ===
+
+    def _bump(self, now: float, column: int):
+        hour = int(now // HOUR)
+        slot = hour % self.hourly_slots
+        if self._hour_tags[slot] != hour:
+            self._hour_tags[slot] = hour
+            base = slot * COUNTERS
+            self._hourly[base:base + COUNTERS] = [0] * COUNTERS
+        self._hourly[slot * COUNTERS + column] += 1
+
+        day = int(now // DAY)
+        bucket = self.daily.get(day)
+        if bucket is None:
+            bucket = self.daily[day] = [0] * COUNTERS
+            self._compact(day)
+        bucket[column] += 1
+
+    def record_join(self, inviter_id: Optional[str], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        day = int(now // DAY)
+        self._bump(now, JOINS)
+        self.cohort_joins[day] = self.cohort_joins.get(day, 0) + 1
+        if inviter_id is not None:
+            self._bump(now, ATTRIBUTED)
+            inviters = self.inviter_daily.setdefault(day, {})
+            inviters[inviter_id] = inviters.get(inviter_id, 0) + 1
+
+    def record_leave(self, joined_at: Optional[float], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._bump(now, LEAVES)
+        if joined_at is None:
+            return
+        join_day = int(joined_at // DAY)
+        # Members who joined before tracking started have no cohort to leave
+        if join_day not in self.cohort_joins:
+            return
+        stayed = max(0, int((now - joined_at) // DAY))
+        leaves = self.cohort_leaves.setdefault(join_day, {})
+        leaves[stayed] = leaves.get(stayed, 0) + 1
+
+    def _compact(self, today: int):
+        """Fold or drop buckets that fell out of their retention window"""
+        if today <= self._compacted_day:
+            return
+        self._compacted_day = today
+        for day in [day for day in self.daily if day <= today - self.daily_days]:
+            rollup = self.monthly.setdefault(_month(day), [0] * COUNTERS)
+            for column, value in enumerate(self.daily.pop(day)):
+                rollup[column] += value
+        for day in [day for day in self.inviter_daily if day <= today - self.inviter_days]:
+            del self.inviter_daily[day]
+        for day in [day for day in self.cohort_joins if day <= today - self.cohort_days]:
+            del self.cohort_joins[day]
+            self.cohort_leaves.pop(day, None)
+
+    # === Queries ===
+
+    def recent(self, hours: int, now: Optional[float] = None) -> List[int]:
+        """Counters summed over the last ``hours`` hours (at most the ring size)"""
+        now = time.time() if now is None else now
+        current = int(now // HOUR)
+        totals = [0] * COUNTERS
+        for hour in range(current - min(hours, self.hourly_slots) + 1, current + 1):
+            slot = hour % self.hourly_slots
+            if self._hour_tags[slot] == hour:
+                for column in range(COUNTERS):
+                    totals[column] += self._hourly[slot * COUNTERS + column]
+        return totals
+
+    def period(self, days: int, now: Optional[float] = None) -> List[int]:
+        """Counters summed over the last ``days`` days, today included"""
+        today = int((time.time() if now is None else now) // DAY)
+        totals = [0] * COUNTERS
+        for day in range(today - days + 1, today + 1):
+            bucket = self.daily.get(day)
+            if bucket is not None:
+                for column in range(COUNTERS):
+                    totals[column] += bucket[column]
+        return totals
+
+    def top_inviters(self, days: int = 7, limit: int = 10, now: Optional[float] = None) -> List[Tuple[str, int]]:
+        """Inviters with the most attributed joins in the last ``days`` days"""
+        today = int((time.time() if now is None else now) // DAY)
+        totals: Dict[str, int] = {}
+        for day in range(today - min(days, self.inviter_days) + 1, today + 1):
+            for inviter_id, count in self.inviter_daily.get(day, {}).items():
+                totals[inviter_id] = totals.get(inviter_id, 0) + count
+        return heapq.nsmallest(limit, totals.items(), key=lambda item: (-item[1], int(item[0])))
+
+    def retention(self, after_days: int, cohort_window: int = 30,
+                  now: Optional[float] = None) -> Tuple[Optional[float], int]:
+        """Share of members still present ``after_days`` days after joining.
+
+        Only cohorts that joined at least ``after_days`` days ago and within
+        the ``cohort_window`` days before that are counted. Returns the
+        share (None without data) and the number of members measured.
+        """
+        today = int((time.time() if now is None else now) // DAY)
+        newest = today - after_days
+        joined = left = 0
+        for day in range(newest - cohort_window + 1, newest + 1):
+            cohort = self.cohort_joins.get(day)
+            if not cohort:
+                continue
+            joined += cohort
+            left += sum(count for stayed, count in self.cohort_leaves.get(day, {}).items() if stayed < after_days)
+        if not joined:
+            return None, 0
+        return (joined - left) / joined, joined
+
+    # === Persistence ===
+
+    def to_dict(self) -> Dict:
+        return {
+            "hour_tags": self._hour_tags,
+            "hourly": self._hourly,
+            "daily": self.daily,
+            "monthly": self.monthly,
+            "inviter_daily": self.inviter_daily,
+            "cohort_joins": self.cohort_joins,
+            "cohort_leaves": self.cohort_leaves,
+        }
+
+    def load_dict(self, data: Dict):
+        hour_tags = data.get("hour_tags", [])
+        hourly = data.get("hourly", [])
+        if len(hour_tags) == self.hourly_slots and len(hourly) == self.hourly_slots * COUNTERS:
+            self._hour_tags = list(hour_tags)
+            self._hourly = list(hourly)
+        # JSON object keys are strings
+        self.daily = {int(day): list(bucket) for day, bucket in data.get("daily", {}).items()}
+        self.monthly = {month: list(bucket) for month, bucket in data.get("monthly", {}).items()}
+        self.inviter_daily = {int(day): dict(inviters) for day, inviters in data.get("inviter_daily", {}).items()}
+        self.cohort_joins = {int(day): count for day, count in data.get("cohort_joins", {}).items()}
+        self.cohort_leaves = {
+            int(day): {int(stayed): count for stayed, count in leaves.items()}
+            for day, leaves in data.get("cohort_leaves", {}).items()
+        }
+        self._compact(int(time.time() // DAY))
+
+class InviteAnalytics:
+    """Per-guild analytics, saved to ``<data_dir>/<guild_id>/analytics.json``.
+
+    Guilds load on first use, from a worker thread. Changed guilds are
+    written together by ``flush()`` from a worker thread, each through a
+    temporary file and an atomic rename. After each flush, the least
+    recently used clean guilds beyond ``max_active`` are paged out, like
+    the invite state registry does.
+    """
+
+    FILE = "analytics.json"
+
+    def __init__(self, data_dir: str = "data/guilds", max_active: int = 100, **options):
+        self.data_dir = data_dir
+        self.max_active = max_active
+        self.options = options
+        self._guilds: "OrderedDict[int, GuildAnalytics]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._dirty: Set[int] = set()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.loads = 0
+        self.evictions = 0
+
+    def _path(self, guild_id: int) -> str:
+        return os.path.join(self.data_dir, str(guild_id), self.FILE)
+
+    @property
+    def active_guilds(self) -> int:
+        return len(self._guilds)
+
+    def _read(self, guild_id: int) -> Optional[Dict]:
+        try:
+            with open(self._path(guild_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"❌ Error loading invite analytics for server {guild_id}: {e}")
+            return None
+
+    async def get(self, guild_id: int) -> GuildAnalytics:
+        """A guild's analytics, read from disk off the event loop on first use"""
+        analytics = self._guilds.get(guild_id)
+        if analytics is not None:
+            self._guilds.move_to_end(guild_id)
+            return analytics
+
+        # Events arriving while the file is read wait for the same load
+        loading = self._loading.get(guild_id)
+        if loading is None:
+            loading = self._loading[guild_id] = asyncio.ensure_future(self._load(guild_id))
+            loading.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, guild_id: int) -> GuildAnalytics:
+        data = await asyncio.get_running_loop().run_in_executor(None, self._read, guild_id)
+        analytics = GuildAnalytics(**self.options)
+        if data is not None:
+            try:
+                analytics.load_dict(data)
+            except (TypeError, ValueError, AttributeError) as e:
+                logger.error(f"❌ Error loading invite analytics for server {guild_id}: {e}")
+                analytics = GuildAnalytics(**self.options)
+        self._guilds[guild_id] = analytics
+        self.loads += 1
+        return analytics
+
+    async def record_join(self, guild_id: int, inviter_id: Optional[str], now: Optional[float] = None):
+        (await self.get(guild_id)).record_join(inviter_id, now)
+        self._dirty.add(guild_id)
+
+    async def record_leave(self, guild_id: int, joined_at: Optional[float], now: Optional[float] = None):
+        (await self.get(guild_id)).record_leave(joined_at, now)
+        self._dirty.add(guild_id)
+
+    def evict_idle(self):
+        """Page out least recently used clean guilds beyond max_active"""
+        excess = len(self._guilds) - self.max_active
+        for guild_id in list(self._guilds):
+            if excess <= 0:
+                break
+            if guild_id in self._dirty:
+                continue
+            del self._guilds[guild_id]
+            self.evictions += 1
+            excess -= 1
+
+    def _take_dirty(self) -> List[Tuple[int, str]]:
+        # Serialize on the loop; handlers keep recording while files are written
+        batch = [(guild_id, json.dumps(self._guilds[guild_id].to_dict(), separators=(",", ":")))
+                 for guild_id in self._dirty]
+        self._dirty = set()
+        return batch
+
+    def _write(self, guild_id: int, payload: str):
+        path = self._path(guild_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def _write_batch(self, batch: List[Tuple[int, str]]) -> List[int]:
+        failed = []
+        for guild_id, payload in batch:
+            try:
+                self._write(guild_id, payload)
+            except OSError as e:
+                logger.error(f"❌ Error saving invite analytics for server {guild_id}: {e}")
+                failed.append(guild_id)
+        return failed
+
+    async def flush(self):
+        """Write every changed guild from a worker thread"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch = self._take_dirty()
+            if batch:
+                failed = await asyncio.get_running_loop().run_in_executor(None, self._write_batch, batch)
+                self._dirty.update(failed)
+            self.evict_idle()
+
+    def flush_sync(self):
+        """Write every changed guild now, called on shutdown"""
+        self._dirty.update(self._write_batch(self._take_dirty()))
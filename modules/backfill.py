@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+import discord
+
+from modules.guild_state import GuildInviteState, GuildStateRegistry
+from modules.invite_tracker import DowntimeWindow
+
+logger = logging.getLogger("bot.invites.backfill")
+
+class InviteBackfill:
+    """Attribute joins that happened while the bot was offline.
+
+    A job covers one guild's downtime window: the invite uses counted
+    between the previous run's cache snapshot and the warm-up fetch, and the
+    time span between the two. Members are streamed from
+    ``guild.fetch_members`` page by page; those who joined inside the window
+    and have no recorded inviter are matched against the remaining uses.
+    Each attribution is flagged ``high`` confidence when only one invite
+    could have been used and ``low`` when several could. Progress is saved
+    to a checkpoint after every page, so an interrupted job resumes where
+    it stopped.
+    """
+
+    CHECKPOINT_FILE = "backfill.json"
+
+    def __init__(self, registry: GuildStateRegistry, page_size: int = 1000):
+        self.registry = registry
+        self.page_size = page_size
+        self._running: Dict[int, asyncio.Task] = {}
+
+    def _checkpoint_path(self, guild_id: int) -> str:
+        return os.path.join(self.registry.data_dir, str(guild_id), self.CHECKPOINT_FILE)
+
+    def load_checkpoint(self, guild_id: int) -> Optional[Dict]:
+        try:
+            with open(self._checkpoint_path(guild_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"❌ Error reading backfill checkpoint for server {guild_id}: {e}")
+            return None
+
+    def _write_checkpoint(self, guild_id: int, checkpoint: Dict):
+        path = self._checkpoint_path(guild_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    async def _save_checkpoint(self, guild_id: int, checkpoint: Dict):
+        # Serialize now; later pages keep mutating the dict
+        snapshot = json.loads(json.dumps(checkpoint))
+        await asyncio.get_running_loop().run_in_executor(None, self._write_checkpoint, guild_id, snapshot)
+
+    async def register(self, guild_id: int, window: DowntimeWindow):
+        """Create a job for a downtime window, merging into an unfinished one"""
+        checkpoint = self.load_checkpoint(guild_id)
+        if checkpoint is None or checkpoint.get("done"):
+            checkpoint = {
+                "since": window.since,
+                "until": window.until,
+                "after": 0,
+                "uses": {},
+                "stats": {"scanned": 0, "high": 0, "low": 0, "unattributed": 0},
+                # member_id -> [inviter_id, code, confidence]
+                "attributed": {},
+                "done": False,
+            }
+        else:
+            checkpoint["since"] = min(checkpoint["since"], window.since)
+            checkpoint["until"] = max(checkpoint["until"], window.until)
+            # Pages already scanned may hold members of the new window
+            checkpoint["after"] = 0
+
+        for code, (count, inviter_id, created_at) in window.uses.items():
+            left = checkpoint["uses"].get(code, [0])[0]
+            checkpoint["uses"][code] = [left + count, inviter_id, created_at]
+        await self._save_checkpoint(guild_id, checkpoint)
+        total = sum(entry[0] for entry in checkpoint["uses"].values())
+        logger.info(f"🔄 Backfill queued for server {guild_id}: {total} invite uses while offline")
+
+    def pending(self, guild_id: int) -> bool:
+        checkpoint = self.load_checkpoint(guild_id)
+        return checkpoint is not None and not checkpoint.get("done")
+
+    def start(self, guild) -> asyncio.Task:
+        """Run or resume a guild's job in the background; returns the running task"""
+        task = self._running.get(guild.id)
+        if task is None or task.done():
+            task = self._running[guild.id] = asyncio.get_running_loop().create_task(self.run(guild))
+        return task
+
+    async def run(self, guild) -> Optional[Dict]:
+        """Process a guild's unfinished job; returns its stats, or None if there is none"""
+        checkpoint = self.load_checkpoint(guild.id)
+        if checkpoint is None or checkpoint.get("done"):
+            return None
+
+        started = time.perf_counter()
+        logger.info(f"🔄 Backfilling invites for server {guild.name} after member {checkpoint['after']}")
+        page: List = []
+        options = {"after": discord.Object(id=checkpoint["after"])} if checkpoint["after"] else {}
+        async for member in guild.fetch_members(limit=None, **options):
+            page.append(member)
+            if len(page) >= self.page_size:
+                self._process_page(await self.registry.ensure_loaded(guild.id), checkpoint, page)
+                await self._save_checkpoint(guild.id, checkpoint)
+                page = []
+        if page:
+            self._process_page(await self.registry.ensure_loaded(guild.id), checkpoint, page)
+
+        checkpoint["done"] = True
+        checkpoint["finished_at"] = time.time()
+        await self._save_checkpoint(guild.id, checkpoint)
+
+        stats = dict(checkpoint["stats"])
+        stats["seconds"] = round(time.perf_counter() - started, 2)
+        logger.info(f"✅ Backfill finished for server {guild.name}", extra={
+            "event": "invite_backfill",
+            "guild_id": guild.id,
+            **stats
+        })
+        return stats
+
+    def _process_page(self, state: GuildInviteState, checkpoint: Dict, members: List):
+        """Attribute one page of members and advance the checkpoint past it"""
+        uses = checkpoint["uses"]
+        stats = checkpoint["stats"]
+        since, until = checkpoint["since"], checkpoint["until"]
+
+        for member in members:
+            stats["scanned"] += 1
+            if member.bot or member.joined_at is None:
+                continue
+            joined = member.joined_at.timestamp()
+            member_id = str(member.id)
+            # Members already attributed (live or by an earlier pass) are skipped,
+            # which keeps replaying a page after a crash harmless
+            if not since < joined <= until or member_id in state.invited_by:
+                continue
+
+            # Only invites that existed when the member joined could have been used
+            eligible = [code for code, (left, _, created_at) in uses.items() if left > 0 and created_at <= joined]
+            if not eligible:
+                stats["unattributed"] += 1
+                continue
+            code = max(eligible, key=lambda c: (uses[c][0], c))
+            uses[code][0] -= 1
+            inviter_id = uses[code][1]
+            if inviter_id is None:
+                stats["unattributed"] += 1
+                continue
+
+            confidence = "high" if len(eligible) == 1 else "low"
+            stats[confidence] += 1
+            state.member_joined(member_id, str(inviter_id), joined_at=joined)
+            checkpoint["attributed"][member_id] = [inviter_id, code, confidence]
+            logger.debug(f"📝 Backfilled {member_id} as invited by {inviter_id} via {code} ({confidence} confidence)")
+
+        checkpoint["after"] = max(member.id for member in members)
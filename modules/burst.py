@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("bot.invites.burst")
+
+class JoinBurstDetector:
+    """Per-guild sliding-window join rate with hysteresis.
+
+    A guild enters burst mode once ``enter_joins`` joins fall inside the last
+    ``window`` seconds and leaves it only when the window holds
+    ``exit_joins`` or fewer, so a rate hovering around one threshold does not
+    flap between modes. ``on_change(guild_id, bursting)`` is called on every
+    transition.
+    """
+
+    def __init__(self, window: float = 10.0, enter_joins: int = 10, exit_joins: int = 3,
+                 on_change: Optional[Callable[[int, bool], None]] = None):
+        self.window = window
+        self.enter_joins = enter_joins
+        self.exit_joins = min(exit_joins, enter_joins - 1)
+        self.on_change = on_change
+
+        self._joins: Dict[int, Deque[float]] = {}
+        self._bursting: Set[int] = set()
+
+    def _prune(self, guild_id: int, now: float) -> int:
+        joins = self._joins.get(guild_id)
+        if joins is None:
+            return 0
+        cutoff = now - self.window
+        while joins and joins[0] <= cutoff:
+            joins.popleft()
+        if not joins:
+            del self._joins[guild_id]
+            return 0
+        return len(joins)
+
+    def _update(self, guild_id: int, count: int) -> bool:
+        bursting = guild_id in self._bursting
+        if not bursting and count >= self.enter_joins:
+            self._bursting.add(guild_id)
+            bursting = True
+        elif bursting and count <= self.exit_joins:
+            self._bursting.discard(guild_id)
+            bursting = False
+        else:
+            return bursting
+        if self.on_change is not None:
+            self.on_change(guild_id, bursting)
+        return bursting
+
+    def record(self, guild_id: int, now: Optional[float] = None) -> bool:
+        """Count a join; returns whether the guild is now in burst mode"""
+        now = time.monotonic() if now is None else now
+        self._joins.setdefault(guild_id, deque()).append(now)
+        return self._update(guild_id, self._prune(guild_id, now))
+
+    def is_bursting(self, guild_id: int, now: Optional[float] = None) -> bool:
+        """Re-check the window without a new join, so quiet guilds fall back"""
+        if guild_id not in self._bursting:
+            return False
+        now = time.monotonic() if now is None else now
+        return self._update(guild_id, self._prune(guild_id, now))
+
+    def rate(self, guild_id: int, now: Optional[float] = None) -> float:
+        """Joins per second over the window"""
+        now = time.monotonic() if now is None else now
+        return self._prune(guild_id, now) / self.window
+
+    def bursting_guilds(self) -> List[int]:
+        return list(self._bursting)
+
+class WelcomeBatcher:
+    """Collect welcome entries per guild and send them as periodic summaries.
+
+    While a guild has entries queued, a task sends everything collected every
+    ``interval`` seconds through ``send(guild_id, channel, entries)``, then
+    stops once the queue is empty.
+    """
+
+    def __init__(self, send: Callable[[int, object, List], Awaitable[None]], interval: float = 10.0):
+        self.send = send
+        self.interval = interval
+
+        self._entries: Dict[int, Tuple[object, List]] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def pending(self, guild_id: int) -> bool:
+        return guild_id in self._entries
+
+    def add(self, guild_id: int, channel, entry):
+        queued = self._entries.get(guild_id)
+        if queued is None:
+            queued = self._entries[guild_id] = (channel, [])
+        queued[1].append(entry)
+
+        task = self._tasks.get(guild_id)
+        if task is None or task.done():
+            self._tasks[guild_id] = asyncio.get_running_loop().create_task(self._run(guild_id))
+
+    async def _run(self, guild_id: int):
+        while guild_id in self._entries:
+            await asyncio.sleep(self.interval)
+            channel, entries = self._entries.pop(guild_id)
+            try:
+                await self.send(guild_id, channel, entries)
+            except Exception as e:
+                logger.error(f"❌ Error sending join summary for server {guild_id}: {e}")
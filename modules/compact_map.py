@@ -0,0 +1,300 @@
+import sys
+from array import array
+from collections.abc import ItemsView, Mapping, MutableMapping, ValuesView
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAX_SNOWFLAKE = 2 ** 63 - 1
+_MASK64 = 2 ** 64 - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+# Index entries: 0 = empty, -1 = deleted, n = row n - 1
+_EMPTY = 0
+_DELETED = -1
+
+def snowflake(value) -> Optional[int]:
+    """The integer form of a canonical decimal ID string, or None for anything else"""
+    if type(value) is not str:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    # Rejects what int() tolerates: signs, spaces, underscores, leading zeros
+    if 0 <= number <= MAX_SNOWFLAKE and str(number) == value:
+        return number
+    return None
+
+class SnowflakeRows:
+    """Open-addressing hash index from int64 keys to rows of parallel ``array`` columns.
+
+    Rows stay dense: deleting one moves the last row into the gap, in the
+    key column and in every column returned by ``_columns()``. Subclasses
+    decide what the columns hold and how keys are encoded.
+    """
+
+    __slots__ = ("_keys", "_index", "_shift", "_used")
+
+    def __init__(self):
+        self._keys = array('q')
+        self._set_index(array('q', bytes(8 * 8)))
+
+    def _columns(self) -> Tuple[array, ...]:
+        return ()
+
+    def _set_index(self, index: array):
+        self._index = index
+        self._shift = 64 - (len(index).bit_length() - 1)
+        self._used = len(index) - index.count(_EMPTY)
+
+    def _find(self, key: int) -> Tuple[int, int]:
+        """(row, index position) of ``key``; row is -1 with the empty position to insert at"""
+        index, keys, mask = self._index, self._keys, len(self._index) - 1
+        position = (((key ^ (key >> 22)) * _GOLDEN) & _MASK64) >> self._shift
+        while True:
+            entry = index[position]
+            if entry == _EMPTY:
+                return -1, position
+            if entry > 0 and keys[entry - 1] == key:
+                return entry - 1, position
+            position = (position + 1) & mask
+
+    def _grow(self, rows: int = 0):
+        """Rebuild the index with room for ``rows`` entries, dropping deleted markers"""
+        capacity = 8
+        while capacity * 2 < (max(rows, len(self._keys)) + 1) * 3:
+            capacity *= 2
+        capacity *= 2
+        self._set_index(array('q', bytes(8 * capacity)))
+        index = self._index
+        for row, key in enumerate(self._keys, 1):
+            _, position = self._find(key)
+            index[position] = row
+        self._used = len(self._keys)
+
+    def _insert_position(self, key: int, position: int) -> int:
+        """Index position for a new key, growing the index first if it is too full"""
+        if (self._used + 1) * 3 > len(self._index) * 2:
+            self._grow()
+            _, position = self._find(key)
+        return position
+
+    def _link(self, position: int):
+        """Point an index position at the row just appended"""
+        self._index[position] = len(self._keys)
+        self._used += 1
+
+    def _discard(self, number: int) -> bool:
+        row, position = self._find(number)
+        if row < 0:
+            return False
+        self._index[position] = _DELETED
+        # Keep the columns dense: the last row moves into the gap
+        last = len(self._keys) - 1
+        columns = self._columns()
+        if row != last:
+            moved = self._keys[last]
+            _, moved_position = self._find(moved)
+            self._keys[row] = moved
+            for column in columns:
+                column[row] = column[last]
+            self._index[moved_position] = row + 1
+        del self._keys[last]
+        for column in columns:
+            del column[last]
+        return True
+
+    def _clear_rows(self):
+        self._keys = array('q')
+        self._set_index(array('q', bytes(8 * 8)))
+
+    @property
+    def index_nbytes(self) -> int:
+        """Bytes held by the key column and the index"""
+        return (len(self._keys) + len(self._index)) * 8
+
+def pack_columns(*columns: array) -> List[bytes]:
+    """Little-endian bytes of each column, for a snapshot"""
+    parts = []
+    for column in columns:
+        if sys.byteorder == "big" and column.itemsize > 1:
+            column = array(column.typecode, column)
+            column.byteswap()
+        parts.append(column.tobytes())
+    return parts
+
+def unpack_column(typecode: str, buffer) -> array:
+    """A column read back from pack_columns() bytes; the buffer is copied once"""
+    column = array(typecode)
+    column.frombytes(buffer)
+    if sys.byteorder == "big" and column.itemsize > 1:
+        column.byteswap()
+    return column
+
+class SnowflakeMap(SnowflakeRows, MutableMapping):
+    """Dict-like map from ID strings to counts or ID strings, stored as int64 columns.
+
+    Keys (and, with ``str_values``, values) are Discord snowflakes as decimal
+    strings, like the dicts this replaces, but each entry lives as two int64
+    slots in ``array`` columns plus an open-addressing hash index of row
+    numbers. An entry costs about 40 bytes instead of two string objects
+    and a dict slot. Keys or values that would not survive the round trip
+    through an integer ("007", "abc") are kept in a small side dict, so the
+    map stays lossless. The columns can be written to and read back from a
+    binary snapshot without touching individual entries.
+    """
+
+    __slots__ = ("str_values", "_values", "_extra")
+
+    def __init__(self, data=None, str_values: bool = False):
+        super().__init__()
+        self.str_values = str_values
+        self._extra: Dict[str, Any] = {}
+        self._values = array('q')
+        if data:
+            self.update(data)
+
+    def _columns(self) -> Tuple[array, ...]:
+        return (self._values,)
+
+    def _encode(self, value) -> Optional[int]:
+        if self.str_values:
+            return snowflake(value)
+        if type(value) is int and -MAX_SNOWFLAKE <= value <= MAX_SNOWFLAKE:
+            return value
+        return None
+
+    # === Mapping interface ===
+
+    def __len__(self) -> int:
+        return len(self._keys) + len(self._extra)
+
+    def __getitem__(self, key: str):
+        number = snowflake(key)
+        if number is not None:
+            row, _ = self._find(number)
+            if row >= 0:
+                value = self._values[row]
+                return str(value) if self.str_values else value
+        return self._extra[key]
+
+    def get(self, key: str, default=None):
+        number = snowflake(key)
+        if number is not None:
+            row, _ = self._find(number)
+            if row >= 0:
+                value = self._values[row]
+                return str(value) if self.str_values else value
+        if self._extra:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key) -> bool:
+        number = snowflake(key)
+        if number is not None and self._find(number)[0] >= 0:
+            return True
+        return bool(self._extra) and key in self._extra
+
+    def __setitem__(self, key: str, value):
+        number, encoded = snowflake(key), self._encode(value)
+        if number is None or encoded is None:
+            if number is not None:
+                self._discard(number)
+            self._extra[key] = value
+            return
+        if self._extra:
+            self._extra.pop(key, None)
+
+        row, position = self._find(number)
+        if row >= 0:
+            self._values[row] = encoded
+            return
+        position = self._insert_position(number, position)
+        self._keys.append(number)
+        self._values.append(encoded)
+        self._link(position)
+
+    def __delitem__(self, key: str):
+        number = snowflake(key)
+        if number is None or not self._discard(number):
+            del self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        for number in self._keys:
+            yield str(number)
+        yield from list(self._extra)
+
+    def _iter_items(self) -> Iterator[Tuple[str, Any]]:
+        if self.str_values:
+            for number, value in zip(self._keys, self._values):
+                yield str(number), str(value)
+        else:
+            for number, value in zip(self._keys, self._values):
+                yield str(number), value
+        yield from list(self._extra.items())
+
+    def items(self) -> ItemsView:
+        return _Items(self)
+
+    def values(self) -> ValuesView:
+        return _Values(self)
+
+    def update(self, other=(), **kwargs):
+        # Size the index once for the whole batch instead of growing it step by step
+        if isinstance(other, Mapping):
+            rows = len(self._keys) + len(other)
+            if rows * 3 > len(self._index) * 2:
+                self._grow(rows)
+        super().update(other, **kwargs)
+
+    def clear(self):
+        self._clear_rows()
+        self._values = array('q')
+        self._extra = {}
+
+    def copy(self) -> Dict[str, Any]:
+        """A plain dict with the same entries"""
+        return dict(self._iter_items())
+
+    def clone(self) -> "SnowflakeMap":
+        """An independent SnowflakeMap with the same entries; copies the columns, not each entry"""
+        clone = SnowflakeMap(str_values=self.str_values)
+        clone._keys, clone._values = self._keys[:], self._values[:]
+        clone._index, clone._shift, clone._used = self._index[:], self._shift, self._used
+        clone._extra = dict(self._extra)
+        return clone
+
+    def __repr__(self) -> str:
+        return f"SnowflakeMap({len(self)} entries)"
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns and index, not counting the side dict"""
+        return self.index_nbytes + len(self._values) * 8
+
+    # === Binary form ===
+
+    def columns(self) -> Tuple[bytes, bytes, bytes, Dict[str, Any]]:
+        """Little-endian keys, values and index, plus the side dict, for a snapshot"""
+        keys, values, index = pack_columns(self._keys, self._values, self._index)
+        return keys, values, index, dict(self._extra)
+
+    @classmethod
+    def from_columns(cls, keys, values, index, extra: Dict[str, Any], str_values: bool = False) -> "SnowflakeMap":
+        """Rebuild a map from columns(); buffers are copied once, entries are not visited"""
+        keys_column, values_column, index_column = (unpack_column('q', buffer) for buffer in (keys, values, index))
+        capacity = len(index_column)
+        if len(keys_column) != len(values_column) or capacity < 8 or capacity & (capacity - 1):
+            raise ValueError("inconsistent snapshot columns")
+
+        compact = cls(str_values=str_values)
+        compact._keys, compact._values = keys_column, values_column
+        compact._set_index(index_column)
+        compact._extra = dict(extra)
+        return compact
+
+class _Items(ItemsView):
+    def __iter__(self):
+        return self._mapping._iter_items()
+
+class _Values(ValuesView):
+    def __iter__(self):
+        return (value for _, value in self._mapping._iter_items())
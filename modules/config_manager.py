@@ -1,91 +1,297 @@
 import json
+import logging
 import os
 import random
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from modules.guild_styles import GuildStyleMap
+from modules.templates import StyleTemplates, TemplateError, compile_style
+
+logger = logging.getLogger("bot.config")
+
+class ConfigValidationError(ValueError):
+    """A configuration file parsed as JSON but has the wrong shape"""
+
+class StyleEntry(NamedTuple):
+    """A parsed style file, its compiled templates and the file signature"""
+    data: Mapping
+    info: Mapping
+    signature: Tuple[int, int]
+    templates: StyleTemplates
+
+class ConfigSnapshot(NamedTuple):
+    """Everything loaded from config/, swapped in as a single reference.
+
+    Dicts are frozen into read-only mappings and lists into tuples, so a
+    snapshot can be shared between the event loop and worker threads.
+    """
+    main_config: Mapping
+    current_style: str
+    styles: Mapping[str, StyleEntry]
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+def _validate_main_config(config: Any):
+    if not isinstance(config, dict):
+        raise ConfigValidationError("config.json must contain a JSON object")
+    if not isinstance(config.get("current_style", ""), str):
+        raise ConfigValidationError("config.json: current_style must be a string")
+    features = config.get("features", {})
+    if not isinstance(features, dict) or not all(isinstance(v, bool) for v in features.values()):
+        raise ConfigValidationError("config.json: features must map feature names to true/false")
+
+def _validate_style(style_name: str, style: Any):
+    if not isinstance(style, dict):
+        raise ConfigValidationError(f"{style_name}.json must contain a JSON object")
+    for key in ("greetings", "leave_messages"):
+        values = style.get(key, [])
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ConfigValidationError(f"{style_name}.json: {key} must be a list of strings")
+    for key in ("style_info", "embeds", "messages"):
+        values = style.get(key, {})
+        if not isinstance(values, dict) or not all(isinstance(v, str) for v in values.values()):
+            raise ConfigValidationError(f"{style_name}.json: {key} must map keys to strings")
+
+def _style_info(style_name: str, style_data: Dict) -> Dict:
+    info = style_data.get("style_info", {})
+    return {
+        "name": info.get("name", style_name),
+        "description": info.get("description", "No description"),
+        "language": info.get("language", "Unknown"),
+        "tone": info.get("tone", "Unknown")
+    }
+
+class StyleView:
+    """Read-only, preparsed access to one style.
+
+    One view exists per loaded style and is shared by every guild using it.
+    """
+    
+    __slots__ = ("name", "entry", "templates", "_embeds", "_messages", "__weakref__")
+    
+    def __init__(self, name: str, entry: StyleEntry):
+        self.name = name
+        self.entry = entry
+        self.templates = entry.templates
+        self._embeds = entry.data.get("embeds", {})
+        self._messages = entry.data.get("messages", {})
+    
+    @property
+    def info(self) -> Mapping:
+        return self.entry.info
+    
+    def render_greeting(self, **values) -> str:
+        """Render a random greeting with user, inviter and count"""
+        return self.templates.random_greeting().render(values)
+    
+    def render_leave_message(self, **values) -> str:
+        """Render a random leave message with user, inviter and count"""
+        return self.templates.random_leave_message().render(values)
+    
+    def render_message(self, key: str, **values) -> str:
+        """Render a message template by key"""
+        template = self.templates.messages.get(key)
+        return template.render(values) if template is not None else key
+    
+    def get_embed_title(self, key: str) -> str:
+        """Get embed title by key"""
+        return self._embeds.get(key, key)
+    
+    def get_message(self, key: str) -> str:
+        """Get message by key"""
+        return self._messages.get(key, key)
 
 class ConfigManager:
-    def __init__(self, default_style: str = "casual_ru"):
+    def __init__(self, default_style: str = "casual_ru", guild_styles_path: str = "data/guild_styles.json"):
         self.default_style = default_style
-        self.current_style = default_style
         self.config_dir = "config"
         self.styles_dir = os.path.join(self.config_dir, "styles")
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._views: Dict[str, StyleView] = {}
+        
+        # Per-guild style overrides
+        self.guild_styles = GuildStyleMap(guild_styles_path)
+        self.guild_styles.load()
         
         # Load configuration
         self.reload_config()
     
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        return self._snapshot
+    
+    @property
+    def main_config(self) -> Mapping:
+        return self._snapshot.main_config
+    
+    @property
+    def current_style(self) -> str:
+        return self._snapshot.current_style
+    
+    @property
+    def style_config(self) -> Mapping:
+        return self._snapshot.styles[self._snapshot.current_style].data
+    
     def reload_config(self):
-        """Reload all configuration files"""
+        """Reload all configuration files and swap them in at once"""
         try:
-            # Load main config
-            main_config_path = os.path.join(self.config_dir, "config.json")
-            with open(main_config_path, 'r', encoding='utf-8') as f:
-                self.main_config = json.load(f)
-            
-            self.current_style = self.main_config.get("current_style", self.default_style)
-            
-            # Load style config
-            style_config_path = os.path.join(self.styles_dir, f"{self.current_style}.json")
-            with open(style_config_path, 'r', encoding='utf-8') as f:
-                self.style_config = json.load(f)
-                
-            print(f"✅ Configuration loaded for style: {self.current_style}")
-            
+            self.install_snapshot(self.load_snapshot())
         except FileNotFoundError as e:
-            print(f"❌ Configuration file not found: {e}")
-            print("Please ensure all config files are present in the config directory")
+            logger.error(f"❌ Configuration file not found: {e}")
+            logger.error("Please ensure all config files are present in the config directory")
             raise
         except json.JSONDecodeError as e:
-            print(f"❌ Invalid JSON in configuration file: {e}")
+            logger.error(f"❌ Invalid JSON in configuration file: {e}")
+            raise
+        except ConfigValidationError as e:
+            logger.error(f"❌ Invalid configuration: {e}")
             raise
     
-    def get_available_styles(self) -> List[str]:
-        """Get list of available communication styles"""
+    def load_snapshot(self) -> ConfigSnapshot:
+        """Parse and validate config files into a new snapshot without installing it.
+        
+        Only reads the current snapshot, so it is safe to run in a worker thread.
+        """
+        # Load main config
+        main_config_path = os.path.join(self.config_dir, "config.json")
+        with open(main_config_path, 'r', encoding='utf-8') as f:
+            main_config = json.load(f)
+        _validate_main_config(main_config)
+        
+        current_style = main_config.get("current_style", self.default_style)
+        styles = self._build_style_registry(current_style)
+        if current_style not in styles:
+            raise FileNotFoundError(f"Style file not found: {os.path.join(self.styles_dir, current_style + '.json')}")
+        return ConfigSnapshot(_freeze(main_config), current_style, MappingProxyType(styles))
+    
+    def install_snapshot(self, snapshot: ConfigSnapshot):
+        """Swap in a loaded snapshot"""
+        # Views of unchanged style files carry over
+        views = {}
+        for name, entry in snapshot.styles.items():
+            view = self._views.get(name)
+            views[name] = view if view is not None and view.entry is entry else StyleView(name, entry)
+        
+        # Readers see either the old snapshot or the new one, never a mix
+        self._views = views
+        self._snapshot = snapshot
+        logger.info(f"✅ Configuration loaded for style: {snapshot.current_style}")
+    
+    def _build_style_registry(self, current_style: str) -> Dict[str, StyleEntry]:
+        """Parse every style file, reusing entries whose file is unchanged"""
+        previous = self._snapshot.styles if self._snapshot else {}
+        styles = {}
         if not os.path.exists(self.styles_dir):
-            return []
+            return styles
         
-        styles = []
-        for file in os.listdir(self.styles_dir):
-            if file.endswith('.json'):
-                styles.append(file[:-5])  # Remove .json extension
+        for entry in os.scandir(self.styles_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            style_name = entry.name[:-5]  # Remove .json extension
+            stat = entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            
+            cached = previous.get(style_name)
+            if cached is not None and cached.signature == signature:
+                styles[style_name] = cached
+                continue
+            
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    style_data = json.load(f)
+                _validate_style(style_name, style_data)
+                templates = compile_style(style_name, style_data)
+            except TemplateError as e:
+                if style_name == current_style:
+                    raise ConfigValidationError(str(e)) from None
+                logger.warning(f"⚠️ Skipping invalid style {style_name}: {e}")
+                continue
+            except (json.JSONDecodeError, ConfigValidationError) as e:
+                if style_name == current_style:
+                    raise
+                logger.warning(f"⚠️ Skipping invalid style {style_name}: {e}")
+                continue
+            styles[style_name] = StyleEntry(
+                _freeze(style_data), _freeze(_style_info(style_name, style_data)), signature, templates
+            )
         return styles
     
-    def get_style_info(self, style_name: str) -> Dict:
+    def get_available_styles(self) -> List[str]:
+        """Get list of available communication styles"""
+        return sorted(self._snapshot.styles)
+    
+    def get_style_info(self, style_name: str) -> Mapping:
         """Get information about a specific style"""
-        try:
-            style_path = os.path.join(self.styles_dir, f"{style_name}.json")
-            with open(style_path, 'r', encoding='utf-8') as f:
-                style_data = json.load(f)
-                return {
-                    "name": style_data.get("style_info", {}).get("name", style_name),
-                    "description": style_data.get("style_info", {}).get("description", "No description"),
-                    "language": style_data.get("style_info", {}).get("language", "Unknown"),
-                    "tone": style_data.get("style_info", {}).get("tone", "Unknown")
-                }
-        except:
+        entry = self._snapshot.styles.get(style_name)
+        if entry is None:
             return {"name": style_name, "description": "Unknown style", "language": "Unknown", "tone": "Unknown"}
+        return entry.info
     
     def set_style(self, style: str) -> bool:
         """Set current communication style"""
-        if style not in self.get_available_styles():
+        if style not in self._snapshot.styles:
             return False
         
-        self.current_style = style
-        
         # Update main config file
-        self.main_config["current_style"] = style
+        main_config = _thaw(self.main_config)
+        main_config["current_style"] = style
         main_config_path = os.path.join(self.config_dir, "config.json")
         
         try:
             with open(main_config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.main_config, f, ensure_ascii=False, indent=4)
+                json.dump(main_config, f, ensure_ascii=False, indent=4)
             
-            # Reload style config
+            # Reload config; unchanged style files are not parsed again
             self.reload_config()
             return True
         except Exception as e:
-            print(f"❌ Error saving style setting: {e}")
+            logger.error(f"❌ Error saving style setting: {e}")
             return False
     
+    def for_guild(self, guild_id: Optional[int]) -> StyleView:
+        """Style view for a guild: its override if set, else the default style"""
+        views = self._views
+        view = views.get(self.guild_styles.get(guild_id))
+        return view if view is not None else views[self._snapshot.current_style]
+    
+    def set_guild_style(self, guild_id: int, style: Optional[str]) -> bool:
+        """Set a guild's style, or return it to the default with None"""
+        if style is not None and style not in self._views:
+            return False
+        self.guild_styles.set(guild_id, style)
+        logger.info(f"🎨 Style for server {guild_id} set to {style or 'default'}")
+        return True
+    
+    @property
+    def templates(self) -> StyleTemplates:
+        """Compiled templates of the default style"""
+        return self.for_guild(None).templates
+    
+    def render_greeting(self, **values) -> str:
+        """Render a random greeting in the default style"""
+        return self.for_guild(None).render_greeting(**values)
+    
+    def render_leave_message(self, **values) -> str:
+        """Render a random leave message in the default style"""
+        return self.for_guild(None).render_leave_message(**values)
+    
+    def render_message(self, key: str, **values) -> str:
+        """Render a message template of the default style by key"""
+        return self.for_guild(None).render_message(key, **values)
+    
     def get_random_greeting(self) -> str:
         """Get random greeting message"""
         greetings = self.style_config.get("greetings", [])
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Optional, Tuple
+
+from modules.config_manager import ConfigManager, ConfigValidationError
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger("bot.config")
+
+class _ChangeHandler(FileSystemEventHandler):
+    """Forward JSON file events from the observer thread to the event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, changed: asyncio.Event):
+        self.loop = loop
+        self.changed = changed
+
+    def on_any_event(self, event):
+        paths = (event.src_path, getattr(event, "dest_path", ""))
+        if any(str(path).endswith(".json") for path in paths):
+            self.loop.call_soon_threadsafe(self.changed.set)
+
+class ConfigWatcher:
+    """Reload configuration automatically when files in config/ change.
+
+    Uses inotify through the optional ``watchdog`` package and otherwise polls
+    file modification times every ``interval`` seconds. Bursts of edits are
+    debounced, files are parsed and validated in a worker thread, and the new
+    snapshot is swapped into the ConfigManager on the event loop. If the new
+    files are invalid, the previous snapshot stays active.
+    """
+
+    def __init__(self, config_manager: ConfigManager, interval: float = 2.0, debounce: float = 0.5):
+        self.config_manager = config_manager
+        self.interval = interval
+        self.debounce = debounce
+
+        self._changed: Optional[asyncio.Event] = None
+        self._observer = None
+        self._tasks = []
+        self.reloads = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        """Start watching; calling it again while running does nothing"""
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
+        if Observer is not None:
+            try:
+                observer = Observer()
+                handler = _ChangeHandler(loop, self._changed)
+                observer.schedule(handler, self.config_manager.config_dir, recursive=True)
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+            except Exception as e:
+                logger.warning(f"⚠️ File watcher unavailable, polling config instead: {e}")
+                self._observer = None
+
+        if self._observer is None:
+            self._tasks.append(loop.create_task(self._poll()))
+        self._tasks.append(loop.create_task(self._run()))
+        mode = "inotify" if self._observer is not None else f"polling every {self.interval}s"
+        logger.info(f"🔄 Watching configuration for changes ({mode})")
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+        self._tasks = []
+
+    def _signature(self) -> Tuple:
+        """Modification times and sizes of every config file"""
+        paths = [os.path.join(self.config_manager.config_dir, "config.json")]
+        styles_dir = self.config_manager.styles_dir
+        if os.path.isdir(styles_dir):
+            paths.extend(os.path.join(styles_dir, name) for name in sorted(os.listdir(styles_dir))
+                         if name.endswith(".json"))
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        previous = await loop.run_in_executor(None, self._signature)
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                current = await loop.run_in_executor(None, self._signature)
+            except Exception as e:
+                logger.error(f"❌ Error polling configuration files: {e}")
+                continue
+            if current != previous:
+                previous = current
+                self._changed.set()
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            # Editors often write a file in several steps; wait for quiet
+            while True:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.debounce)
+                except asyncio.TimeoutError:
+                    break
+            await self.reload()
+
+    async def reload(self) -> bool:
+        """Parse config in a worker thread and install it; returns False on error"""
+        loop = asyncio.get_running_loop()
+        try:
+            snapshot = await loop.run_in_executor(None, self.config_manager.load_snapshot)
+        except (OSError, json.JSONDecodeError, ConfigValidationError) as e:
+            self.failures += 1
+            logger.error(f"❌ Configuration change rejected, keeping previous config: {e}")
+            return False
+
+        current = self.config_manager.snapshot
+        if (snapshot.main_config == current.main_config
+                and snapshot.styles.keys() == current.styles.keys()
+                and all(snapshot.styles[name] is current.styles[name] for name in snapshot.styles)):
+            return True
+        self.config_manager.install_snapshot(snapshot)
+        self.reloads += 1
+        logger.info("🔄 Configuration reloaded from disk", extra={"event": "config_reload"})
+        return True
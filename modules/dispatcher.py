@@ -0,0 +1,349 @@
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import discord
+
+from modules.instrumentation import instruments
+
+logger = logging.getLogger("bot.actions")
+
+class Priority(IntEnum):
+    """Dispatcher lanes, most important first"""
+    ROLE = 0
+    MESSAGE = 1
+    LOOKUP = 2
+
+class ActionDropped(Exception):
+    """The action was shed because the dispatcher queue was full"""
+
+# Route kind -> (requests per second, burst), or None to send freely and only
+# back off after a 429; routes are named "<kind>:<id>"
+RouteLimit = Optional[Tuple[float, int]]
+DEFAULT_ROUTE_LIMITS: Dict[str, RouteLimit] = {
+    "roles": None,           # member role edits per guild
+    "channel": (1.0, 5),     # messages per channel: Discord allows 5 per 5 seconds
+    "users": None,           # user fetches
+}
+FALLBACK_ROUTE_LIMIT: RouteLimit = None
+
+def parse_route_limits(text: str) -> Dict[str, RouteLimit]:
+    """Parse ``"roles=10/10,channel=5/5,users=off"`` (requests/seconds per route kind)"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        kind, _, value = item.partition("=")
+        value = value.strip().lower()
+        if value in ("off", "none", "0", ""):
+            limits[kind.strip()] = None
+            continue
+        requests, _, seconds = value.partition("/")
+        requests, seconds = int(requests), float(seconds or 1)
+        if requests <= 0 or seconds <= 0:
+            raise ValueError(f"invalid route limit {item!r}")
+        limits[kind.strip()] = (requests / seconds, requests)
+    return limits
+
+class TokenBucket:
+    """Refilling request budget for one route; a ``rate`` of None only pauses after a 429"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at", "paused_until")
+
+    def __init__(self, rate: Optional[float], capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a request may be sent"""
+        paused = max(0.0, self.paused_until - now)
+        if self.rate is None:
+            return paused
+        self._refill(now)
+        return max(paused, 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate)
+
+    def take(self, now: float):
+        if self.rate is None:
+            return
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds: float, now: float):
+        """Keep the route quiet for ``seconds`` after a 429"""
+        self.paused_until = max(self.paused_until, now + seconds)
+
+class _Action:
+    __slots__ = ("priority", "route", "factory", "name", "future", "enqueued_at", "ready_at", "attempt")
+
+    def __init__(self, priority: Priority, route: str, factory: Callable[[], Awaitable], name: str,
+                 future: Optional[asyncio.Future]):
+        self.priority = priority
+        self.route = route
+        self.factory = factory
+        self.name = name
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.ready_at = 0.0
+        self.attempt = 0
+
+class _Lane:
+    """One priority level: a FIFO queue per route, served round-robin"""
+
+    __slots__ = ("routes", "depth")
+
+    def __init__(self):
+        self.routes: "OrderedDict[str, Deque[_Action]]" = OrderedDict()
+        self.depth = 0
+
+    def push(self, action: _Action, front: bool = False):
+        queue = self.routes.get(action.route)
+        if queue is None:
+            queue = self.routes[action.route] = deque()
+        if front:
+            queue.appendleft(action)
+        else:
+            queue.append(action)
+        self.depth += 1
+
+    def pop(self, route: str) -> _Action:
+        """Take the head of ``route`` and move the route to the back of the rotation"""
+        queue = self.routes[route]
+        action = queue.popleft()
+        if queue:
+            self.routes.move_to_end(route)
+        else:
+            del self.routes[route]
+        self.depth -= 1
+        return action
+
+    def pop_oldest(self) -> _Action:
+        route = min(self.routes, key=lambda name: self.routes[name][0].enqueued_at)
+        queue = self.routes[route]
+        action = queue.popleft()
+        if not queue:
+            del self.routes[route]
+        self.depth -= 1
+        return action
+
+class ActionDispatcher:
+    """Central queue for outbound Discord requests.
+
+    Actions wait in one lane per Priority and are started highest lane first,
+    with at most ``concurrency`` requests in flight. Inside a lane every
+    route has its own queue and routes take turns, so a route that is out of
+    budget (one guild's role edits, say) never holds up the others. Routes
+    are only paced where ``route_limits`` gives them a budget; every route
+    backs off for the retry-after of a 429. When ``max_depth`` actions are
+    queued, the oldest action of the lowest non-empty lane below the new
+    one is shed, or the new action itself if nothing less important is
+    queued. Rate limits, server errors and timeouts are retried up to
+    ``max_retries`` times with jittered exponential backoff.
+    """
+
+    def __init__(self, max_depth: int = 1000, concurrency: int = 4, max_retries: int = 3, base_delay: float = 1.0,
+                 route_limits: Optional[Dict[str, RouteLimit]] = None):
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.route_limits = dict(DEFAULT_ROUTE_LIMITS)
+        if route_limits:
+            self.route_limits.update(route_limits)
+
+        self._lanes: List[_Lane] = [_Lane() for _ in Priority]
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = set()
+
+        # Metrics, indexed by lane
+        self.submitted = [0] * len(Priority)
+        self.completed = [0] * len(Priority)
+        self.failed = [0] * len(Priority)
+        self.dropped = [0] * len(Priority)
+        self.retried = 0
+        self._wait_total = [0.0] * len(Priority)
+        self._wait_max = [0.0] * len(Priority)
+        self._started = [0] * len(Priority)
+
+    def start(self):
+        """Start the scheduler on the running event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        for task in list(self._running):
+            if not task.done():
+                task.cancel()
+
+    @property
+    def depth(self) -> int:
+        return sum(lane.depth for lane in self._lanes)
+
+    # === Submitting ===
+
+    def submit(self, priority: Priority, route: str, factory: Callable[[], Awaitable], name: str = "action") -> bool:
+        """Queue a fire-and-forget action; returns False if it was shed"""
+        return self._enqueue(_Action(priority, route, factory, name, None))
+
+    async def call(self, priority: Priority, route: str, factory: Callable[[], Awaitable], name: str = "action") -> Any:
+        """Queue an action and wait for its result; raises ActionDropped if shed"""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(_Action(priority, route, factory, name, future))
+        return await future
+
+    def _enqueue(self, action: _Action) -> bool:
+        lane = action.priority
+        self.submitted[lane] += 1
+        if self.depth >= self.max_depth and not self._shed_below(lane):
+            self._drop(action)
+            return False
+        self._lanes[lane].push(action)
+        if self._wake is not None:
+            self._wake.set()
+        return True
+
+    def _shed_below(self, lane: int) -> bool:
+        """Drop the oldest action of the least important lane below ``lane``"""
+        for lower in range(len(self._lanes) - 1, lane, -1):
+            if self._lanes[lower].depth:
+                self._drop(self._lanes[lower].pop_oldest())
+                return True
+        return False
+
+    def _drop(self, action: _Action):
+        self.dropped[action.priority] += 1
+        logger.warning(f"⚠️ Action queue full, dropped {action.name} on {action.route}")
+        if action.future is not None and not action.future.done():
+            action.future.set_exception(ActionDropped(action.name))
+
+    # === Scheduling ===
+
+    def _bucket(self, route: str) -> TokenBucket:
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            limit = self.route_limits.get(route.split(":", 1)[0], FALLBACK_ROUTE_LIMIT)
+            bucket = self._buckets[route] = TokenBucket(*limit) if limit else TokenBucket(None, 0)
+        return bucket
+
+    def _next_ready(self, now: float) -> Tuple[Optional[_Action], Optional[float]]:
+        """Pick the first startable action, or the time until one could start"""
+        wait = None
+        for lane in self._lanes:
+            # Only a route's head may start, which keeps each route in order
+            for route, queue in lane.routes.items():
+                bucket = self._bucket(route)
+                delay = max(queue[0].ready_at - now, bucket.wait_time(now))
+                if delay <= 0:
+                    bucket.take(now)
+                    return lane.pop(route), None
+                wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            while True:
+                action, wait = self._next_ready(time.monotonic())
+                if action is not None:
+                    break
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            lane = action.priority
+            waited = time.monotonic() - action.enqueued_at
+            self._started[lane] += 1
+            self._wait_total[lane] += waited
+            self._wait_max[lane] = max(self._wait_max[lane], waited)
+
+            task = asyncio.get_running_loop().create_task(self._execute(action))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _execute(self, action: _Action):
+        try:
+            with instruments.rest(action.route.split(":", 1)[0]):
+                result = await action.factory()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._handle_failure(action, e)
+        else:
+            self.completed[action.priority] += 1
+            if action.future is not None and not action.future.done():
+                action.future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def _handle_failure(self, action: _Action, error: Exception):
+        retry_after = self._retry_delay(action, error)
+        if retry_after is not None and action.attempt < self.max_retries:
+            action.attempt += 1
+            action.ready_at = time.monotonic() + retry_after
+            self.retried += 1
+            logger.debug(f"🔄 Retrying {action.name} on {action.route} in {retry_after:.1f}s: {error}")
+            # Retries go to the front of their route to keep its order
+            self._lanes[action.priority].push(action, front=True)
+            self._wake.set()
+            return
+
+        self.failed[action.priority] += 1
+        if action.future is None:
+            logger.error(f"❌ {action.name} on {action.route} failed: {error}")
+        elif not action.future.done():
+            # The caller awaiting the result handles the error
+            action.future.set_exception(error)
+
+    def _retry_delay(self, action: _Action, error: Exception) -> Optional[float]:
+        """Backoff before retrying, or None if the error is permanent"""
+        backoff = random.uniform(0, self.base_delay * 2 ** action.attempt)
+        if isinstance(error, discord.HTTPException):
+            if error.status == 429:
+                retry_after = float(getattr(error, "retry_after", 0) or self.base_delay)
+                self._bucket(action.route).pause(retry_after, time.monotonic())
+                return retry_after + backoff / 2
+            return backoff if error.status >= 500 else None
+        if isinstance(error, (OSError, asyncio.TimeoutError)):
+            return backoff
+        return None
+
+    def metrics(self) -> Dict:
+        """Queue depth, wait times and drop counters per lane"""
+        lanes = {}
+        for lane in Priority:
+            started = self._started[lane]
+            lanes[lane.name.lower()] = {
+                "depth": self._lanes[lane].depth,
+                "routes": len(self._lanes[lane].routes),
+                "submitted": self.submitted[lane],
+                "completed": self.completed[lane],
+                "failed": self.failed[lane],
+                "dropped": self.dropped[lane],
+                "avg_wait_ms": round(self._wait_total[lane] / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._wait_max[lane] * 1000, 2),
+            }
+        return {
+            "depth": self.depth,
+            "in_flight": len(self._running),
+            "retried": self.retried,
+            "dropped": sum(self.dropped),
+            "lanes": lanes,
+        }
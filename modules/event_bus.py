@@ -0,0 +1,176 @@
+import asyncio
+import itertools
+import logging
+from typing import Callable, Dict, List, Optional
+
+from modules.instrumentation import instruments
+
+logger = logging.getLogger("bot.events")
+
+DEFAULT_PRIORITY = 100
+# Sentinel: use the bus-wide default timeout
+DEFAULT_TIMEOUT = object()
+
+class Listener:
+    """One registered callback for one event"""
+
+    __slots__ = ("event", "name", "callback", "priority", "concurrent", "timeout", "order",
+                 "calls", "errors", "timeouts")
+
+    def __init__(self, event: str, name: str, callback: Callable, priority: int, concurrent: bool,
+                 timeout: Optional[float], order: int):
+        self.event = event
+        self.name = name
+        self.callback = callback
+        self.priority = priority
+        self.concurrent = concurrent
+        self.timeout = timeout
+        self.order = order
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    @property
+    def sort_key(self):
+        return (self.priority, self.order)
+
+class EventBus:
+    """Fan gateway events out to listeners registered by any module.
+
+    The bus owns the bot's ``on_<event>`` handler for every event it has
+    listeners for, so modules no longer replace each other's handlers. On
+    each event, sequential listeners run one after another in priority
+    order (lowest first), while concurrent listeners run alongside that
+    chain with ``asyncio.gather``. Every listener has its own timeout, and
+    a listener that raises or times out is logged and counted without
+    affecting the others.
+    """
+
+    def __init__(self, bot, default_timeout: Optional[float] = 30.0):
+        self.bot = bot
+        self.default_timeout = default_timeout
+        self._listeners: Dict[str, List[Listener]] = {}
+        self._order = itertools.count()
+        self.dispatched: Dict[str, int] = {}
+
+    def listen(self, event: Optional[str] = None, priority: int = DEFAULT_PRIORITY, concurrent: bool = True,
+               timeout=DEFAULT_TIMEOUT, name: Optional[str] = None):
+        """Decorator form of add_listener; the event defaults to the function name without ``on_``"""
+        def decorator(callback: Callable) -> Callable:
+            self.add_listener(callback, event, priority, concurrent, timeout, name)
+            return callback
+        return decorator
+
+    def add_listener(self, callback: Callable, event: Optional[str] = None, priority: int = DEFAULT_PRIORITY,
+                     concurrent: bool = True, timeout=DEFAULT_TIMEOUT, name: Optional[str] = None) -> Listener:
+        """Register ``callback``; a listener with the same name on the same event is replaced"""
+        if not asyncio.iscoroutinefunction(callback):
+            raise TypeError(f"listener {callback!r} must be a coroutine function")
+        event = event or callback.__name__
+        event = event[3:] if event.startswith("on_") else event
+        name = name or f"{callback.__module__.rsplit('.', 1)[-1].strip('_')}.{callback.__name__}"
+        self._install(event)
+
+        listeners = self._listeners[event]
+        listeners[:] = [listener for listener in listeners if listener.name != name]
+        listener = Listener(
+            event, name, instruments.wrap("listener", f"{event}:{name}", callback), priority, concurrent,
+            self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout, next(self._order)
+        )
+        listeners.append(listener)
+        listeners.sort(key=lambda item: item.sort_key)
+        logger.debug(f"✅ Registered {'concurrent' if concurrent else 'sequential'} listener {name} "
+                     f"for {event} (priority {priority})")
+        return listener
+
+    def remove_listener(self, event: str, name: str) -> bool:
+        listeners = self._listeners.get(event, [])
+        remaining = [listener for listener in listeners if listener.name != name]
+        removed = len(remaining) != len(listeners)
+        listeners[:] = remaining
+        return removed
+
+    def listeners(self, event: str) -> List[Listener]:
+        return list(self._listeners.get(event, ()))
+
+    def _install(self, event: str):
+        """Take over the bot's handler for ``event`` the first time it gets a listener"""
+        if event in self._listeners:
+            return
+        self._listeners[event] = []
+        handler_name = f"on_{event}"
+
+        # A handler registered with @bot.event before the bus existed stays as a listener
+        existing = vars(self.bot).get(handler_name)
+        if existing is not None and asyncio.iscoroutinefunction(existing):
+            name = f"bot.{handler_name}"
+            self._listeners[event].append(
+                Listener(event, name, instruments.wrap("listener", f"{event}:{name}", existing), DEFAULT_PRIORITY,
+                         False, self.default_timeout, next(self._order))
+            )
+
+        async def dispatch(*args, **kwargs):
+            await self.dispatch(event, *args, **kwargs)
+        dispatch.__name__ = dispatch.__qualname__ = handler_name
+        self.bot.event(instruments.wrap("event", handler_name, dispatch))
+
+    # === Dispatching ===
+
+    async def dispatch(self, event: str, *args, **kwargs):
+        """Run every listener of ``event``; never raises on behalf of a listener"""
+        self.dispatched[event] = self.dispatched.get(event, 0) + 1
+        # Listeners added while this event runs (e.g. by setup in on_ready) start with the next one
+        listeners = self.listeners(event)
+        if not listeners:
+            return
+
+        sequential = [listener for listener in listeners if not listener.concurrent]
+        concurrent = [listener for listener in listeners if listener.concurrent]
+        if not concurrent:
+            await self._run_chain(sequential, args, kwargs)
+        elif not sequential and len(concurrent) == 1:
+            await self._run(concurrent[0], args, kwargs)
+        else:
+            await asyncio.gather(self._run_chain(sequential, args, kwargs),
+                                 *(self._run(listener, args, kwargs) for listener in concurrent))
+
+    async def _run_chain(self, listeners: List[Listener], args, kwargs):
+        for listener in listeners:
+            await self._run(listener, args, kwargs)
+
+    async def _run(self, listener: Listener, args, kwargs):
+        listener.calls += 1
+        try:
+            if listener.timeout is None:
+                await listener.callback(*args, **kwargs)
+            else:
+                await asyncio.wait_for(listener.callback(*args, **kwargs), listener.timeout)
+        except asyncio.TimeoutError:
+            listener.timeouts += 1
+            logger.warning(f"⚠️ Listener {listener.name} for {listener.event} timed out after {listener.timeout:g}s",
+                           extra={"event": "listener_timeout"})
+        except Exception:
+            listener.errors += 1
+            logger.exception(f"❌ Listener {listener.name} for {listener.event} failed",
+                             extra={"event": "listener_error"})
+
+    def metrics(self) -> Dict:
+        """Dispatch counts per event and call/error/timeout counters per listener"""
+        return {
+            "dispatched": sum(self.dispatched.values()),
+            "listeners": {
+                f"{listener.event}:{listener.name}": {
+                    "calls": listener.calls,
+                    "errors": listener.errors,
+                    "timeouts": listener.timeouts,
+                }
+                for listeners in self._listeners.values() for listener in listeners
+            },
+        }
+
+def get_event_bus(bot, **options) -> EventBus:
+    """The bot's event bus, created with ``options`` on first use"""
+    bus = getattr(bot, "event_bus", None)
+    if bus is None:
+        bus = bot.event_bus = EventBus(bot, **options)
+    return bus
@@ -0,0 +1,373 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from modules.invite_store import InviteStore
+from modules.ledger import Deltas, InviteeLedger
+from modules.leaderboard import RankIndex
+from modules.shared_store import SharedInviteDB
+
+logger = logging.getLogger("bot.invites.state")
+
+class GuildInviteState:
+    """Invite data for one guild, backed by its own storage partition.
+
+    Count changes go through this class so the guild's ranking index stays
+    in step with the store. Joins and leaves go through the invitee ledger,
+    which decides when an invite starts and stops counting.
+    """
+
+    def __init__(self, guild_id: int, store: InviteStore, valid_after: float = 0.0):
+        self.guild_id = guild_id
+        self.store = store
+        self.ranking = RankIndex(store.invite_counts)
+        self.ledger = InviteeLedger(store.invitees, valid_after, on_change=store.touch_invitee)
+
+    @property
+    def invite_counts(self):
+        return self.store.invite_counts
+
+    @property
+    def invited_by(self) -> Dict[str, str]:
+        return self.store.invited_by
+
+    @property
+    def is_dirty(self) -> bool:
+        return self.store.pending_count > 0
+
+    def increment(self, user_id: str, delta: int = 1) -> int:
+        """Adjust a user's invite count and return the new value"""
+        old = self.invite_counts.get(user_id, 0)
+        count = self.store.increment(user_id, delta)
+        self.ranking.update(user_id, old, count)
+        return count
+
+    def set_count(self, user_id: str, count: int):
+        old = self.invite_counts.get(user_id, 0)
+        self.store.set_count(user_id, count)
+        self.ranking.update(user_id, old, count)
+
+    def set_inviter(self, member_id: str, inviter_id: Optional[str]):
+        self.store.set_inviter(member_id, inviter_id)
+
+    def _apply_deltas(self, deltas: Deltas):
+        for inviter_id, delta in deltas:
+            self.increment(inviter_id, delta)
+
+    def member_joined(self, member_id: str, inviter_id: Optional[str], joined_at: Optional[float] = None) -> int:
+        """Record a join or rejoin; returns the inviter's count afterwards"""
+        if inviter_id is None:
+            # Unattributed joins are not stored, unless they replace an earlier record
+            if member_id in self.ledger.records:
+                self._apply_deltas(self.ledger.join(member_id, None, joined_at))
+            if member_id in self.invited_by:
+                self.set_inviter(member_id, None)
+            return 0
+        self._apply_deltas(self.ledger.join(member_id, inviter_id, joined_at))
+        self.set_inviter(member_id, inviter_id)
+        return self.invite_counts.get(inviter_id, 0)
+
+    def member_left(self, member_id: str) -> Tuple[Optional[str], int]:
+        """Record a leave; returns the inviter, if known, and their count afterwards"""
+        inviter_id = self.invited_by.get(member_id)
+        deltas = self.ledger.leave(member_id)
+        if deltas is None:
+            # Joined before the ledger existed: the invite counted right away
+            deltas = [(inviter_id, -1)] if inviter_id else []
+        self._apply_deltas(deltas)
+        if inviter_id:
+            self.set_inviter(member_id, None)
+        return inviter_id, self.invite_counts.get(inviter_id, 0) if inviter_id else 0
+
+    def mature(self, now: Optional[float] = None) -> List[str]:
+        """Credit invitees that stayed long enough; returns inviters whose count grew"""
+        deltas = self.ledger.mature(now)
+        self._apply_deltas(deltas)
+        return list({inviter_id for inviter_id, _ in deltas})
+
+    def refresh(self) -> bool:
+        """Pick up changes other processes wrote to a shared store; True if anything changed"""
+        changes = self.store.refresh()
+        if changes is None:
+            return False
+        if changes.full:
+            self.ranking = RankIndex(self.store.invite_counts)
+        else:
+            for user_id, old in changes.counts.items():
+                self.ranking.update(user_id, old, self.invite_counts.get(user_id, 0))
+        if changes.invitees:
+            self.ledger.rebuild()
+        return True
+
+    def clear(self):
+        self.store.clear()
+        self.ranking.clear()
+        self.ledger.clear()
+
+    def apply_batch(self, invite_counts: Dict[str, int], invited_by: Dict[str, str], replace: bool = False):
+        """Apply imported data in one step; see InviteStore.apply_batch"""
+        if replace:
+            previous = {}
+        else:
+            previous = {user_id: self.invite_counts.get(user_id, 0) for user_id in invite_counts}
+        self.store.apply_batch(invite_counts, invited_by, replace)
+        if replace:
+            self.ranking.clear()
+            self.ledger.clear()
+        for user_id, count in invite_counts.items():
+            self.ranking.update(user_id, previous.get(user_id, 0), count)
+
+    def close(self):
+        self.store.close()
+
+class GuildStateRegistry:
+    """Lazily loaded per-guild invite state with LRU eviction.
+
+    Each guild's data lives in its own partition under ``data_dir`` and is
+    only loaded when the guild is active. Once more than ``max_active``
+    guilds are loaded, the least recently used clean ones are paged out after
+    each write-behind flush, so memory follows active guilds rather than
+    total history.
+
+    Partitions are read in a worker thread by ``ensure_loaded()``; events
+    for a guild that arrive during its load wait for the same read.
+
+    With a ``database``, every guild lives in the shared SQLite store
+    instead, and ``get()`` picks up other processes' changes at most every
+    ``refresh_interval`` seconds.
+
+    When each guild's earliest waiting invite is due is kept in a small
+    index file, so guilds that were paged out or not loaded since a restart
+    are loaded again by ``due_states()`` when their invites may count.
+    """
+
+    LEGACY_MARKER = ".legacy_adopted"
+    DUE_FILE = "credits_due.json"
+
+    def __init__(self, data_dir: str = "data/guilds", max_active: int = 100,
+                 legacy_dir: str = "data", legacy_guild_id: Optional[int] = None, valid_after: float = 0.0,
+                 database: Optional[SharedInviteDB] = None, refresh_interval: float = 1.0,
+                 due_file: Optional[str] = None):
+        self.data_dir = data_dir
+        self.max_active = max_active
+        self.valid_after = valid_after
+        self.legacy_dir = legacy_dir
+        self.legacy_guild_id = legacy_guild_id
+        self.database = database
+        self.refresh_interval = refresh_interval
+        self.on_dirty: Optional[Callable[[InviteStore], None]] = None
+
+        self._states: "OrderedDict[int, GuildInviteState]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Future] = {}
+        # Two guilds loading at once must not both claim the legacy data
+        self._adopt_lock = threading.Lock()
+        self._checked_at: Dict[int, float] = {}
+        self.due_path = os.path.join(data_dir, due_file or self.DUE_FILE)
+        # guild_id -> when its earliest waiting invite is due
+        self._due: Dict[int, float] = self._read_due()
+        self._due_dirty = False
+        self.loads = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def get(self, guild_id: int) -> GuildInviteState:
+        """Get a guild's state, loading its partition on first use.
+
+        The load blocks; event handlers use ``ensure_loaded()`` instead.
+        """
+        state = self._states.get(guild_id)
+        if state is not None:
+            self._states.move_to_end(guild_id)
+            if self.database is not None:
+                now = time.monotonic()
+                if now - self._checked_at.get(guild_id, 0.0) >= self.refresh_interval:
+                    self._checked_at[guild_id] = now
+                    self.refreshes += state.refresh()
+            return state
+        return self._register(self._open(guild_id))
+
+    async def ensure_loaded(self, guild_id: int) -> GuildInviteState:
+        """Get a guild's state, reading its partition off the event loop on first use"""
+        if guild_id in self._states:
+            return self.get(guild_id)
+
+        # Events arriving while the partition is read wait for the same load
+        loading = self._loading.get(guild_id)
+        if loading is None:
+            loading = self._loading[guild_id] = asyncio.ensure_future(self._load(guild_id))
+            loading.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, guild_id: int) -> GuildInviteState:
+        state = await asyncio.get_running_loop().run_in_executor(None, self._open, guild_id)
+        return self._register(state)
+
+    def _open(self, guild_id: int) -> GuildInviteState:
+        """Read a guild's partition, adopting older data first; safe to run in a worker thread"""
+        partition_dir = os.path.join(self.data_dir, str(guild_id))
+        with self._adopt_lock:
+            self._adopt_legacy_data(guild_id, partition_dir)
+        if self.database is not None:
+            store = self.database.store(guild_id)
+            self._adopt_partition(store, partition_dir)
+        else:
+            store = InviteStore(partition_dir)
+        store.load()
+        return GuildInviteState(guild_id, store, self.valid_after)
+
+    def _register(self, state: GuildInviteState) -> GuildInviteState:
+        existing = self._states.get(state.guild_id)
+        if existing is not None:
+            # Loaded synchronously while this copy was being read
+            state.close()
+            return existing
+        state.store.on_dirty = self.on_dirty
+        if self.database is not None:
+            self._checked_at[state.guild_id] = time.monotonic()
+        self._states[state.guild_id] = state
+        self.loads += 1
+        return state
+
+    def evict_idle(self):
+        """Page out least recently used guilds beyond max_active"""
+        excess = len(self._states) - self.max_active
+        if excess <= 0:
+            return
+        for guild_id in list(self._states):
+            if excess <= 0:
+                break
+            state = self._states[guild_id]
+            # Dirty guilds stay resident until the flusher has written them;
+            # waiting invites bring a guild back through the due index
+            if state.is_dirty:
+                continue
+            self._note_due(state)
+            state.close()
+            del self._states[guild_id]
+            self._checked_at.pop(guild_id, None)
+            self.evictions += 1
+            excess -= 1
+
+    # === Waiting invites ===
+
+    def _read_due(self) -> Dict[int, float]:
+        try:
+            with open(self.due_path, 'r', encoding='utf-8') as f:
+                return {int(guild_id): float(due) for guild_id, due in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"⚠️  Error loading {self.due_path}: {e}")
+            return {}
+
+    def _note_due(self, state: GuildInviteState):
+        due = state.ledger.next_due
+        if due is None:
+            changed = self._due.pop(state.guild_id, None) is not None
+        else:
+            changed = self._due.get(state.guild_id) != due
+            self._due[state.guild_id] = due
+        self._due_dirty = self._due_dirty or changed
+
+    async def due_states(self, now: Optional[float] = None) -> List[GuildInviteState]:
+        """Loaded guilds, after loading every other guild whose waiting invites are due"""
+        now = time.time() if now is None else now
+        for guild_id, due in list(self._due.items()):
+            if due <= now and guild_id not in self._states:
+                await self.ensure_loaded(guild_id)
+        return self.loaded_states()
+
+    def take_due(self) -> Optional[Dict[str, float]]:
+        """The due index to save, or None if it has not changed since the last call"""
+        for state in self._states.values():
+            self._note_due(state)
+        if not self._due_dirty:
+            return None
+        self._due_dirty = False
+        return {str(guild_id): due for guild_id, due in self._due.items()}
+
+    def write_due(self, payload: Dict[str, float]):
+        """Save the due index; safe to run in a worker thread"""
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            tmp_path = self.due_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, self.due_path)
+        except OSError as e:
+            logger.error(f"❌ Error saving {self.due_path}: {e}")
+            self._due_dirty = True
+
+    def set_on_dirty(self, callback: Optional[Callable[[InviteStore], None]]):
+        """Install the write-behind wake-up callback on every partition"""
+        self.on_dirty = callback
+        for state in self._states.values():
+            state.store.on_dirty = callback
+
+    def loaded_states(self) -> List[GuildInviteState]:
+        return list(self._states.values())
+
+    def dirty_stores(self) -> List[InviteStore]:
+        return [state.store for state in self._states.values() if state.is_dirty]
+
+    @property
+    def pending_count(self) -> int:
+        return sum(state.store.pending_count for state in self._states.values())
+
+    def flush_all(self):
+        """Synchronously write every loaded partition's pending changes"""
+        for state in self._states.values():
+            state.store.flush()
+        due = self.take_due()
+        if due is not None:
+            self.write_due(due)
+
+    def close(self):
+        for state in self._states.values():
+            state.close()
+        if self.database is not None:
+            self.database.close()
+
+    def _adopt_partition(self, store, partition_dir: str):
+        """Move a guild's file partition into the shared database the first time it is used there"""
+        if self.database.has_guild(store.guild_id) or not os.path.exists(partition_dir):
+            return
+        source = InviteStore(partition_dir)
+        source.load()
+        source.close()
+        if store.adopt(source):
+            logger.info(f"🔄 Moved invite data of server {store.guild_id} into the shared store")
+
+    def _adopt_legacy_data(self, guild_id: int, partition_dir: str):
+        """Move pre-partition global invite data into one guild's partition.
+
+        The old format merged every guild into one file, so it is handed to
+        the configured guild, or to the first guild loaded if none is set.
+        """
+        if self.legacy_guild_id is not None and guild_id != self.legacy_guild_id:
+            return
+        marker = os.path.join(self.data_dir, self.LEGACY_MARKER)
+        if os.path.exists(marker) or os.path.exists(partition_dir):
+            return
+
+        legacy_store = InviteStore(self.legacy_dir)
+        legacy_store.load()
+        legacy_store.close()
+
+        moved = False
+        os.makedirs(partition_dir, exist_ok=True)
+        for filename in (InviteStore.SNAPSHOT_FILE, InviteStore.JSON_SNAPSHOT_FILE, InviteStore.LOG_FILE):
+            source = os.path.join(self.legacy_dir, filename)
+            if os.path.exists(source):
+                os.replace(source, os.path.join(partition_dir, filename))
+                moved = True
+
+        with open(marker, 'w', encoding='utf-8') as f:
+            f.write(str(guild_id))
+        if moved:
+            logger.info(f"🔄 Legacy invite data assigned to server {guild_id}")
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger("bot.config")
+
+class GuildStyleMap:
+    """Per-guild style overrides, persisted in the background.
+
+    Only guilds that picked a style other than the default are stored, and
+    style names are interned, so the map costs one small entry per such
+    guild. Changes are written atomically in a worker thread; writes that
+    arrive while one is in progress are coalesced into the next.
+    """
+
+    def __init__(self, path: str = "data/guild_styles.json"):
+        self.path = path
+        self._styles: Dict[int, str] = {}
+        # guild_id -> new style (None = removed) not written yet
+        self._changed: Dict[int, Optional[str]] = {}
+        self._save_task: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._styles)
+
+    def load(self):
+        """Load saved overrides; a missing file means no overrides"""
+        try:
+            self._styles = self._read()
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"❌ Error loading guild styles, using defaults: {e}")
+            return
+        logger.info(f"✅ Loaded style overrides for {len(self._styles)} servers")
+
+    def _read(self) -> Dict[int, str]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {int(guild_id): sys.intern(style) for guild_id, style in data.items()}
+
+    def get(self, guild_id: Optional[int]) -> Optional[str]:
+        return self._styles.get(guild_id)
+
+    def set(self, guild_id: int, style: Optional[str]):
+        """Set a guild's style, or remove its override with None"""
+        if style is None:
+            # Written even if unknown here: another process may have set it
+            self._styles.pop(guild_id, None)
+        elif self._styles.get(guild_id) == style:
+            return
+        else:
+            self._styles[guild_id] = sys.intern(style)
+        self._changed[guild_id] = style
+        self._schedule_save()
+
+    def _schedule_save(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._save())
+
+    async def _save(self):
+        loop = asyncio.get_running_loop()
+        while self._changed:
+            changes, self._changed = self._changed, {}
+            try:
+                merged = await loop.run_in_executor(None, self._write, changes)
+            except Exception as e:
+                logger.error(f"❌ Error saving guild styles: {e}")
+                self._changed = {**changes, **self._changed}
+                await asyncio.sleep(5)
+                continue
+            self._adopt(merged)
+
+    def _adopt(self, merged: Dict[int, str]):
+        """Take the file's overrides, including other processes', under changes not written yet"""
+        for guild_id, style in self._changed.items():
+            if style is None:
+                merged.pop(guild_id, None)
+            else:
+                merged[guild_id] = sys.intern(style)
+        self._styles = merged
+
+    def _write(self, changes: Dict[int, Optional[str]]) -> Dict[int, str]:
+        """Apply changes to the overrides on disk; returns the merged overrides"""
+        with self._write_lock:
+            try:
+                styles = self._read()
+            except FileNotFoundError:
+                styles = {}
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"⚠️ Rewriting unreadable guild styles file: {e}")
+                styles = dict(self._styles)
+            for guild_id, style in changes.items():
+                if style is None:
+                    styles.pop(guild_id, None)
+                else:
+                    styles[guild_id] = sys.intern(style)
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({str(guild_id): style for guild_id, style in styles.items()}, f,
+                          ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            return styles
+
+    def flush(self):
+        """Synchronously write pending changes, used on shutdown"""
+        if not self._changed:
+            return
+        changes, self._changed = self._changed, {}
+        try:
+            self._adopt(self._write(changes))
+        except Exception as e:
+            logger.error(f"❌ Error saving guild styles: {e}")
+            self._changed = changes
@@ -0,0 +1,394 @@
+import asyncio
+import bisect
+import functools
+import logging
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("bot.metrics")
+
+# Histogram upper bounds in seconds (Prometheus client defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    """Fixed-bucket histogram with sum and count"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        # One slot per bound plus the +Inf overflow
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs as exposed to Prometheus, ending with +Inf"""
+        pairs, running = [], 0
+        for bound, count in zip(self.bounds + (None,), self.counts):
+            running += count
+            pairs.append(("+Inf" if bound is None else repr(bound), running))
+        return pairs
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket, like histogram_quantile()"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen, lower = 0, 0.0
+        for bound, count in zip(self.bounds, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.bounds[-1]
+
+class HandlerStats:
+    """Invocation counters and timings of one event handler or command"""
+
+    __slots__ = ("kind", "name", "calls", "errors", "in_flight", "latency", "local", "awaiting")
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.latency = Histogram()
+        # Seconds spent running handler code vs suspended on awaits (REST, queues)
+        self.local = 0.0
+        self.awaiting = 0.0
+
+class _Timed:
+    """Drive a coroutine step by step and add the time spent inside each step to ``busy``.
+
+    Every step is local work; the gaps between steps are time the handler
+    spent suspended, almost always on a REST call or a queue in front of one.
+    """
+
+    __slots__ = ("coro", "busy")
+
+    def __init__(self, coro):
+        self.coro = coro
+        self.busy = 0.0
+
+    def __await__(self):
+        coro, value, error = self.coro, None, None
+        while True:
+            started = time.perf_counter()
+            try:
+                yielded = coro.throw(error) if error is not None else coro.send(value)
+            except StopIteration as stop:
+                self.busy += time.perf_counter() - started
+                return stop.value
+            except BaseException:
+                self.busy += time.perf_counter() - started
+                raise
+            self.busy += time.perf_counter() - started
+            try:
+                value, error = (yield yielded), None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as e:
+                value, error = None, e
+
+class LoopLagMonitor:
+    """Measure how long the event loop is blocked by sleeping in short ticks.
+
+    Any time a tick wakes up later than scheduled is time the loop spent
+    running something else without yielding.
+    """
+
+    def __init__(self, interval: float = 0.25, threshold: float = 0.05, warn_after: float = 1.0):
+        self.interval = interval
+        self.threshold = threshold
+        self.warn_after = warn_after
+        self.lag = Histogram(LAG_BUCKETS)
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.blocked += lag
+                self.stalls += 1
+            if lag >= self.warn_after:
+                logger.warning(f"⚠️ Event loop blocked for {lag * 1000:.0f} ms", extra={"event": "loop_stall"})
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def metrics(self) -> Dict:
+        return {
+            "blocked_ms": round(self.blocked * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "p99_lag_ms": round(self.lag.quantile(0.99) * 1000, 2),
+            "stalls": self.stalls,
+        }
+
+_NAME_UNSAFE = re.compile(r"[^a-zA-Z0-9_]")
+
+def _metric_name(*parts: str) -> str:
+    return _NAME_UNSAFE.sub("_", "_".join(parts))
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + "}"
+
+class Instrumentation:
+    """Per-handler timings, REST request latencies, event loop lag and metric collectors.
+
+    ``instrument_bot()`` wraps every event handler set on the bot and every
+    registered command callback; ``rest()`` times one outbound request by
+    route kind. ``add_collector()`` registers a function returning a dict of
+    numbers (nested one level, e.g. per dispatcher lane) that is exported as
+    gauges alongside.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[Tuple[str, str], HandlerStats] = {}
+        self.rest_latency: Dict[str, Histogram] = {}
+        self.rest_errors: Dict[str, int] = {}
+        self.loop_lag = LoopLagMonitor()
+        self.collectors: Dict[str, Callable[[], Dict]] = {}
+        self.started_at = time.time()
+
+    # === Handlers ===
+
+    def stats(self, kind: str, name: str) -> HandlerStats:
+        stats = self.handlers.get((kind, name))
+        if stats is None:
+            stats = self.handlers[(kind, name)] = HandlerStats(kind, name)
+        return stats
+
+    def wrap(self, kind: str, name: str, handler: Callable) -> Callable:
+        """Async wrapper that records calls, errors, latency and local vs awaiting time"""
+        if getattr(handler, "__instrumented__", False):
+            return handler
+        stats = self.stats(kind, name)
+
+        @functools.wraps(handler)
+        async def instrumented(*args, **kwargs):
+            stats.calls += 1
+            stats.in_flight += 1
+            timed = _Timed(handler(*args, **kwargs))
+            started = time.perf_counter()
+            try:
+                return await timed
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.in_flight -= 1
+                stats.latency.observe(elapsed)
+                stats.local += timed.busy
+                stats.awaiting += max(0.0, elapsed - timed.busy)
+
+        instrumented.__instrumented__ = True
+        return instrumented
+
+    def instrument_bot(self, bot):
+        """Wrap the bot's event handlers and command callbacks; safe to call again"""
+        for name, handler in list(vars(bot).items()):
+            if name.startswith("on_") and asyncio.iscoroutinefunction(handler):
+                setattr(bot, name, self.wrap("event", name, handler))
+        for command in bot.walk_commands():
+            if not getattr(command.callback, "__instrumented__", False):
+                command.callback = self.wrap("command", command.qualified_name, command.callback)
+
+    # === REST ===
+
+    @contextmanager
+    def rest(self, route: str):
+        """Time one REST request on ``route`` (the route kind, e.g. "roles")"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.rest_errors[route] = self.rest_errors.get(route, 0) + 1
+            raise
+        finally:
+            histogram = self.rest_latency.get(route)
+            if histogram is None:
+                histogram = self.rest_latency[route] = Histogram()
+            histogram.observe(time.perf_counter() - started)
+
+    # === Export ===
+
+    def add_collector(self, prefix: str, collect: Callable[[], Dict]):
+        self.collectors[prefix] = collect
+
+    def summary(self) -> List[Dict]:
+        """Per-handler rows for !perf, busiest first"""
+        rows = []
+        for stats in sorted(self.handlers.values(), key=lambda s: s.calls, reverse=True):
+            if not stats.calls:
+                continue
+            rows.append({
+                "kind": stats.kind,
+                "name": stats.name,
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "p50_ms": round(stats.latency.quantile(0.50) * 1000, 1),
+                "p99_ms": round(stats.latency.quantile(0.99) * 1000, 1),
+                "local_ms": round(stats.local / stats.calls * 1000, 2),
+                "awaiting_ms": round(stats.awaiting / stats.calls * 1000, 2),
+            })
+        return rows
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, histogram: Histogram, **labels):
+            for le, count in histogram.cumulative():
+                lines.append(f"{name}_bucket{_labels(**labels, le=le)} {count}")
+            lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+        handlers = sorted(self.handlers.values(), key=lambda s: (s.kind, s.name))
+        for metric, kind, help_text, value in (
+            ("bot_handler_calls_total", "counter", "Handler invocations", lambda s: s.calls),
+            ("bot_handler_errors_total", "counter", "Handler invocations that raised", lambda s: s.errors),
+            ("bot_handler_in_flight", "gauge", "Handler invocations currently running", lambda s: s.in_flight),
+            ("bot_handler_local_seconds_total", "counter", "Time spent running handler code", lambda s: s.local),
+            ("bot_handler_awaiting_seconds_total", "counter",
+             "Time handlers spent suspended on awaits such as REST calls", lambda s: s.awaiting),
+        ):
+            family(metric, kind, help_text)
+            for stats in handlers:
+                lines.append(f"{metric}{_labels(kind=stats.kind, handler=stats.name)} {value(stats)!r}")
+
+        family("bot_handler_duration_seconds", "histogram", "Handler wall-clock latency")
+        for stats in handlers:
+            histogram("bot_handler_duration_seconds", stats.latency, kind=stats.kind, handler=stats.name)
+
+        family("bot_rest_request_duration_seconds", "histogram", "Outbound REST request latency by route kind")
+        for route, latency in sorted(self.rest_latency.items()):
+            histogram("bot_rest_request_duration_seconds", latency, route=route)
+        family("bot_rest_request_errors_total", "counter", "Outbound REST requests that raised")
+        for route, count in sorted(self.rest_errors.items()):
+            lines.append(f"bot_rest_request_errors_total{_labels(route=route)} {count}")
+
+        monitor = self.loop_lag
+        family("bot_event_loop_lag_seconds", "histogram", "How late event loop ticks woke up")
+        histogram("bot_event_loop_lag_seconds", monitor.lag)
+        family("bot_event_loop_blocked_seconds_total", "counter", "Lag of ticks above the stall threshold")
+        lines.append(f"bot_event_loop_blocked_seconds_total {monitor.blocked!r}")
+        family("bot_event_loop_stalls_total", "counter", "Ticks that woke up later than the stall threshold")
+        lines.append(f"bot_event_loop_stalls_total {monitor.stalls}")
+
+        family("bot_uptime_seconds", "gauge", "Seconds since the metrics were created")
+        lines.append(f"bot_uptime_seconds {time.time() - self.started_at:.3f}")
+
+        for prefix, collect in self.collectors.items():
+            try:
+                lines.extend(self._collected(prefix, collect()))
+            except Exception as e:
+                logger.error(f"❌ Metrics collector {prefix} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _collected(prefix: str, values: Dict) -> List[str]:
+        """Numbers as gauges; dicts of dicts (e.g. lanes -> role -> depth) become labelled gauges"""
+        lines = []
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float, dict)):
+                continue
+            if not isinstance(value, dict):
+                name = _metric_name("bot", prefix, key)
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value!r}")
+                continue
+            label = key[:-1] if key.endswith("s") else key
+            series: Dict[str, List[str]] = {}
+            for label_value, fields in value.items():
+                if not isinstance(fields, dict):
+                    continue
+                for field, number in fields.items():
+                    if isinstance(number, (int, float)) and not isinstance(number, bool):
+                        series.setdefault(_metric_name("bot", prefix, label, field), []).append(
+                            f"{{{label}=\"{_label_value(label_value)}\"}} {number!r}")
+            for name, samples in series.items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(name + sample for sample in samples)
+        return lines
+
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics with ``render()``"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, render: Callable[[], str], host: str = "127.0.0.1", port: int = 9108):
+        self.render = render
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"📤 Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            # Headers are not needed, but must be read before answering
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] in ("GET", "HEAD") and parts[1].split("?", 1)[0] in ("/", "/metrics"):
+                status, body = "200 OK", self.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+            head = (f"HTTP/1.1 {status}\r\nContent-Type: {self.CONTENT_TYPE}\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode("latin-1")
+            writer.write(head if parts and parts[0] == "HEAD" else head + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            writer.close()
+
+# Shared by main.py, the dispatcher and the invite tracker
+instruments = Instrumentation()
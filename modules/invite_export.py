@@ -0,0 +1,211 @@
+import csv
+import io
+import json
+import time
+from typing import Dict, IO, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+FORMATS = ("jsonl", "csv")
+FORMAT_VERSION = 1
+CSV_HEADER = ["type", "id", "value"]
+MAX_REPORTED_ERRORS = 20
+
+class InviteImportError(ValueError):
+    """An import file has rows that cannot be applied"""
+
+    def __init__(self, errors: List[str], total: int):
+        self.errors = errors
+        self.total = total
+        more = f" (+{total - len(errors)} more)" if total > len(errors) else ""
+        super().__init__("; ".join(errors) + more)
+
+class ImportBatch(NamedTuple):
+    """Validated rows of an import file, applied in one step"""
+    invite_counts: Dict[str, int]
+    invited_by: Dict[str, str]
+
+    @property
+    def rows(self) -> int:
+        return len(self.invite_counts) + len(self.invited_by)
+
+def format_for(filename: str, default: str = "jsonl") -> str:
+    """Pick the format from a file name's extension"""
+    lowered = filename.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return default
+
+# === Export ===
+
+def _records(invite_counts: Mapping[str, int], invited_by: Mapping[str, str]) -> Iterator[Tuple[str, str, object]]:
+    for user_id, count in invite_counts.items():
+        yield "count", user_id, count
+    for member_id, inviter_id in invited_by.items():
+        yield "inviter", member_id, inviter_id
+
+def export_chunks(invite_counts: Mapping[str, int], invited_by: Mapping[str, str], fmt: str = "jsonl",
+                  guild_id: Optional[int] = None, chunk_rows: int = 1000) -> Iterator[str]:
+    """Serialize invite data as text chunks of at most ``chunk_rows`` rows.
+
+    Rows are produced lazily, so only one chunk is held in memory no matter
+    how many members the guild has.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+
+    if fmt == "jsonl":
+        meta = {"type": "meta", "version": FORMAT_VERSION, "guild_id": str(guild_id) if guild_id else None,
+                "exported_at": int(time.time())}
+        yield json.dumps(meta, separators=(",", ":")) + "\n"
+    else:
+        yield ",".join(CSV_HEADER) + "\r\n"
+
+    chunk: List[Tuple[str, str, object]] = []
+    for record in _records(invite_counts, invited_by):
+        chunk.append(record)
+        if len(chunk) >= chunk_rows:
+            yield _serialize(chunk, fmt)
+            chunk = []
+    if chunk:
+        yield _serialize(chunk, fmt)
+
+def _serialize(chunk: List[Tuple[str, str, object]], fmt: str) -> str:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        return buffer.getvalue()
+    lines = []
+    for kind, key, value in chunk:
+        if kind == "count":
+            record = {"type": kind, "user_id": key, "count": value}
+        else:
+            record = {"type": kind, "member_id": key, "inviter_id": value}
+        lines.append(json.dumps(record, separators=(",", ":")))
+    return "\n".join(lines) + "\n"
+
+def write_export(out: IO[str], invite_counts: Mapping[str, int], invited_by: Mapping[str, str],
+                 fmt: str = "jsonl", guild_id: Optional[int] = None, chunk_rows: int = 1000) -> int:
+    """Stream an export into an open text file; returns the number of rows written"""
+    for chunk in export_chunks(invite_counts, invited_by, fmt, guild_id, chunk_rows):
+        out.write(chunk)
+    return len(invite_counts) + len(invited_by)
+
+# === Import ===
+
+def _snowflake(value) -> Optional[str]:
+    text = str(value).strip() if isinstance(value, (str, int)) and not isinstance(value, bool) else ""
+    return text if text.isdigit() and len(text) <= 20 else None
+
+def _count(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    return value if isinstance(value, int) and value >= 0 else None
+
+def _jsonl_rows(lines: Iterator[str]) -> Iterator[Tuple[int, str, object, object]]:
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, "invalid", None, f"invalid JSON ({e.msg})"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, "invalid", None, "expected a JSON object"
+            continue
+        kind = record.get("type")
+        if kind == "count":
+            yield line_number, kind, record.get("user_id"), record.get("count")
+        elif kind == "inviter":
+            yield line_number, kind, record.get("member_id"), record.get("inviter_id")
+        elif kind != "meta":
+            yield line_number, "invalid", None, f"unknown record type {kind!r}"
+
+def _csv_rows(lines: Iterator[str]) -> Iterator[Tuple[int, str, object, object]]:
+    reader = csv.reader(lines)
+    try:
+        header = next(reader, None)
+        if header is None:
+            return
+        if [column.strip().lower() for column in header] != CSV_HEADER:
+            yield 1, "invalid", None, f"expected header {','.join(CSV_HEADER)}"
+            return
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(CSV_HEADER):
+                yield reader.line_num, "invalid", None, f"expected {len(CSV_HEADER)} columns, got {len(row)}"
+                continue
+            kind, key, value = (cell.strip() for cell in row)
+            if kind in ("count", "inviter"):
+                yield reader.line_num, kind, key, value
+            else:
+                yield reader.line_num, "invalid", None, f"unknown record type {kind!r}"
+    except csv.Error as e:
+        # The reader cannot continue past a malformed line
+        yield reader.line_num, "invalid", None, f"malformed CSV ({e})"
+
+def read_import(source: IO[str], fmt: str = "jsonl") -> ImportBatch:
+    """Parse and validate an import file line by line.
+
+    Every row is checked before anything is applied; if any row is invalid,
+    InviteImportError lists the first problems with their line numbers and
+    nothing is returned.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown import format {fmt!r}")
+
+    invite_counts: Dict[str, int] = {}
+    invited_by: Dict[str, str] = {}
+    errors: List[str] = []
+    total_errors = 0
+
+    rows = _csv_rows(source) if fmt == "csv" else _jsonl_rows(source)
+    for line_number, kind, key, value in rows:
+        problem = None
+        if kind == "invalid":
+            problem = value
+        elif kind == "count":
+            user_id, count = _snowflake(key), _count(value)
+            if user_id is None:
+                problem = f"invalid user ID {key!r}"
+            elif count is None:
+                problem = f"invalid invite count {value!r}"
+            elif user_id in invite_counts:
+                problem = f"duplicate count for user {user_id}"
+            else:
+                invite_counts[user_id] = count
+        else:
+            member_id, inviter_id = _snowflake(key), _snowflake(value)
+            if member_id is None:
+                problem = f"invalid member ID {key!r}"
+            elif inviter_id is None:
+                problem = f"invalid inviter ID {value!r}"
+            elif member_id in invited_by:
+                problem = f"duplicate inviter for member {member_id}"
+            else:
+                invited_by[member_id] = inviter_id
+
+        if problem is not None:
+            total_errors += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"line {line_number}: {problem}")
+
+    if total_errors:
+        raise InviteImportError(errors, total_errors)
+    return ImportBatch(invite_counts, invited_by)
+
+def export_to_file(path: str, invite_counts: Mapping[str, int], invited_by: Mapping[str, str],
+                   fmt: str = "jsonl", guild_id: Optional[int] = None, chunk_rows: int = 1000) -> int:
+    """Stream an export to ``path``; safe to run in a worker thread"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        return write_export(f, invite_counts, invited_by, fmt, guild_id, chunk_rows)
+
+def import_from_file(path: str, fmt: Optional[str] = None) -> ImportBatch:
+    """Validate an import file at ``path``; the format defaults to its extension"""
+    # utf-8-sig accepts CSV files saved with a byte order mark by spreadsheets
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return read_import(f, fmt or format_for(path))
@@ -1,133 +1,326 @@
+import asyncio
 import discord
 from discord.ext import commands
-import json
+import logging
 import os
-from collections import defaultdict
+import tempfile
 from typing import Dict, Optional
+from weakref import WeakKeyDictionary
+from modules.analytics import ATTRIBUTED, JOINS, LEAVES, InviteAnalytics
+from modules.backfill import InviteBackfill
+from modules.burst import JoinBurstDetector, WelcomeBatcher
+from modules.config_manager import StyleView
+from modules.dispatcher import ActionDispatcher, Priority, parse_route_limits
+from modules.event_bus import get_event_bus
+from modules.guild_state import GuildStateRegistry
+from modules.invite_export import FORMATS as EXPORT_FORMATS, InviteImportError, export_to_file, import_from_file
+from modules.invite_tracker import InviteTracker
+from modules.milestones import MilestoneRoleEngine, MilestoneRoles
+from modules.shared_store import SharedInviteDB
+from modules.user_resolver import UserResolver
+from modules.write_behind import WriteBehindFlusher
 
-# Global variables for invite tracking
-invites = {}
-invite_counts = defaultdict(int)
-invited_by = {}
+logger = logging.getLogger("bot.invites")
 
-def save_invite_counts():
-    """Save invite counts to file"""
-    os.makedirs("data", exist_ok=True)
-    with open("data/invite_counts.json", "w", encoding="utf-8") as f:
-        json.dump(dict(invite_counts), f, ensure_ascii=False, indent=4)
+# Global variables for invite tracking
+invite_tracker = InviteTracker(snapshot_path="data/invite_cache.json")
+invites = invite_tracker.invites
+guild_states = GuildStateRegistry("data/guilds")
+invite_flusher = None
+user_resolver = None
+burst_detector = None
+welcome_batcher = None
+action_dispatcher = None
+milestone_roles = None
+invite_backfill = None
+invite_analytics = None
+analytics_task = None
+credit_task = None
 
-def save_invited_by():
-    """Save invited by data to file"""
-    os.makedirs("data", exist_ok=True)
-    with open("data/invited_by.json", "w", encoding="utf-8") as f:
-        json.dump(invited_by, f, ensure_ascii=False, indent=4)
+# Title/colour embeds per style view, copied for each message; views are
+# replaced when a style file changes, which drops their entries
+_embed_skeletons: "WeakKeyDictionary[StyleView, Dict[tuple, discord.Embed]]" = WeakKeyDictionary()
 
 def load_invite_data():
-    """Load invitation data from JSON files"""
-    global invite_counts, invited_by
+    """Configure per-guild invite state; partitions load lazily per guild"""
+    global guild_states
     
-    os.makedirs('data', exist_ok=True)
+    guild_id = os.getenv("GUILD_ID")
+    # Several bot processes (shard clusters) share invite data through one SQLite file
+    database_path = os.getenv("INVITE_DATABASE")
+    cluster_id = os.getenv("CLUSTER_ID")
+    guild_states.close()
+    guild_states = GuildStateRegistry(
+        "data/guilds",
+        max_active=int(os.getenv("INVITE_ACTIVE_GUILDS", 100)),
+        legacy_guild_id=int(guild_id) if guild_id and guild_id.isdigit() else None,
+        valid_after=float(os.getenv("VALID_INVITE_HOURS", 0)) * 3600,
+        database=SharedInviteDB(database_path) if database_path else None,
+        refresh_interval=float(os.getenv("INVITE_REFRESH_INTERVAL", 1.0)),
+        due_file=f"credits_due.{cluster_id}.json" if cluster_id else None
+    )
     
-    # Load invite counts
-    invite_file = 'data/invite_counts.json'
-    try:
-        if os.path.exists(invite_file) and os.path.getsize(invite_file) > 0:
-            with open(invite_file, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content:
-                    invite_counts = defaultdict(int, json.loads(content))
-                else:
-                    invite_counts = defaultdict(int)
-        else:
-            invite_counts = defaultdict(int)
-    except (json.JSONDecodeError, FileNotFoundError) as e:
-        print(f"⚠️  Error loading invite_counts.json: {e}")
-        print("🔄 Creating new file...")
-        invite_counts = defaultdict(int)
-        save_invite_data()
-    
-    # Load member inviter mapping
-    inviter_file = 'data/invited_by.json'
-    try:
-        if os.path.exists(inviter_file) and os.path.getsize(inviter_file) > 0:
-            with open(inviter_file, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content:
-                    invited_by = json.loads(content)
-                else:
-                    invited_by = {}
-        else:
-            invited_by = {}
-    except (json.JSONDecodeError, FileNotFoundError) as e:
-        print(f"⚠️  Error loading invited_by.json: {e}")
-        print("🔄 Creating new file...")
-        invited_by = {}
-        save_invite_data()
+    # The invite cache snapshot only covers this process's guilds
+    if cluster_id:
+        invite_tracker.snapshot_path = f"data/invite_cache.{cluster_id}.json"
+
+def get_persistence_metrics() -> Dict:
+    """Get pending-write depth, flush latency, guild paging and memory statistics"""
+    metrics = {"pending_writes": guild_states.pending_count}
+    if invite_flusher is not None:
+        metrics.update(invite_flusher.metrics())
+    states = guild_states.loaded_states()
+    metrics.update({
+        "active_guilds": len(states),
+        # Compact columns of every loaded guild's counts, inviter links and invitee ledger
+        "store_bytes": sum(state.invite_counts.nbytes + state.invited_by.nbytes + state.store.invitees.nbytes
+                           for state in states),
+        "guild_loads": guild_states.loads,
+        "guild_evictions": guild_states.evictions,
+        "guild_refreshes": guild_states.refreshes,
+    })
+    if invite_analytics is not None:
+        metrics.update({
+            "analytics_guilds": invite_analytics.active_guilds,
+            "analytics_loads": invite_analytics.loads,
+            "analytics_evictions": invite_analytics.evictions,
+        })
+    return metrics
+
+def get_resolver_metrics() -> Dict:
+    """Get hit-rate counters of the user profile resolver"""
+    return user_resolver.metrics() if user_resolver is not None else {}
 
-def save_invite_data():
-    """Save invite data to JSON files"""
-    save_invite_counts()
-    save_invited_by()
+def get_dispatcher_metrics() -> Dict:
+    """Get queue depth, wait time and drop counters of outbound actions"""
+    return action_dispatcher.metrics() if action_dispatcher is not None else {}
 
-async def update_inviter_roles(inviter, invite_count, inviter_roles, guild):
-    """Update inviter roles based on invite count"""
+def grant_role(member, role, name: str = "role_grant"):
+    """Queue a role grant on the guild's role route"""
+    async def add_role():
+        if role not in member.roles:
+            await member.add_roles(role)
+            logger.debug(f"✅ Assigned role {role.name} to user {member.name}")
+    action_dispatcher.submit(Priority.ROLE, f"roles:{member.guild.id}", add_role, name)
+
+def send_embed(channel, embed: discord.Embed, name: str = "message"):
+    """Queue an embed on the channel's message route"""
+    action_dispatcher.submit(Priority.MESSAGE, f"channel:{channel.id}", lambda: channel.send(embed=embed), name)
+
+async def stop_invite_logger():
+    """Stop the background tasks on bot close, writing what they still hold"""
+    global analytics_task, credit_task
+    # Nothing may mark stores dirty once the last flush has started
+    for task in (credit_task, analytics_task):
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    credit_task = analytics_task = None
+    if action_dispatcher is not None:
+        action_dispatcher.stop()
+    if invite_flusher is not None:
+        await invite_flusher.stop()
+    if invite_analytics is not None:
+        await invite_analytics.flush()
+
+def shutdown_invite_logger():
+    """Final synchronous flush of invite data, called on bot shutdown"""
     try:
-        # Check if user should get a new role
-        for required_count, role_id in inviter_roles.items():
-            if invite_count >= required_count:
-                role = guild.get_role(role_id)
-                if role and role not in inviter.roles:
-                    await inviter.add_roles(role)
-                    print(f"✅ Assigned role {role.name} to {inviter.name} for {invite_count} invites")
+        guild_states.flush_all()
+        guild_states.close()
+        if invite_analytics is not None:
+            invite_analytics.flush_sync()
+        invite_tracker.save_snapshot()
+        logger.info("✅ Invite data flushed to disk")
     except Exception as e:
-        print(f"❌ Error updating inviter roles: {e}")
+        logger.error(f"❌ Error flushing invite data on shutdown: {e}")
+
+def style_embed(style: StyleView, title_key: str, color: discord.Color, message_key: Optional[str] = None) -> discord.Embed:
+    """Copy of a pre-built embed with a styled title and optional static message"""
+    skeletons = _embed_skeletons.get(style)
+    if skeletons is None:
+        skeletons = _embed_skeletons[style] = {}
+    
+    key = (title_key, color.value, message_key)
+    embed = skeletons.get(key)
+    if embed is None:
+        embed = discord.Embed(title=style.get_embed_title(title_key), color=color)
+        if message_key:
+            embed.description = style.get_message(message_key)
+        skeletons[key] = embed
+    return embed.copy()
+
+async def _invite_count(guild_id: int, user_id: int) -> int:
+    state = await guild_states.ensure_loaded(guild_id)
+    return state.invite_counts.get(str(user_id), 0)
 
 async def setup_invite_logger(bot, config_manager):
     """Setup invite logger functionality"""
     if bot is None:
-        print("❌ Error: bot object is None in setup_invite_logger")
+        logger.error("❌ Error: bot object is None in setup_invite_logger")
         return
     
+    global invite_flusher, user_resolver, burst_detector, welcome_batcher, action_dispatcher, milestone_roles
+    global invite_backfill, invite_analytics, analytics_task, credit_task
+    
+    events = get_event_bus(bot)
+    
     # Load existing invite data
     load_invite_data()
+    invite_tracker.load_snapshot()
     
     # Get environment variables
     WELCOME_CHANNEL_ID = int(os.getenv("WELCOME_CHANNEL_ID", 0))
     MEMBER_ROLE_ID = int(os.getenv("MEMBER_ROLE_ID", 0))
     
-    # Parse inviter roles from environment
-    INVITER_ROLES = {}
-    if os.getenv("INVITER_ROLES"):
-        for role_info in os.getenv("INVITER_ROLES").split(','):
-            try:
-                count, role_id = role_info.split(':')
-                INVITER_ROLES[int(count)] = int(role_id)
-            except ValueError:
-                print(f"⚠️ Invalid INVITER_ROLES format: {role_info}")
+    # Start write-behind persistence
+    invite_flusher = WriteBehindFlusher(
+        guild_states,
+        interval=float(os.getenv("INVITE_FLUSH_INTERVAL", 2.0)),
+        batch_size=int(os.getenv("INVITE_FLUSH_BATCH_SIZE", 500))
+    )
+    invite_flusher.start()
     
-    @bot.event
-    async def on_ready():
-        """Load invite cache when bot is ready"""
-        print("🔄 Loading invite cache...")
-        for guild in bot.guilds:
+    # Time-series join/leave counters for !invitestats and the weekly leaderboard
+    invite_analytics = InviteAnalytics("data/guilds", max_active=int(os.getenv("INVITE_ACTIVE_GUILDS", 100)))
+    ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 60))
+    
+    async def flush_analytics():
+        while True:
+            await asyncio.sleep(ANALYTICS_FLUSH_INTERVAL)
+            await invite_analytics.flush()
+    
+    analytics_task = bot.loop.create_task(flush_analytics())
+    
+    async def credit_valid_invites():
+        """Count invites whose members have stayed VALID_INVITE_HOURS"""
+        while True:
+            await asyncio.sleep(60)
+            for state in await guild_states.due_states():
+                inviter_ids = state.mature()
+                guild = bot.get_guild(state.guild_id) if inviter_ids else None
+                for inviter_id in inviter_ids:
+                    inviter = guild.get_member(int(inviter_id)) if guild else None
+                    if inviter:
+                        milestone_roles.schedule(inviter)
+    
+    if guild_states.valid_after > 0:
+        credit_task = bot.loop.create_task(credit_valid_invites())
+    
+    # Outbound role grants, messages and lookups go through one prioritized queue
+    action_dispatcher = ActionDispatcher(
+        max_depth=int(os.getenv("ACTION_QUEUE_DEPTH", 1000)),
+        concurrency=int(os.getenv("ACTION_CONCURRENCY", 4)),
+        max_retries=int(os.getenv("ACTION_MAX_RETRIES", 3)),
+        route_limits=parse_route_limits(os.getenv("ACTION_ROUTE_LIMITS", ""))
+    )
+    action_dispatcher.start()
+    
+    # Profile lookups for leaderboards
+    user_resolver = UserResolver(bot, dispatcher=action_dispatcher)
+    
+    # Periodically correct invite cache drift
+    invite_tracker.start_reconciliation(bot, float(os.getenv("INVITE_RECONCILE_INTERVAL", 900)))
+    
+    # Inviter milestone roles from environment
+    milestone_roles = MilestoneRoleEngine(MilestoneRoles.parse(os.getenv("INVITER_ROLES")), action_dispatcher,
+                                          _invite_count)
+    
+    # Join bursts: batched welcomes, paced roles and one invite fetch per batch
+    BURST_BATCH_DELAY = float(os.getenv("BURST_BATCH_DELAY", 2.0))
+    JOIN_SUMMARY_MAX_LISTED = 25
+    
+    def on_burst_change(guild_id, bursting):
+        invite_tracker.set_batch_delay(guild_id, BURST_BATCH_DELAY if bursting else None)
+        if bursting:
+            logger.warning(f"🌊 Join burst on server {guild_id}, switching to batched join handling", extra={
+                "event": "burst_start",
+                "guild_id": guild_id,
+                "join_rate": round(burst_detector.rate(guild_id), 2)
+            })
+        else:
+            logger.info(f"✅ Join burst on server {guild_id} ended, back to per-member handling", extra={
+                "event": "burst_end",
+                "guild_id": guild_id
+            })
+    
+    async def send_join_summary(guild_id, channel, entries):
+        """Send one embed listing the members that joined during a burst"""
+        # Lets a guild whose joins stopped fall back without waiting for another join
+        burst_detector.is_bursting(guild_id)
+        
+        style = config_manager.for_guild(guild_id)
+        lines = [f"• {user}" + (f" ← {inviter}" if inviter else "") for user, inviter in entries[:JOIN_SUMMARY_MAX_LISTED]]
+        description = style.render_message("join_summary", count=len(entries)) + "\n\n" + "\n".join(lines)
+        if len(entries) > JOIN_SUMMARY_MAX_LISTED:
+            description += "\n" + style.render_message("join_summary_more", count=len(entries) - JOIN_SUMMARY_MAX_LISTED)
+        
+        embed = style_embed(style, "join_summary_title", discord.Color.green())
+        embed.description = description
+        embed.timestamp = discord.utils.utcnow()
+        send_embed(channel, embed, "join_summary")
+    
+    burst_detector = JoinBurstDetector(
+        window=float(os.getenv("BURST_WINDOW", 10)),
+        enter_joins=int(os.getenv("BURST_ENTER_JOINS", 10)),
+        exit_joins=int(os.getenv("BURST_EXIT_JOINS", 3)),
+        on_change=on_burst_change
+    )
+    welcome_batcher = WelcomeBatcher(send_join_summary, interval=float(os.getenv("BURST_SUMMARY_INTERVAL", 10)))
+    
+    # Attribution of joins that happened while the bot was offline
+    invite_backfill = InviteBackfill(guild_states, page_size=int(os.getenv("BACKFILL_PAGE_SIZE", 1000)))
+    BACKFILL_AUTO = os.getenv("BACKFILL_AUTO", "true").lower() != "false"
+    
+    async def run_backfills():
+        """Queue downtime windows found by the warm-up and run every unfinished job"""
+        for guild_id, window in list(invite_tracker.downtime.items()):
+            await invite_backfill.register(guild_id, window)
+            del invite_tracker.downtime[guild_id]
+        
+        guilds = list(bot.guilds)
+        pending = await bot.loop.run_in_executor(None, lambda: [g for g in guilds if invite_backfill.pending(g.id)])
+        # One guild at a time keeps member paging within the request budget
+        for guild in pending:
             try:
-                invites[guild.id] = await guild.invites()
-                print(f"✅ Invite cache loaded for server {guild.name}")
+                await invite_backfill.start(guild)
             except Exception as e:
-                print(f"❌ Error loading invites for server {guild.name}: {e}")
-        print("✅ Bot is ready!")
+                logger.error(f"❌ Error backfilling invites for server {guild.name}: {e}")
+    
+    WARMUP_CONCURRENCY = int(os.getenv("INVITE_WARMUP_CONCURRENCY", 8))
+    WARMUP_RATE = float(os.getenv("INVITE_WARMUP_RATE", 20))
+    
+    async def warm_up_invite_cache():
+        """Load invite caches for all servers concurrently"""
+        logger.info("🔄 Loading invite cache...")
+        await invite_tracker.warm_up(bot.guilds, concurrency=WARMUP_CONCURRENCY, rate=WARMUP_RATE)
+        logger.info("✅ Bot is ready!")
+        if BACKFILL_AUTO and config_manager.get_feature_enabled("invite_tracking"):
+            await run_backfills()
+    
+    # Warm-up paces itself across every guild, so it gets no timeout
+    @events.listen(timeout=None)
+    async def on_ready():
+        """Reload invite cache after a reconnect"""
+        await warm_up_invite_cache()
     
-    @bot.event
+    @events.listen()
     async def on_invite_create(invite):
-        """Update invite cache when new invite is created"""
-        guild = invite.guild
-        try:
-            invites[guild.id] = await guild.invites()
-            print(f"✅ Invite cache updated after new invite creation on server {guild.name}")
-        except Exception as e:
-            print(f"❌ Error updating invite cache: {e}")
+        """Add a new invite to the cache without refetching"""
+        invite_tracker.add_invite(invite)
+        logger.debug(f"✅ Invite cache updated after new invite creation on server {invite.guild.name}")
     
-    @bot.event
+    @events.listen()
+    async def on_invite_delete(invite):
+        """Remove a deleted invite from the cache"""
+        invite_tracker.remove_invite(invite)
+        logger.debug(f"✅ Invite cache updated after invite deletion on server {invite.guild.name}")
+    
+    # Sequential so later join listeners see the member's role and invite credit
+    @events.listen(priority=10, concurrent=False)
     async def on_member_join(member):
         """Handle member join events"""
         if member.bot:
@@ -135,116 +328,92 @@ async def setup_invite_logger(bot, config_manager):
         
         guild = member.guild
         welcome_channel = bot.get_channel(WELCOME_CHANNEL_ID)
+        bursting = burst_detector.record(guild.id)
         
         # Assign member role if configured
         if MEMBER_ROLE_ID and config_manager.get_feature_enabled("auto_role_assignment"):
             try:
                 member_role = guild.get_role(MEMBER_ROLE_ID)
                 if member_role:
-                    await member.add_roles(member_role)
-                    print(f"✅ Assigned role {member_role.name} to user {member.name}")
+                    grant_role(member, member_role, "member_role")
                 else:
-                    print(f"❌ Role with ID {MEMBER_ROLE_ID} not found on server")
+                    logger.error(f"❌ Role with ID {MEMBER_ROLE_ID} not found on server")
             except Exception as e:
-                print(f"❌ Error assigning role: {e}")
-        
-        if not welcome_channel or not config_manager.get_feature_enabled("welcome_messages"):
-            return
-        
-        # Get current invites
-        try:
-            current_invites = await guild.invites()
-            print(f"📋 Retrieved {len(current_invites)} current invites")
-        except Exception as e:
-            print(f"❌ Error getting current invites: {e}")
-            current_invites = []
+                logger.error(f"❌ Error assigning role: {e}")
         
-        # Find used invite
+        # Find used invite; joins are queued per guild and resolved in batches
         inviter = None
-        invite_code = None
+        inviter_id = None
+        attribution = None
+        current_invites_count = 0
         
-        if guild.id in invites and config_manager.get_feature_enabled("invite_tracking"):
-            old_invites = invites[guild.id]
-            
-            print(f"🔍 Searching for used invite for {member.name}...")
-            print(f"📊 Old invites: {len(old_invites)}, New invites: {len(current_invites)}")
-            
-            # Create dictionary for quick lookup
-            old_invites_dict = {invite.code: invite.uses for invite in old_invites}
-            
-            # Compare old and new invites
-            for invite in current_invites:
-                if invite.code in old_invites_dict:
-                    old_uses = old_invites_dict[invite.code]
-                    if invite.uses > old_uses:
-                        inviter = invite.inviter
-                        invite_code = invite.code
-                        print(f"✅ Found used invite: {invite_code} by {inviter.name}")
-                        print(f"   Uses: {old_uses} -> {invite.uses}")
-                        break
-            
-            # Check for one-time invites that disappeared
-            if not inviter:
-                print("🔍 Checking for one-time invites...")
-                for old_invite in old_invites:
-                    if not any(inv.code == old_invite.code for inv in current_invites):
-                        print(f"🔎 Found disappeared invite: {old_invite.code}")
-                        inviter = old_invite.inviter
-                        invite_code = old_invite.code
-                        print(f"✅ Probably used one-time invite: {invite_code} by {inviter.name}")
-                        break
-        
-        # Update invite cache
-        invites[guild.id] = current_invites
-        print(f"✅ Invite cache updated after {member.name} joined")
+        if config_manager.get_feature_enabled("invite_tracking"):
+            logger.debug(f"🔍 Searching for used invite for {member.name}...")
+            attribution = await invite_tracker.resolve_join(member)
+            if attribution:
+                inviter_id = attribution.inviter_id
+                # Only a cached Member can receive milestone roles; mentions work by ID
+                inviter = guild.get_member(inviter_id)
+                note = " (ambiguous batch)" if attribution.ambiguous else ""
+                logger.debug(f"✅ Found used invite: {attribution.code} by {inviter_id}{note}")
+        
+        # Record the join in the invitee ledger; a rejoin takes back the
+        # previous inviter's credit, and the invite may only count later
+        if config_manager.get_feature_enabled("invite_tracking"):
+            state = await guild_states.ensure_loaded(guild.id)
+            current_invites_count = state.member_joined(str(member.id), str(inviter_id) if inviter_id else None)
         
         # Process inviter if found
-        if inviter:
-            # Increment invite count
-            invite_counts[str(inviter.id)] += 1
-            current_invites_count = invite_counts[str(inviter.id)]
-            save_invite_counts()
-            
-            # Save who invited whom
-            invited_by[str(member.id)] = str(inviter.id)
-            save_invited_by()
-            print(f"📝 Saved invite info: {member.name} was invited by {inviter.name}")
+        if inviter_id:
+            logger.debug(f"📝 Saved invite info: {member.name} was invited by {inviter_id}")
             
             # Check if inviter should get a role
-            await update_inviter_roles(inviter, current_invites_count, INVITER_ROLES, guild)
-                
+            if inviter:
+                milestone_roles.schedule(inviter)
+        else:
+            logger.debug(f"⚠️ Could not determine who invited {member.name}")
+        
+        await invite_analytics.record_join(guild.id, str(inviter_id) if inviter_id else None)
+        
+        logger.info(f"Member {member.id} joined server {guild.id}", extra={
+            "event": "member_join",
+            "guild_id": guild.id,
+            "member_id": member.id,
+            "inviter_id": inviter_id,
+            "invite_code": attribution.code if attribution else None,
+            "ambiguous": attribution.ambiguous if attribution else False,
+            "invite_count": current_invites_count
+        })
+        
+        if not welcome_channel or not config_manager.get_feature_enabled("welcome_messages"):
+            return
+        
+        if bursting or welcome_batcher.pending(guild.id):
+            # Fold into the next join summary instead of one embed per member
+            inviter_mention = (inviter.mention if inviter else f"<@{inviter_id}>") if inviter_id else None
+            welcome_batcher.add(guild.id, welcome_channel, (member.mention, inviter_mention))
+            return
+        
+        style = config_manager.for_guild(guild.id)
+        
+        if inviter_id:
             # Send welcome message with inviter info
-            greeting = config_manager.get_random_greeting()
-            formatted_greeting = greeting.format(
+            formatted_greeting = style.render_greeting(
                 user=member.mention,
-                inviter=inviter.mention,
+                inviter=inviter.mention if inviter else f"<@{inviter_id}>",
                 count=current_invites_count
             )
-            
-            embed = discord.Embed(
-                title=config_manager.get_embed_title("new_member_title"),
-                description=formatted_greeting,
-                color=discord.Color.green()
-            )
-            embed.set_thumbnail(url=member.display_avatar.url)
-            embed.timestamp = discord.utils.utcnow()
-            await welcome_channel.send(embed=embed)
         else:
-            print(f"⚠️ Could not determine who invited {member.name}")
             # Send default welcome message
-            default_greeting = config_manager.get_message("default_greeting") or "Welcome {user}!"  
-            formatted_greeting = default_greeting.format(user=member.mention)
-            
-            embed = discord.Embed(
-                title=config_manager.get_embed_title("new_member_title"),
-                description=formatted_greeting,
-                color=discord.Color.green()
-            )
-            embed.set_thumbnail(url=member.display_avatar.url)
-            embed.timestamp = discord.utils.utcnow()
-            await welcome_channel.send(embed=embed)
+            formatted_greeting = style.render_message("default_greeting", user=member.mention)
+        
+        embed = style_embed(style, "new_member_title", discord.Color.green())
+        embed.description = formatted_greeting
+        embed.set_thumbnail(url=member.display_avatar.url)
+        embed.timestamp = discord.utils.utcnow()
+        send_embed(welcome_channel, embed, "welcome")
     
-    @bot.event
+    @events.listen()
     async def on_member_remove(member):
         """Handle member leave events"""
         if member.bot:
@@ -253,202 +422,442 @@ async def setup_invite_logger(bot, config_manager):
         guild = member.guild
         welcome_channel = bot.get_channel(WELCOME_CHANNEL_ID)
         
+        # Check if we know who invited this member
+        member_id = str(member.id)
+        inviter_id = None
+        current_count = 0
+        
+        if config_manager.get_feature_enabled("invite_tracking"):
+            state = await guild_states.ensure_loaded(guild.id)
+            # Only an invite that already counted is taken back
+            inviter_id, current_count = state.member_left(member_id)
+            if inviter_id:
+                logger.debug(f"📉 Invite count for {inviter_id} after {member.name} left: {current_count}")
+                
+                # Take back milestone roles the inviter no longer qualifies for
+                inviter = guild.get_member(int(inviter_id))
+                if inviter:
+                    milestone_roles.schedule(inviter)
+        
+        await invite_analytics.record_leave(guild.id, member.joined_at.timestamp() if member.joined_at else None)
+        
+        logger.info(f"Member {member.id} left server {guild.id}", extra={
+            "event": "member_leave",
+            "guild_id": guild.id,
+            "member_id": member.id,
+            "inviter_id": int(inviter_id) if inviter_id else None,
+            "invite_count": current_count
+        })
+        
         if not welcome_channel or not config_manager.get_feature_enabled("leave_messages"):
             return
         
-        # Check if we know who invited this member
-        member_id = str(member.id)
-        inviter_id = invited_by.get(member_id)
+        style = config_manager.for_guild(guild.id)
         
-        if inviter_id and config_manager.get_feature_enabled("invite_tracking"):
-            # Decrease inviter's count
-            invite_counts[inviter_id] = max(0, invite_counts[inviter_id] - 1)
-            save_invite_counts()
-            
-            # Remove from invited_by tracking
-            del invited_by[member_id]
-            save_invited_by()
-            
-            # Get inviter info
-            try:
-                inviter = await bot.fetch_user(int(inviter_id))
-                inviter_mention = inviter.mention
-                current_count = invite_counts[inviter_id]
-                print(f"📉 Decreased invite count for {inviter.name}: {current_count + 1} -> {current_count}")
-            except:
-                inviter_mention = "Unknown User"
-                current_count = invite_counts[inviter_id]
-            
-            # Send leave message with inviter info
-            leave_message = config_manager.get_random_leave_message()
-            formatted_message = leave_message.format(
+        if inviter_id:
+            # Send leave message with inviter info; a mention only needs the ID
+            formatted_message = style.render_leave_message(
                 user=member.name,
-                inviter=inviter_mention,
+                inviter=f"<@{inviter_id}>",
                 count=current_count
             )
         else:
             # Send default leave message
-            default_leave = config_manager.get_message("default_leave_message") or "Goodbye {user}!"
-            formatted_message = default_leave.format(user=member.name)
+            formatted_message = style.render_message("default_leave_message", user=member.name)
         
-        embed = discord.Embed(
-            title=config_manager.get_embed_title("member_left_title"),
-            description=formatted_message,
-            color=discord.Color.red()
-        )
+        embed = style_embed(style, "member_left_title", discord.Color.red())
+        embed.description = formatted_message
         embed.set_thumbnail(url=member.display_avatar.url)
         embed.timestamp = discord.utils.utcnow()
-        await welcome_channel.send(embed=embed)
+        send_embed(welcome_channel, embed, "leave_message")
+    
+    async def leaderboard_text(guild, entries):
+        """Medal lines for (user_id, count) leaderboard entries"""
+        profiles = await user_resolver.resolve_many(guild, [int(user_id) for user_id, _ in entries])
+        
+        text = ""
+        for i, (user_id, count) in enumerate(entries, 1):
+            profile = profiles.get(int(user_id))
+            username = profile.name if profile else "Unknown User"
+            
+            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+            text += f"{medal} **{username}** - {count} invites\n"
+        return text
     
     # Add invite-related commands
     @bot.command(name="invites")
+    @commands.guild_only()
     async def check_invites(ctx, user: discord.Member = None):
         """Check invite count for a user"""
+        style = config_manager.for_guild(ctx.guild.id)
         if not config_manager.get_feature_enabled("invite_tracking"):
-            await ctx.send(config_manager.get_message("feature_disabled"))
+            await ctx.send(style.get_message("feature_disabled"))
             return
         
         target_user = user or ctx.author
-        user_invites = invite_counts.get(str(target_user.id), 0)
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        user_invites = state.invite_counts.get(str(target_user.id), 0)
+        history = state.ledger.summary(str(target_user.id))
         
         embed = discord.Embed(
-            title=config_manager.get_embed_title("invite_count_title"),
-            description=config_manager.get_message("invite_count_message").format(
+            title=style.get_embed_title("invite_count_title"),
+            description=style.render_message(
+                "invite_count_message",
                 user=target_user.mention,
                 count=user_invites
             ),
             color=discord.Color.blue()
         )
         embed.set_thumbnail(url=target_user.display_avatar.url)
+        if history["pending"] or history["left"] or history["rejoins"]:
+            embed.set_footer(
+                text=f"⏳ {history['pending']} not counted yet · 🚪 {history['left']} left · 🔁 {history['rejoins']} rejoins"
+            )
         await ctx.send(embed=embed)
     
     @bot.command(name="leaderboard", aliases=["lb", "top"])
+    @commands.guild_only()
     async def invite_leaderboard(ctx, limit: int = 10):
         """Show invite leaderboard"""
+        style = config_manager.for_guild(ctx.guild.id)
         if not config_manager.get_feature_enabled("invite_tracking"):
-            await ctx.send(config_manager.get_message("feature_disabled"))
+            await ctx.send(style.get_message("feature_disabled"))
             return
         
         if limit > 20:
             limit = 20
         
-        # Sort users by invite count
-        sorted_invites = sorted(invite_counts.items(), key=lambda x: x[1], reverse=True)
+        # Top inviters from the guild's ranking index
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        top_invites = state.ranking.top(limit)
         
-        if not sorted_invites:
-            embed = discord.Embed(
-                title=config_manager.get_embed_title("leaderboard_title"),
-                description=config_manager.get_message("no_invites_yet"),
-                color=discord.Color.blue()
-            )
+        if not top_invites:
+            embed = style_embed(style, "leaderboard_title", discord.Color.blue(), "no_invites_yet")
             await ctx.send(embed=embed)
             return
         
-        leaderboard_text = ""
-        for i, (user_id, count) in enumerate(sorted_invites[:limit], 1):
-            try:
-                user = await bot.fetch_user(int(user_id))
-                username = user.name
-            except:
-                username = "Unknown User"
-            
-            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-            leaderboard_text += f"{medal} **{username}** - {count} invites\n"
+        embed = discord.Embed(
+            title=style.get_embed_title("leaderboard_title"),
+            description=await leaderboard_text(ctx.guild, top_invites),
+            color=discord.Color.gold()
+        )
+        embed.set_footer(text=f"Top {len(top_invites)} inviters")
+        await ctx.send(embed=embed)
+    
+    @bot.command(name="weekly", aliases=["lbweek"])
+    @commands.guild_only()
+    async def weekly_leaderboard(ctx, limit: int = 10):
+        """Show who invited the most members in the last 7 days"""
+        style = config_manager.for_guild(ctx.guild.id)
+        if not config_manager.get_feature_enabled("invite_tracking"):
+            await ctx.send(style.get_message("feature_disabled"))
+            return
+        
+        # Summed from daily per-inviter buckets, not from individual joins
+        top_invites = (await invite_analytics.get(ctx.guild.id)).top_inviters(days=7, limit=min(limit, 20))
+        
+        if not top_invites:
+            embed = style_embed(style, "weekly_leaderboard_title", discord.Color.blue(), "no_invites_this_week")
+            await ctx.send(embed=embed)
+            return
         
         embed = discord.Embed(
-            title=config_manager.get_embed_title("leaderboard_title"),
-            description=leaderboard_text,
+            title=style.get_embed_title("weekly_leaderboard_title"),
+            description=await leaderboard_text(ctx.guild, top_invites),
             color=discord.Color.gold()
         )
-        embed.set_footer(text=f"Top {min(limit, len(sorted_invites))} inviters")
+        embed.set_footer(text=f"Top {len(top_invites)} inviters of the last 7 days")
+        await ctx.send(embed=embed)
+    
+    @bot.command(name="rank")
+    @commands.guild_only()
+    async def invite_rank(ctx, user: discord.Member = None):
+        """Show a user's position on the invite leaderboard"""
+        style = config_manager.for_guild(ctx.guild.id)
+        if not config_manager.get_feature_enabled("invite_tracking"):
+            await ctx.send(style.get_message("feature_disabled"))
+            return
+        
+        target_user = user or ctx.author
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        position = state.ranking.rank(str(target_user.id))
+        
+        if position:
+            rank, count = position
+            description = style.render_message(
+                "rank_message",
+                user=target_user.mention,
+                rank=rank,
+                count=count
+            )
+        else:
+            description = style.render_message("rank_unranked", user=target_user.mention)
+        
+        embed = discord.Embed(
+            title=style.get_embed_title("rank_title"),
+            description=description,
+            color=discord.Color.gold()
+        )
+        embed.set_thumbnail(url=target_user.display_avatar.url)
         await ctx.send(embed=embed)
     
     @bot.command(name="whoinvited")
+    @commands.guild_only()
     async def who_invited(ctx, user: discord.Member = None):
         """Check who invited a specific user"""
+        style = config_manager.for_guild(ctx.guild.id)
         if not config_manager.get_feature_enabled("invite_tracking"):
-            await ctx.send(config_manager.get_message("feature_disabled"))
+            await ctx.send(style.get_message("feature_disabled"))
             return
         
         target_user = user or ctx.author
-        inviter_id = invited_by.get(str(target_user.id))
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        inviter_id = state.invited_by.get(str(target_user.id))
         
         if not inviter_id:
             embed = discord.Embed(
-                title=config_manager.get_embed_title("who_invited_title"),
-                description=config_manager.get_message("inviter_unknown").format(user=target_user.mention),
+                title=style.get_embed_title("who_invited_title"),
+                description=style.render_message("inviter_unknown", user=target_user.mention),
                 color=discord.Color.orange()
             )
         else:
-            try:
-                inviter = await bot.fetch_user(int(inviter_id))
+            inviter = await user_resolver.resolve(ctx.guild, int(inviter_id))
+            if inviter:
                 embed = discord.Embed(
-                    title=config_manager.get_embed_title("who_invited_title"),
-                    description=config_manager.get_message("invited_by_message").format(
+                    title=style.get_embed_title("who_invited_title"),
+                    description=style.render_message(
+                        "invited_by_message",
                         user=target_user.mention,
                         inviter=inviter.mention
                     ),
                     color=discord.Color.green()
                 )
-                embed.set_thumbnail(url=inviter.display_avatar.url)
-            except:
+                embed.set_thumbnail(url=inviter.avatar_url)
+            else:
                 embed = discord.Embed(
-                    title=config_manager.get_embed_title("who_invited_title"),
-                    description=config_manager.get_message("inviter_not_found").format(user=target_user.mention),
+                    title=style.get_embed_title("who_invited_title"),
+                    description=style.render_message("inviter_not_found", user=target_user.mention),
                     color=discord.Color.red()
                 )
         
         await ctx.send(embed=embed)
     
     @bot.command(name="resetinvites")
+    @commands.guild_only()
     @commands.has_permissions(administrator=True)
     async def reset_invites(ctx, user: discord.Member = None):
         """Reset invite count for a user or all users (admin only)"""
+        style = config_manager.for_guild(ctx.guild.id)
         if not config_manager.get_feature_enabled("invite_tracking"):
-            await ctx.send(config_manager.get_message("feature_disabled"))
+            await ctx.send(style.get_message("feature_disabled"))
             return
         
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        
         if user:
             # Reset specific user
             user_id = str(user.id)
-            old_count = invite_counts.get(user_id, 0)
-            invite_counts[user_id] = 0
-            save_invite_counts()
+            old_count = state.invite_counts.get(user_id, 0)
+            state.set_count(user_id, 0)
+            milestone_roles.schedule(user)
             
             embed = discord.Embed(
-                title=config_manager.get_embed_title("reset_invites_title"),
-                description=config_manager.get_message("user_invites_reset").format(
+                title=style.get_embed_title("reset_invites_title"),
+                description=style.render_message(
+                    "user_invites_reset",
                     user=user.mention,
                     count=old_count
                 ),
                 color=discord.Color.green()
             )
         else:
-            # Reset all invites
-            total_users = len(invite_counts)
-            invite_counts.clear()
-            invited_by.clear()
-            save_invite_counts()
-            save_invited_by()
+            # Reset all invites on this server
+            total_users = len(state.invite_counts)
+            state.clear()
+            # Members still holding milestone roles lose them in the background
+            if milestone_roles.milestones:
+                bot.loop.create_task(milestone_roles.reconcile(ctx.guild, ()))
             
             embed = discord.Embed(
-                title=config_manager.get_embed_title("reset_invites_title"),
-                description=config_manager.get_message("all_invites_reset").format(count=total_users),
+                title=style.get_embed_title("reset_invites_title"),
+                description=style.render_message("all_invites_reset", count=total_users),
                 color=discord.Color.green()
             )
         
         await ctx.send(embed=embed)
     
+    @bot.command(name="syncroles")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def sync_roles(ctx):
+        """Reconcile every inviter's milestone roles with their invite count (admin only)"""
+        style = config_manager.for_guild(ctx.guild.id)
+        if not milestone_roles.milestones:
+            await ctx.send(style.get_message("milestones_not_configured"))
+            return
+        
+        await ctx.send(style.get_message("sync_roles_started"))
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        stats = await milestone_roles.reconcile(ctx.guild, list(state.invite_counts))
+        
+        embed = style_embed(style, "sync_roles_title", discord.Color.green() if not stats["failed"] else discord.Color.orange())
+        embed.description = style.render_message("sync_roles_done", **stats)
+        await ctx.send(embed=embed)
+    
+    @bot.command(name="backfill")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def backfill_invites(ctx):
+        """Run or resume attribution of joins missed while the bot was offline (admin only)"""
+        style = config_manager.for_guild(ctx.guild.id)
+        if not config_manager.get_feature_enabled("invite_tracking"):
+            await ctx.send(style.get_message("feature_disabled"))
+            return
+        
+        window = invite_tracker.downtime.pop(ctx.guild.id, None)
+        if window is not None:
+            await invite_backfill.register(ctx.guild.id, window)
+        if not invite_backfill.pending(ctx.guild.id):
+            await ctx.send(style.get_message("backfill_nothing_pending"))
+            return
+        
+        await ctx.send(style.get_message("backfill_started"))
+        try:
+            stats = await invite_backfill.start(ctx.guild)
+        except Exception as e:
+            logger.error(f"❌ Error backfilling invites for server {ctx.guild.name}: {e}")
+            await ctx.send(style.get_message("backfill_failed"))
+            return
+        if stats is None:
+            await ctx.send(style.get_message("backfill_nothing_pending"))
+            return
+        
+        embed = style_embed(style, "backfill_title", discord.Color.blue())
+        embed.description = style.render_message(
+            "backfill_done", scanned=stats["scanned"], high=stats["high"], low=stats["low"],
+            unattributed=stats["unattributed"]
+        )
+        embed.set_footer(text=style.get_message("sync_roles_hint"))
+        await ctx.send(embed=embed)
+    
+    @bot.command(name="exportinvites")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def export_invites(ctx, fmt: str = "jsonl"):
+        """Export this server's invite data as a JSONL or CSV file (admin only)"""
+        style = config_manager.for_guild(ctx.guild.id)
+        if not config_manager.get_feature_enabled("invite_tracking"):
+            await ctx.send(style.get_message("feature_disabled"))
+            return
+        
+        fmt = fmt.lower()
+        if fmt not in EXPORT_FORMATS:
+            await ctx.send(style.get_message("export_bad_format"))
+            return
+        
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        # Handlers keep changing the live data while the file is written, so the
+        # worker streams from a compact copy of the columns taken on the loop
+        invite_counts, invited_by = state.invite_counts.clone(), state.invited_by.clone()
+        fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+        os.close(fd)
+        try:
+            rows = await bot.loop.run_in_executor(
+                None, export_to_file, path, invite_counts, invited_by, fmt, ctx.guild.id
+            )
+            if os.path.getsize(path) > ctx.guild.filesize_limit:
+                await ctx.send(style.render_message(
+                    "export_too_large", command=f"python invite_data.py export {ctx.guild.id} -f {fmt}"
+                ))
+                return
+            logger.info(f"📤 Exported {rows} invite rows for server {ctx.guild.name}", extra={
+                "event": "invite_export",
+                "guild_id": ctx.guild.id,
+                "rows": rows,
+                "format": fmt
+            })
+            await ctx.send(
+                style.render_message("export_done", rows=rows),
+                file=discord.File(path, filename=f"invites_{ctx.guild.id}.{fmt}")
+            )
+        finally:
+            os.remove(path)
+    
+    @bot.command(name="importinvites")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def import_invites(ctx, mode: str = "merge"):
+        """Import invite data from an attached JSONL or CSV file (admin only)"""
+        style = config_manager.for_guild(ctx.guild.id)
+        if not config_manager.get_feature_enabled("invite_tracking"):
+            await ctx.send(style.get_message("feature_disabled"))
+            return
+        
+        mode = mode.lower()
+        if mode not in ("merge", "replace") or not ctx.message.attachments:
+            await ctx.send(style.get_message("import_usage"))
+            return
+        
+        attachment = ctx.message.attachments[0]
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(attachment.filename)[1])
+        os.close(fd)
+        try:
+            await attachment.save(path)
+            # Nothing is applied until every row has been validated
+            batch = await bot.loop.run_in_executor(None, import_from_file, path)
+        except InviteImportError as e:
+            embed = style_embed(style, "import_rejected_title", discord.Color.red())
+            embed.description = "\n".join(e.errors)
+            if e.total > len(e.errors):
+                embed.set_footer(text=style.render_message("import_problems_more", count=e.total - len(e.errors)))
+            await ctx.send(embed=embed)
+            return
+        except (OSError, UnicodeDecodeError, discord.HTTPException) as e:
+            logger.error(f"❌ Error reading invite import for server {ctx.guild.name}: {e}")
+            await ctx.send(style.get_message("import_unreadable"))
+            return
+        finally:
+            os.remove(path)
+        
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        state.apply_batch(batch.invite_counts, batch.invited_by, replace=mode == "replace")
+        await invite_flusher.flush()
+        logger.info(f"📥 Imported {batch.rows} invite rows for server {ctx.guild.name}", extra={
+            "event": "invite_import",
+            "guild_id": ctx.guild.id,
+            "counts": len(batch.invite_counts),
+            "inviters": len(batch.invited_by),
+            "mode": mode
+        })
+        
+        embed = style_embed(style, "import_title", discord.Color.green())
+        embed.description = style.render_message(
+            "import_done", counts=len(batch.invite_counts), inviters=len(batch.invited_by), mode=mode
+        )
+        embed.set_footer(text=style.get_message("sync_roles_hint"))
+        await ctx.send(embed=embed)
+    
+    # !invitestats periods: hourly ring for the last day, daily buckets beyond
+    STATS_PERIODS = {"24h": (24, None), "7d": (None, 7), "30d": (None, 30)}
+    
     @bot.command(name="invitestats")
-    async def invite_stats(ctx):
-        """Show general invite statistics"""
+    @commands.guild_only()
+    async def invite_stats(ctx, period: str = None):
+        """Show invite statistics, all-time or for the last 24h, 7d or 30d"""
+        style = config_manager.for_guild(ctx.guild.id)
         if not config_manager.get_feature_enabled("invite_tracking"):
-            await ctx.send(config_manager.get_message("feature_disabled"))
+            await ctx.send(style.get_message("feature_disabled"))
             return
         
-        total_invites = sum(invite_counts.values())
-        total_inviters = len([count for count in invite_counts.values() if count > 0])
-        total_members = len(invited_by)
+        if period is not None:
+            await period_stats(ctx, period.lower())
+            return
+        
+        state = await guild_states.ensure_loaded(ctx.guild.id)
+        # The ranking index sums per distinct count instead of per user
+        total_invites = state.ranking.total()
+        total_inviters = len(state.ranking)
+        total_members = len(state.invited_by)
         
         stats_text = f"""
         📊 **Server Invite Statistics**
@@ -463,16 +872,58 @@ async def setup_invite_logger(bot, config_manager):
             description=stats_text,
             color=discord.Color.blue()
         )
+        embed.set_footer(text="Use !invitestats 24h, 7d or 30d for recent activity")
+        embed.timestamp = discord.utils.utcnow()
+        await ctx.send(embed=embed)
+    
+    async def period_stats(ctx, period):
+        """Joins, leaves, retention and top inviters of a recent period"""
+        style = config_manager.for_guild(ctx.guild.id)
+        if period not in STATS_PERIODS:
+            await ctx.send(style.get_message("period_invalid"))
+            return
+        
+        analytics = await invite_analytics.get(ctx.guild.id)
+        hours, days = STATS_PERIODS[period]
+        counters = analytics.recent(hours) if hours else analytics.period(days)
+        joins, leaves, attributed = counters[JOINS], counters[LEAVES], counters[ATTRIBUTED]
+        
+        stats_text = style.render_message(
+            "period_stats", joins=joins, attributed=attributed, leaves=leaves, net=f"{joins - leaves:+d}"
+        ) + "\n"
+        if days:
+            retained, measured = analytics.retention(days)
+            if retained is None:
+                stats_text += style.render_message("retention_not_enough_data", days=days) + "\n"
+            else:
+                stats_text += style.render_message(
+                    "retention_line", days=days, percent=f"{retained:.0%}", measured=measured
+                ) + "\n"
+            
+            top_invites = analytics.top_inviters(days=days, limit=5)
+            if top_invites:
+                stats_text += "\n" + await leaderboard_text(ctx.guild, top_invites)
+        
+        embed = discord.Embed(
+            title=style.render_message("period_stats_title", period=period),
+            description=stats_text,
+            color=discord.Color.blue()
+        )
         embed.timestamp = discord.utils.utcnow()
         await ctx.send(embed=embed)
     
     @bot.command(name="myinvites")
+    @commands.guild_only()
     async def my_invites(ctx):
         """Check your own invite count (shortcut)"""
         await check_invites(ctx, ctx.author)
     
     # Error handling for commands
     @reset_invites.error
+    @sync_roles.error
+    @backfill_invites.error
+    @export_invites.error
+    @import_invites.error
     async def reset_invites_error(ctx, error):
         if isinstance(error, commands.MissingPermissions):
             embed = discord.Embed(
@@ -482,5 +933,8 @@ async def setup_invite_logger(bot, config_manager):
             )
             await ctx.send(embed=embed)
     
-    print("✅ Invite logger setup completed")
+    # setup_invite_logger runs from the first on_ready, so warm up right away
+    bot.loop.create_task(warm_up_invite_cache())
+    
+    logger.info("✅ Invite logger setup completed")
 
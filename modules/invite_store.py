@@ -0,0 +1,458 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from modules.compact_map import SnowflakeMap
+from modules.ledger import InviteeRecord, InviteeTable
+
+logger = logging.getLogger("bot.invites.store")
+
+# Binary snapshot: header, then the key/value/index columns of invite_counts
+# and invited_by and the columns of the invitee ledger as little-endian
+# int64 (ledger flags as bytes), then a JSON tail with any IDs the columns
+# cannot hold. Version 1 had no ledger columns and kept the ledger in the tail.
+SNAPSHOT_MAGIC = b"INVSNAP2"
+SNAPSHOT_HEADER = struct.Struct("<8sq7Q")
+SNAPSHOT_V1_MAGIC = b"INVSNAP1"
+SNAPSHOT_V1_HEADER = struct.Struct("<8sq5Q")
+
+class InviteStore:
+    """Append-only event log with periodic compacted snapshots for invite data.
+
+    Every mutation becomes one small JSON line in the event log, so the cost of a
+    write does not depend on how many members are tracked. Once the log grows
+    larger than the live state it is folded into a new snapshot, which keeps
+    compaction amortized O(1) per write. Snapshots are written to a temporary
+    file and atomically renamed, and a torn last line in the log (crash during
+    append) is discarded on recovery.
+
+    Counts, inviter links and the invitee ledger are held in int64 columns
+    (SnowflakeMap, InviteeTable), and snapshots store those columns as raw
+    arrays, so loading one is a few memory copies out of an mmap instead of
+    parsing a JSON object per member.
+    """
+
+    SNAPSHOT_FILE = "invite_snapshot.bin"
+    JSON_SNAPSHOT_FILE = "invite_snapshot.json"
+    LOG_FILE = "invite_events.log"
+    LEGACY_COUNTS_FILE = "invite_counts.json"
+    LEGACY_INVITED_BY_FILE = "invited_by.json"
+
+    def __init__(self, data_dir: str = "data", compact_every: int = 1000, fsync: bool = False):
+        self.data_dir = data_dir
+        self.snapshot_path = os.path.join(data_dir, self.SNAPSHOT_FILE)
+        self.json_snapshot_path = os.path.join(data_dir, self.JSON_SNAPSHOT_FILE)
+        self.log_path = os.path.join(data_dir, self.LOG_FILE)
+        self.compact_every = compact_every
+        self.fsync = fsync
+
+        self.invite_counts = SnowflakeMap()
+        self.invited_by = SnowflakeMap(str_values=True)
+        self.invitees = InviteeTable()
+        self.seq = 0
+        self._log_records = 0
+        self._log_file = None
+        self._io_lock = threading.Lock()
+
+        # Write-behind state: keys changed since the last flush
+        self._dirty_counts: Set[str] = set()
+        self._dirty_members: Set[str] = set()
+        self._dirty_invitees: Set[str] = set()
+        self._pending_clear = False
+        self._force_compact = False
+        self._retry_records: List[Dict] = []
+        self.on_dirty: Optional[Callable[["InviteStore"], None]] = None
+
+    # === Recovery ===
+
+    def load(self):
+        """Recover state from the latest snapshot plus the event log tail"""
+        self.close()
+        os.makedirs(self.data_dir, exist_ok=True)
+
+        self.invite_counts = SnowflakeMap()
+        self.invited_by = SnowflakeMap(str_values=True)
+        self.invitees = InviteeTable()
+        self.seq = 0
+        self._log_records = 0
+        self._dirty_counts = set()
+        self._dirty_members = set()
+        self._dirty_invitees = set()
+        self._pending_clear = False
+        self._force_compact = False
+        self._retry_records = []
+
+        if os.path.exists(self.snapshot_path):
+            self._load_snapshot()
+            migrated = False
+        elif os.path.exists(self.json_snapshot_path):
+            self._load_json_snapshot()
+            migrated = True
+        else:
+            migrated = self._load_legacy_files()
+
+        self._replay_log()
+
+        if migrated:
+            # Fold legacy JSON into the binary snapshot right away
+            self.compact()
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    counts, links, invitees, seq = self._read_snapshot(view)
+                finally:
+                    view.release()
+        except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+            logger.warning(f"⚠️  Error loading {self.snapshot_path}: {e}")
+            logger.info("🔄 Rebuilding invite data from event log...")
+            return
+
+        self.invite_counts = counts
+        self.invited_by = links
+        self.invitees = invitees
+        self.seq = seq
+
+    @staticmethod
+    def _read_snapshot(view: memoryview) -> Tuple[SnowflakeMap, SnowflakeMap, InviteeTable, int]:
+        magic = bytes(view[:8])
+        if magic == SNAPSHOT_MAGIC:
+            (_, seq, count_rows, count_slots, link_rows, link_slots, invitee_rows, invitee_slots,
+             meta_size) = SNAPSHOT_HEADER.unpack_from(view)
+            offset = SNAPSHOT_HEADER.size
+        elif magic == SNAPSHOT_V1_MAGIC:
+            _, seq, count_rows, count_slots, link_rows, link_slots, meta_size = SNAPSHOT_V1_HEADER.unpack_from(view)
+            invitee_rows = invitee_slots = 0
+            offset = SNAPSHOT_V1_HEADER.size
+        else:
+            raise ValueError("not an invite snapshot")
+        # (bytes per item, items) of each column in file order
+        sizes = [(8, count_rows), (8, count_rows), (8, count_slots), (8, link_rows), (8, link_rows), (8, link_slots)]
+        if magic == SNAPSHOT_MAGIC:
+            sizes += [(8, invitee_rows)] * 5 + [(1, invitee_rows), (8, invitee_slots)]
+        if len(view) != offset + sum(width * items for width, items in sizes) + meta_size:
+            raise ValueError("truncated invite snapshot")
+
+        columns = []
+        try:
+            for width, items in sizes:
+                columns.append(view[offset:offset + width * items])
+                offset += width * items
+            meta = json.loads(bytes(view[offset:offset + meta_size]).decode('utf-8'))
+            counts = SnowflakeMap.from_columns(*columns[:3], meta.get("invite_counts", {}))
+            links = SnowflakeMap.from_columns(*columns[3:6], meta.get("invited_by", {}), str_values=True)
+            if magic == SNAPSHOT_MAGIC:
+                invitees = InviteeTable.from_columns(columns[6:], meta.get("invitee_names", {}))
+            else:
+                invitees = InviteeTable({member_id: InviteeRecord.from_list(values)
+                                         for member_id, values in meta.get("invitees", {}).items()})
+        finally:
+            # The mmap cannot be closed while slices of it are alive
+            for column in columns:
+                column.release()
+        return counts, links, invitees, seq
+
+    def _load_json_snapshot(self):
+        """Read a snapshot written by the JSON format that preceded the binary one"""
+        try:
+            with open(self.json_snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"⚠️  Error loading {self.json_snapshot_path}: {e}")
+            logger.info("🔄 Rebuilding invite data from event log...")
+            return
+
+        self.invite_counts.update(snapshot.get("invite_counts", {}))
+        self.invited_by.update(snapshot.get("invited_by", {}))
+        self.invitees = InviteeTable({member_id: InviteeRecord.from_list(values)
+                                      for member_id, values in snapshot.get("invitees", {}).items()})
+        self.seq = int(snapshot.get("seq", 0))
+        logger.info("🔄 Converting JSON invite snapshot to the binary format...")
+
+    def _load_legacy_files(self) -> bool:
+        """Import data written by the old whole-file JSON format"""
+        migrated = False
+        legacy_counts = self._read_legacy_json(self.LEGACY_COUNTS_FILE)
+        if legacy_counts:
+            self.invite_counts.update(legacy_counts)
+            migrated = True
+
+        legacy_invited_by = self._read_legacy_json(self.LEGACY_INVITED_BY_FILE)
+        if legacy_invited_by:
+            self.invited_by.update(legacy_invited_by)
+            migrated = True
+
+        if migrated:
+            logger.info("🔄 Migrating legacy invite data to snapshot + event log...")
+        return migrated
+
+    def _read_legacy_json(self, filename: str) -> Optional[Dict]:
+        path = os.path.join(self.data_dir, filename)
+        try:
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read().strip()
+                    if content:
+                        return json.loads(content)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"⚠️  Error loading legacy {filename}: {e}")
+        return None
+
+    def _replay_log(self):
+        if not os.path.exists(self.log_path):
+            return
+
+        good_offset = 0
+        torn = False
+        with open(self.log_path, 'rb') as f:
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    torn = True
+                    break
+                try:
+                    record = json.loads(raw_line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    torn = True
+                    break
+
+                good_offset += len(raw_line)
+                record_seq = record.get("seq", 0)
+                if record_seq <= self.seq:
+                    # Already folded into the snapshot
+                    continue
+                self._apply(record)
+                self.seq = record_seq
+                self._log_records += 1
+
+        if torn:
+            logger.warning(f"⚠️  Discarding torn tail of {self.log_path} at byte {good_offset}")
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(good_offset)
+
+    def _apply(self, record: Dict):
+        if record.get("clear"):
+            self.invite_counts.clear()
+            self.invited_by.clear()
+            self.invitees.clear()
+        elif "c" in record:
+            self.invite_counts[record["c"]] = record["v"]
+        elif "m" in record:
+            if record.get("i") is None:
+                self.invited_by.pop(record["m"], None)
+            else:
+                self.invited_by[record["m"]] = record["i"]
+        elif "l" in record:
+            if record.get("r") is None:
+                self.invitees.pop(record["l"], None)
+            else:
+                self.invitees[record["l"]] = InviteeRecord.from_list(record["r"])
+
+    def refresh(self) -> None:
+        """A file partition has a single writer, so there is never anything to pick up"""
+        return None
+
+    # === Mutations ===
+    #
+    # Mutations only touch memory and mark keys dirty. Repeated changes to the
+    # same key between flushes coalesce into a single log record.
+
+    def increment(self, user_id: str, delta: int = 1) -> int:
+        """Adjust a user's invite count, clamped at zero, and return the new value"""
+        value = max(0, self.invite_counts.get(user_id, 0) + delta)
+        self.set_count(user_id, value)
+        return value
+
+    def set_count(self, user_id: str, count: int):
+        """Set a user's invite count"""
+        self.invite_counts[user_id] = count
+        self._dirty_counts.add(user_id)
+        self._mark_dirty()
+
+    def set_inviter(self, member_id: str, inviter_id: Optional[str]):
+        """Record who invited a member, or forget it when inviter_id is None"""
+        if inviter_id is None:
+            self.invited_by.pop(member_id, None)
+        else:
+            self.invited_by[member_id] = inviter_id
+        self._dirty_members.add(member_id)
+        self._mark_dirty()
+
+    def touch_invitee(self, member_id: str):
+        """Mark a ledger record changed in place so the next flush writes it"""
+        self._dirty_invitees.add(member_id)
+        self._mark_dirty()
+
+    def clear(self):
+        """Forget all invite counts, inviter links and invitee history"""
+        self.invite_counts.clear()
+        self.invited_by.clear()
+        self.invitees.clear()
+        self._dirty_counts.clear()
+        self._dirty_members.clear()
+        self._dirty_invitees.clear()
+        self._pending_clear = True
+        self._mark_dirty()
+
+    def apply_batch(self, invite_counts: Dict[str, int], invited_by: Dict[str, str], replace: bool = False):
+        """Apply many changes at once, replacing all data when ``replace`` is set.
+
+        The next flush writes the result as one snapshot instead of log
+        records, so on disk the batch lands completely or not at all.
+        """
+        if replace:
+            # Old invitee history would otherwise move the imported counts later
+            self.invite_counts.clear()
+            self.invited_by.clear()
+            self.invitees.clear()
+            self._dirty_counts.clear()
+            self._dirty_members.clear()
+            self._dirty_invitees.clear()
+        self.invite_counts.update(invite_counts)
+        self.invited_by.update(invited_by)
+        self._force_compact = True
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        if self.on_dirty is not None:
+            self.on_dirty(self)
+
+    @property
+    def pending_count(self) -> int:
+        """Number of coalesced records waiting to be written"""
+        return (len(self._dirty_counts) + len(self._dirty_members) + len(self._dirty_invitees)
+                + len(self._retry_records)
+                + int(self._pending_clear) + int(self._force_compact))
+
+    # === Persistence ===
+
+    def take_pending(self) -> Tuple[List[Dict], Optional[Dict]]:
+        """Turn dirty state into log records, or a snapshot when compaction is due.
+
+        Must be called from the thread that mutates the store (the event loop);
+        the result can then be written from any thread with write_pending().
+        """
+        records = self._retry_records
+        self._retry_records = []
+
+        if self._pending_clear:
+            records.append({"clear": True})
+        for user_id in self._dirty_counts:
+            records.append({"c": user_id, "v": self.invite_counts.get(user_id, 0)})
+        for member_id in self._dirty_members:
+            records.append({"m": member_id, "i": self.invited_by.get(member_id)})
+        for member_id in self._dirty_invitees:
+            invitee = self.invitees.get(member_id)
+            records.append({"l": member_id, "r": invitee.to_list() if invitee is not None else None})
+
+        self._pending_clear = False
+        self._dirty_counts = set()
+        self._dirty_members = set()
+        self._dirty_invitees = set()
+
+        for record in records:
+            if "seq" not in record:
+                self.seq += 1
+                record["seq"] = self.seq
+
+        live_size = len(self.invite_counts) + len(self.invited_by) + len(self.invitees)
+        if self._force_compact or (records and self._log_records + len(records) >= max(self.compact_every, live_size)):
+            self._force_compact = False
+            self._log_records = 0
+            return [], self._build_snapshot()
+
+        self._log_records += len(records)
+        return records, None
+
+    def write_pending(self, records: List[Dict], snapshot: Optional[Dict] = None):
+        """Write records taken by take_pending(); safe to run in a worker thread"""
+        with self._io_lock:
+            if snapshot is not None:
+                self._write_snapshot(snapshot)
+            if records:
+                self._append(records)
+
+    def requeue(self, records: List[Dict], snapshot: Optional[Dict] = None):
+        """Give back records whose write failed so the next flush retries them"""
+        if snapshot is not None:
+            self._force_compact = True
+        self._retry_records = records + self._retry_records
+
+    def flush(self):
+        """Synchronously write all pending changes"""
+        records, snapshot = self.take_pending()
+        try:
+            self.write_pending(records, snapshot)
+        except Exception:
+            self.requeue(records, snapshot)
+            raise
+
+    def compact(self):
+        """Write the current state to a fresh snapshot and truncate the event log"""
+        self._force_compact = True
+        self.flush()
+
+    def _append(self, records: List[Dict]):
+        if self._log_file is None:
+            os.makedirs(self.data_dir, exist_ok=True)
+            self._log_file = open(self.log_path, 'a', encoding='utf-8')
+
+        lines = [json.dumps(record, ensure_ascii=False, separators=(",", ":")) for record in records]
+        self._log_file.write("\n".join(lines) + "\n")
+        self._log_file.flush()
+        if self.fsync:
+            os.fsync(self._log_file.fileno())
+
+    def _build_snapshot(self) -> Dict:
+        # Column copies are plain memory copies, cheap enough for the event loop
+        return {
+            "seq": self.seq,
+            "invite_counts": self.invite_counts.columns(),
+            "invited_by": self.invited_by.columns(),
+            "invitees": self.invitees.columns(),
+        }
+
+    def _write_snapshot(self, snapshot: Dict):
+        os.makedirs(self.data_dir, exist_ok=True)
+        counts, links = snapshot["invite_counts"], snapshot["invited_by"]
+        invitee_columns, invitee_names = snapshot["invitees"]
+        meta = json.dumps(
+            {"invite_counts": counts[3], "invited_by": links[3], "invitee_names": invitee_names},
+            ensure_ascii=False, separators=(",", ":")
+        ).encode('utf-8')
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, snapshot["seq"], len(counts[0]) // 8, len(counts[2]) // 8,
+            len(links[0]) // 8, len(links[2]) // 8, len(invitee_columns[0]) // 8, len(invitee_columns[-1]) // 8,
+            len(meta)
+        )
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            for column in counts[:3] + links[:3] + tuple(invitee_columns):
+                f.write(column)
+            f.write(meta)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if os.path.exists(self.json_snapshot_path):
+            os.remove(self.json_snapshot_path)
+
+        # Records up to the snapshot's seq now live in the snapshot; a crash
+        # before this truncate is harmless because replay skips them by seq.
+        if self._log_file is not None:
+            self._log_file.close()
+        self._log_file = open(self.log_path, 'w', encoding='utf-8')
+
+    def close(self):
+        """Close the event log file handle"""
+        with self._io_lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
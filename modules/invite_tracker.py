@@ -0,0 +1,493 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from modules.instrumentation import instruments
+
+logger = logging.getLogger("bot.invites.tracker")
+
+class CachedInvite(NamedTuple):
+    """Compact cache entry for one invite code"""
+    uses: int
+    inviter_id: Optional[int]
+    max_uses: int
+    expires_at: Optional[float]
+
+class Attribution(NamedTuple):
+    """Result of resolving which invite a member joined through"""
+    inviter_id: int
+    inviter: Optional[object]
+    code: str
+    ambiguous: bool
+
+class DowntimeWindow(NamedTuple):
+    """Invite uses that happened while the bot was offline"""
+    since: float
+    until: float
+    # code -> (uses no live join claimed, inviter_id, created_at)
+    uses: Dict[str, Tuple[int, Optional[int], float]]
+
+def _cache_entry(invite, uses: Optional[int] = None) -> CachedInvite:
+    inviter = invite.inviter
+    expires_at = invite.expires_at
+    return CachedInvite(
+        (invite.uses or 0) if uses is None else uses,
+        inviter.id if inviter is not None else None,
+        invite.max_uses or 0,
+        expires_at.timestamp() if expires_at else None
+    )
+
+def _join_sort_key(member):
+    joined_at = member.joined_at
+    return (joined_at.timestamp() if joined_at else 0.0, member.id)
+
+class InviteTracker:
+    """Serialized, batched invite-use attribution per guild.
+
+    The cache is a per-guild dict of invite code -> CachedInvite holding the
+    last attributed use count. Create and delete events update it in O(1),
+    expired invites are evicted from a per-guild expiry heap, and a
+    low-frequency reconciliation pass corrects any drift. Joins
+    are queued per guild and drained by a single worker, so concurrent joins
+    never diff against the same snapshot twice, and every ``guild.invites()``
+    fetch resolves all members queued while the previous fetch was in flight.
+    """
+
+    ACTIVITY_HALF_LIFE = 3600.0
+
+    def __init__(self, batch_delay: float = 0.0, unclaimed_grace: float = 15.0, tombstone_ttl: float = 60.0,
+                 snapshot_path: Optional[str] = None):
+        self.batch_delay = batch_delay
+        self.unclaimed_grace = unclaimed_grace
+        self.tombstone_ttl = tombstone_ttl
+        self.snapshot_path = snapshot_path
+
+        self.invites: Dict[int, Dict[str, CachedInvite]] = {}
+        # guild_id -> code -> (entry, deleted_at)
+        self._tombstones: Dict[int, Dict[str, Tuple[CachedInvite, float]]] = {}
+        # guild_id -> heap of (expires_at, code); stale entries are skipped lazily
+        self._expiry: Dict[int, List[Tuple[float, str]]] = {}
+        # guild_id -> code -> first time extra uses were seen without a matching join
+        self._unclaimed_since: Dict[int, Dict[str, float]] = {}
+
+        self._pending: Dict[int, List[Tuple[object, asyncio.Future]]] = {}
+        # guild_id -> batch delay overriding batch_delay, e.g. during a join burst
+        self._batch_delays: Dict[int, float] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._reconcile_task: Optional[asyncio.Task] = None
+
+        # Warm-up state: guild_id -> event set once the guild's snapshot lands
+        self._loading: Dict[int, asyncio.Event] = {}
+        self._warmup_heap: Optional[List] = None
+        self._warmup_seq = itertools.count()
+        # guild_id -> (decayed join score, updated_at); drives warm-up order
+        self._activity: Dict[int, Tuple[float, float]] = {}
+        # Baselines saved by the previous run, used for joins queued during warm-up
+        self._persisted: Dict[int, Dict[str, CachedInvite]] = {}
+        self._persisted_at: Optional[float] = None
+        # guild_id -> invite uses between the previous run's snapshot and warm-up
+        self.downtime: Dict[int, DowntimeWindow] = {}
+
+    # === Cache maintenance ===
+
+    def load_guild(self, guild_id: int, invite_list):
+        """Replace a guild's cache with a freshly fetched invite list"""
+        self._set_cache(guild_id, {invite.code: _cache_entry(invite) for invite in invite_list})
+        self._tombstones.pop(guild_id, None)
+        self._unclaimed_since.pop(guild_id, None)
+
+    def _set_cache(self, guild_id: int, cache: Dict[str, CachedInvite]):
+        self.invites[guild_id] = cache
+        heap = [(entry.expires_at, code) for code, entry in cache.items() if entry.expires_at]
+        heapq.heapify(heap)
+        self._expiry[guild_id] = heap
+
+    def add_invite(self, invite):
+        """Apply an invite create event"""
+        guild_id = invite.guild.id
+        guild_invites = self.invites.get(guild_id)
+        if guild_invites is not None:
+            entry = _cache_entry(invite)
+            guild_invites[invite.code] = entry
+            if entry.expires_at:
+                heapq.heappush(self._expiry[guild_id], (entry.expires_at, invite.code))
+
+    def remove_invite(self, invite):
+        """Apply an invite delete event.
+
+        Discord also deletes an invite when its last use is consumed, so the
+        entry is kept as a tombstone for a short while and can still be
+        matched to the join that used it up.
+        """
+        guild_id = invite.guild.id
+        cached = self.invites.get(guild_id, {}).pop(invite.code, None)
+        if cached is not None:
+            self._tombstones.setdefault(guild_id, {})[invite.code] = (cached, time.monotonic())
+
+    def evict_expired(self, guild_id: int, now: Optional[float] = None) -> int:
+        """Drop invites whose expiry time has passed and return how many were evicted"""
+        now = time.time() if now is None else now
+        heap = self._expiry.get(guild_id)
+        guild_invites = self.invites.get(guild_id)
+        evicted = 0
+        while heap and heap[0][0] <= now:
+            expires_at, code = heapq.heappop(heap)
+            entry = guild_invites.get(code) if guild_invites is not None else None
+            if entry is not None and entry.expires_at == expires_at:
+                del guild_invites[code]
+                evicted += 1
+        return evicted
+
+    # === Reconciliation ===
+
+    def start_reconciliation(self, bot, interval: float = 900.0):
+        """Start the background task that periodically corrects cache drift"""
+        if self._reconcile_task is None or self._reconcile_task.done():
+            self._reconcile_task = asyncio.get_running_loop().create_task(self._reconcile_loop(bot, interval))
+
+    async def _reconcile_loop(self, bot, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            for guild in list(bot.guilds):
+                if guild.id not in self.invites:
+                    continue
+                try:
+                    await self.reconcile(guild)
+                except Exception as e:
+                    logger.error(f"❌ Error reconciling invite cache for server {guild.name}: {e}")
+            if self.snapshot_path:
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, self.snapshot())
+                except Exception as e:
+                    logger.error(f"❌ Error saving invite cache snapshot: {e}")
+
+    async def reconcile(self, guild):
+        """Refetch a guild's invites and fold missed events into the cache"""
+        async with self._lock(guild.id):
+            codes_before = set(self.invites.get(guild.id, ()))
+            current_invites = await self._fetch(guild)
+            old = self.invites.get(guild.id)
+            if old is None:
+                self.load_guild(guild.id, current_invites)
+                return
+            # Invites whose create event was missed are baselined at their
+            # current uses instead of being treated as fresh joins
+            for invite in current_invites:
+                if invite.code not in old:
+                    old[invite.code] = _cache_entry(invite)
+                    codes_before.add(invite.code)
+            self._attribute(guild.id, [], current_invites, codes_before)
+
+    def _lock(self, guild_id: int) -> asyncio.Lock:
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        return lock
+
+    @staticmethod
+    async def _fetch(guild) -> list:
+        """Fetch a guild's invites, timed as a REST request"""
+        with instruments.rest("invites"):
+            return await guild.invites()
+
+    # === Snapshot persistence ===
+
+    def snapshot(self) -> Dict:
+        """Serializable copy of all cached baselines and join activity"""
+        return {
+            "saved_at": time.time(),
+            "guilds": {
+                str(guild_id): {code: list(entry) for code, entry in cache.items()}
+                for guild_id, cache in self.invites.items()
+            },
+            "activity": {str(guild_id): list(value) for guild_id, value in self._activity.items()},
+        }
+
+    def _write_snapshot(self, snapshot: Dict):
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp_path, self.snapshot_path)
+
+    def save_snapshot(self):
+        """Synchronously persist cached baselines (used on shutdown)"""
+        if self.snapshot_path:
+            self._write_snapshot(self.snapshot())
+
+    def load_snapshot(self):
+        """Load baselines and join activity saved by the previous run"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"⚠️  Error loading invite cache snapshot: {e}")
+            return
+
+        self._persisted = {
+            int(guild_id): {code: CachedInvite(*entry) for code, entry in cache.items()}
+            for guild_id, cache in snapshot.get("guilds", {}).items()
+        }
+        self._persisted_at = snapshot.get("saved_at")
+        for guild_id, (score, updated_at) in snapshot.get("activity", {}).items():
+            self._activity[int(guild_id)] = (score, updated_at)
+
+    # === Warm-up ===
+
+    def _bump_activity(self, guild_id: int):
+        self._activity[guild_id] = (self.activity_score(guild_id) + 1.0, time.time())
+
+    def activity_score(self, guild_id: int) -> float:
+        """Recent join activity, decayed with a one hour half-life"""
+        score, updated_at = self._activity.get(guild_id, (0.0, 0.0))
+        return score * 0.5 ** ((time.time() - updated_at) / self.ACTIVITY_HALF_LIFE)
+
+    async def warm_up(self, guilds, concurrency: int = 8, rate: float = 20.0) -> Dict:
+        """Load invite caches for many guilds concurrently, busiest guilds first.
+
+        At most ``concurrency`` fetches are in flight and new fetches start at
+        no more than ``rate`` per second, keeping well inside Discord's global
+        request budget. Joins for a guild that is still loading wait in its
+        queue and are resolved as soon as its snapshot lands; such guilds are
+        moved to the front of the warm-up order.
+        """
+        guilds = list(guilds)
+        started = time.perf_counter()
+        heap = []
+        for guild in guilds:
+            self._loading.setdefault(guild.id, asyncio.Event())
+            priority = 0 if self._pending.get(guild.id) else 1
+            heap.append((priority, -self.activity_score(guild.id), -(guild.member_count or 0),
+                         next(self._warmup_seq), guild))
+        heapq.heapify(heap)
+        self._warmup_heap = heap
+
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+        loaded: Set[int] = set()
+        timings: List[float] = []
+        failures = 0
+        progress_step = max(1, len(guilds) // 10)
+
+        async def worker():
+            nonlocal next_start, failures
+            while heap:
+                guild = heapq.heappop(heap)[-1]
+                if guild.id in loaded:
+                    continue
+                loaded.add(guild.id)
+
+                # Space out request starts to stay under the global rate
+                now = loop.time()
+                delay = next_start - now
+                next_start = max(now, next_start) + 1.0 / rate
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                fetch_started = time.perf_counter()
+                try:
+                    async with self._lock(guild.id):
+                        self._land_snapshot(guild, await self._fetch(guild))
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"❌ Error loading invites for server {guild.name}: {e}")
+                finally:
+                    event = self._loading.pop(guild.id, None)
+                    if event is not None:
+                        event.set()
+                timings.append(time.perf_counter() - fetch_started)
+
+                if len(timings) % progress_step == 0 or len(timings) == len(guilds):
+                    logger.info(f"🔄 Invite cache warm-up: {len(timings)}/{len(guilds)} servers "
+                          f"({time.perf_counter() - started:.1f}s)")
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(concurrency, len(guilds)))))
+        finally:
+            self._warmup_heap = None
+
+        timings.sort()
+        report = {
+            "guilds": len(guilds),
+            "failures": failures,
+            "total_seconds": round(time.perf_counter() - started, 3),
+            "p50_fetch_seconds": round(timings[len(timings) // 2], 3) if timings else 0.0,
+            "max_fetch_seconds": round(timings[-1], 3) if timings else 0.0,
+        }
+        logger.info(f"✅ Invite cache warm-up finished: {report}")
+        return report
+
+    def _land_snapshot(self, guild, invite_list):
+        """Install a warm-up snapshot and resolve joins queued while it loaded"""
+        batch = self._pending.pop(guild.id, [])
+        # The previous run's baseline only applies to the first warm-up; later
+        # warm-ups (after a reconnect) diff against the live cache instead
+        persisted = self._persisted.pop(guild.id, None)
+        baseline = persisted if persisted is not None else self.invites.get(guild.id)
+        window = None
+        if persisted is not None and self._persisted_at:
+            window = self._downtime_window(persisted, invite_list)
+        if batch and baseline is not None:
+            self._set_cache(guild.id, dict(baseline))
+            results = self._attribute(guild.id, [member for member, _ in batch], invite_list, set(baseline))
+        else:
+            self.load_guild(guild.id, invite_list)
+            results = [None] * len(batch)
+
+        if window is not None:
+            # Uses claimed by joins queued during warm-up are not downtime joins
+            for result in results:
+                if result is not None and result.code in window.uses:
+                    count, inviter_id, created_at = window.uses[result.code]
+                    window.uses[result.code] = (count - 1, inviter_id, created_at)
+            uses = {code: entry for code, entry in window.uses.items() if entry[0] > 0}
+            if uses:
+                self.downtime[guild.id] = window._replace(uses=uses)
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _downtime_window(self, baseline: Dict[str, CachedInvite], invite_list) -> DowntimeWindow:
+        uses = {}
+        for invite in invite_list:
+            delta = (invite.uses or 0) - (baseline[invite.code].uses if invite.code in baseline else 0)
+            if delta > 0:
+                inviter = invite.inviter
+                created_at = invite.created_at.timestamp() if invite.created_at else 0.0
+                uses[invite.code] = (delta, inviter.id if inviter else None, created_at)
+        return DowntimeWindow(self._persisted_at, time.time(), uses)
+
+    # === Attribution ===
+
+    def set_batch_delay(self, guild_id: int, delay: Optional[float]):
+        """Collect a guild's joins for ``delay`` seconds per invite fetch; None restores the default"""
+        if delay is None:
+            self._batch_delays.pop(guild_id, None)
+        else:
+            self._batch_delays[guild_id] = delay
+
+    async def resolve_join(self, member) -> Optional[Attribution]:
+        """Queue a member join and wait for its attribution"""
+        guild = member.guild
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(guild.id, []).append((member, future))
+        self._bump_activity(guild.id)
+
+        if guild.id in self._loading and self._warmup_heap is not None:
+            # Let the warm-up load this guild next
+            heapq.heappush(self._warmup_heap, (0, 0.0, 0, next(self._warmup_seq), guild))
+
+        worker = self._workers.get(guild.id)
+        if worker is None or worker.done():
+            self._workers[guild.id] = asyncio.get_running_loop().create_task(self._drain(guild))
+        return await future
+
+    async def _drain(self, guild):
+        loading = self._loading.get(guild.id)
+        if loading is not None:
+            # The warm-up resolves everything queued before the snapshot lands
+            await loading.wait()
+
+        while self._pending.get(guild.id):
+            batch_delay = self._batch_delays.get(guild.id, self.batch_delay)
+            if batch_delay:
+                await asyncio.sleep(batch_delay)
+            batch = self._pending.pop(guild.id)
+            members = [member for member, _ in batch]
+
+            try:
+                async with self._lock(guild.id):
+                    codes_before = set(self.invites.get(guild.id, ()))
+                    current_invites = await self._fetch(guild)
+                    results = self._attribute(guild.id, members, current_invites, codes_before)
+            except Exception as e:
+                logger.error(f"❌ Error resolving invites for server {guild.name}: {e}")
+                results = [None] * len(batch)
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _attribute(self, guild_id: int, members: List, current_invites, codes_before: Set[str]) -> List[Optional[Attribution]]:
+        """Match a batch of joins to the invite uses seen since the last snapshot"""
+        old = self.invites.get(guild_id)
+        if old is None:
+            # No baseline yet, so nothing can be attributed from this fetch
+            self.load_guild(guild_id, current_invites)
+            return [None] * len(members)
+
+        now = time.monotonic()
+        self.evict_expired(guild_id)
+        current = {invite.code: invite for invite in current_invites}
+        tombstones = self._tombstones.setdefault(guild_id, {})
+        for code in [c for c, t in tombstones.items() if now - t[1] > self.tombstone_ttl]:
+            del tombstones[code]
+
+        # Every use since the last snapshot becomes one slot, in a fixed order
+        # A code missing from the baseline (e.g. evicted as expired) has no
+        # known previous count, so its uses are taken as the new baseline
+        slots: List[Tuple[str, Optional[int], Optional[object]]] = []
+        for code in sorted(current):
+            invite = current[code]
+            delta = (invite.uses or 0) - old[code].uses if code in old else 0
+            inviter = invite.inviter
+            slots.extend([(code, inviter.id if inviter else None, inviter)] * max(0, delta))
+        for code in sorted(tombstones):
+            entry = tombstones[code][0]
+            # Only an invite one use short of its limit was deleted by a join;
+            # any other was removed by hand and has no join to credit
+            if entry.max_uses and entry.uses + 1 == entry.max_uses:
+                slots.append((code, entry.inviter_id, None))
+        for code in sorted(codes_before - current.keys() - tombstones.keys()):
+            # Vanished without a delete event; legacy "probably one-time invite"
+            if code in old:
+                slots.append((code, old[code].inviter_id, None))
+
+        # Members are matched to slots by join time, so two joins landing
+        # between the same pair of snapshots are always attributed the same way
+        order = sorted(range(len(members)), key=lambda i: _join_sort_key(members[i]))
+        ambiguous = len(members) > 1 and len({inviter_id for _, inviter_id, _ in slots}) > 1
+        results: List[Optional[Attribution]] = [None] * len(members)
+        consumed = Counter()
+        for slot, index in zip(slots, order):
+            code, inviter_id, inviter = slot
+            consumed[code] += 1
+            if inviter_id is not None:
+                results[index] = Attribution(inviter_id, inviter, code, ambiguous)
+
+        # Advance the baseline only by the uses that were matched to a join.
+        # Uses whose join event has not arrived yet stay unclaimed for a grace
+        # period so the next batch can still pick them up.
+        unclaimed_since = self._unclaimed_since.setdefault(guild_id, {})
+        new_cache = {}
+        for code, invite in current.items():
+            uses = invite.uses or 0
+            base = old[code].uses if code in old else uses
+            if uses - base > consumed[code]:
+                since = unclaimed_since.setdefault(code, now)
+                if now - since < self.unclaimed_grace:
+                    uses = base + consumed[code]
+                else:
+                    del unclaimed_since[code]
+            else:
+                unclaimed_since.pop(code, None)
+            new_cache[code] = _cache_entry(invite, uses)
+
+        # Keep invites created while the fetch was in flight
+        for code in old.keys() - codes_before - current.keys():
+            new_cache[code] = old[code]
+        for code in consumed:
+            tombstones.pop(code, None)
+
+        self._set_cache(guild_id, new_cache)
+        return results
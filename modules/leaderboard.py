@@ -0,0 +1,81 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+class RankIndex:
+    """Incrementally maintained invite ranking for one guild.
+
+    Users are grouped into buckets by count, and the distinct counts are kept
+    in a sorted list. A count change moves one user between buckets and
+    touches the sorted list with a binary search, so updates cost O(log D)
+    for D distinct counts. Top-K and rank queries walk buckets from the top
+    and never sort the whole user set. Users with zero invites are not
+    ranked.
+
+    The counts themselves are read from ``counts``, the store's own mapping,
+    instead of being copied; whoever changes a count passes the old value to
+    ``update()`` so the user can be found in their bucket.
+    """
+
+    def __init__(self, counts: Optional[Mapping[str, int]] = None):
+        self._counts: Mapping[str, int] = counts if counts is not None else {}
+        self._buckets: Dict[int, Set[str]] = {}
+        self._levels: List[int] = []
+        self._size = 0
+        for user_id, count in self._counts.items():
+            self.update(user_id, 0, count)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def update(self, user_id: str, old: int, count: int):
+        """Move a user from the bucket for their old count to the one for their new count"""
+        if old == count:
+            return
+
+        if old > 0:
+            bucket = self._buckets.get(old)
+            if bucket is not None and user_id in bucket:
+                bucket.remove(user_id)
+                self._size -= 1
+                if not bucket:
+                    del self._buckets[old]
+                    del self._levels[bisect_left(self._levels, old)]
+
+        if count > 0:
+            bucket = self._buckets.get(count)
+            if bucket is None:
+                bucket = self._buckets[count] = set()
+                insort(self._levels, count)
+            if user_id not in bucket:
+                bucket.add(user_id)
+                self._size += 1
+
+    def total(self) -> int:
+        """Sum of all ranked counts, one step per distinct count"""
+        return sum(count * len(self._buckets[count]) for count in self._levels)
+
+    def clear(self):
+        self._buckets.clear()
+        self._levels.clear()
+        self._size = 0
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        """Highest counts first; ties are ordered by user ID"""
+        result = []
+        for count in reversed(self._levels):
+            if len(result) >= k:
+                break
+            bucket = self._buckets[count]
+            needed = k - len(result)
+            users = sorted(bucket, key=int) if len(bucket) <= needed else heapq.nsmallest(needed, bucket, key=int)
+            result.extend((user_id, count) for user_id in users[:needed])
+        return result
+
+    def rank(self, user_id: str) -> Optional[Tuple[int, int]]:
+        """Competition rank (1 = most invites) and count, or None if unranked"""
+        count = self._counts.get(user_id, 0)
+        if count <= 0 or user_id not in self._buckets.get(count, ()):
+            return None
+        higher = sum(len(self._buckets[level]) for level in self._levels[bisect_right(self._levels, count):])
+        return higher + 1, count
@@ -0,0 +1,362 @@
+import time
+from array import array
+from bisect import bisect_right
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from modules.compact_map import SnowflakeRows, pack_columns, snowflake, unpack_column
+
+# (inviter_id, count delta) pairs produced by ledger events
+Deltas = List[Tuple[str, int]]
+
+# Column values standing for "no inviter" and "still here"
+NO_INVITER = -1
+NOT_LEFT = -1
+# Flag bits; a row with no flags set is present and not yet credited
+CREDITED = 1
+LEFT = 2
+
+class InviteeRecord:
+    """Lifecycle of one invited member"""
+
+    __slots__ = ("inviter_id", "joined_at", "left_at", "rejoins", "credited")
+
+    def __init__(self, inviter_id: Optional[str], joined_at: int, left_at: Optional[int] = None,
+                 rejoins: int = 0, credited: bool = False):
+        self.inviter_id = inviter_id
+        self.joined_at = joined_at
+        self.left_at = left_at
+        self.rejoins = rejoins
+        # Whether the member currently counts towards the inviter
+        self.credited = credited
+
+    @property
+    def present(self) -> bool:
+        return self.left_at is None
+
+    def to_list(self) -> list:
+        return [self.inviter_id, self.joined_at, self.left_at, self.rejoins, self.credited]
+
+    @classmethod
+    def from_list(cls, values: list) -> "InviteeRecord":
+        return cls(*values)
+
+class InviteeTable(SnowflakeRows, MutableMapping):
+    """Invitee records of one guild as int64 columns keyed by member ID.
+
+    Inviter, join time, leave time and rejoins are one int64 each and the
+    credited/left state is one flags byte, so a member costs about 60 bytes
+    including the hash index instead of a record object, its strings and a
+    dict slot. Records are handed out as fresh InviteeRecord values; a
+    changed record has to be stored back. IDs that are not canonical
+    snowflakes get negative stand-in numbers, so the table stays lossless.
+    """
+
+    __slots__ = ("_inviters", "_joined", "_left", "_rejoins", "_flags", "_names", "_aliases")
+
+    def __init__(self, data=None):
+        super().__init__()
+        self._inviters = array('q')
+        self._joined = array('q')
+        self._left = array('q')
+        self._rejoins = array('q')
+        self._flags = array('b')
+        # Stand-in number -> ID for IDs that are not canonical snowflakes
+        self._names: Dict[int, str] = {}
+        self._aliases: Dict[str, int] = {}
+        if data:
+            self.update(data)
+
+    def _columns(self) -> Tuple[array, ...]:
+        return self._inviters, self._joined, self._left, self._rejoins, self._flags
+
+    def key_number(self, member_id: str, create: bool = False) -> Optional[int]:
+        """The number a member or inviter ID is stored as; None if it was never stored"""
+        number = snowflake(member_id)
+        if number is not None:
+            return number
+        number = self._aliases.get(member_id)
+        if number is None and create:
+            number = NO_INVITER - 1 - len(self._names)
+            self._names[number] = member_id
+            self._aliases[member_id] = number
+        return number
+
+    def key_name(self, number: int) -> str:
+        return str(number) if number >= 0 else self._names[number]
+
+    def _record(self, row: int) -> InviteeRecord:
+        inviter, left, flags = self._inviters[row], self._left[row], self._flags[row]
+        return InviteeRecord(
+            self.key_name(inviter) if inviter != NO_INVITER else None,
+            self._joined[row],
+            left if flags & LEFT else None,
+            self._rejoins[row],
+            bool(flags & CREDITED)
+        )
+
+    # === Mapping interface ===
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __getitem__(self, member_id: str) -> InviteeRecord:
+        number = self.key_number(member_id)
+        row = self._find(number)[0] if number is not None else -1
+        if row < 0:
+            raise KeyError(member_id)
+        return self._record(row)
+
+    def get(self, member_id: str, default=None) -> Optional[InviteeRecord]:
+        number = self.key_number(member_id)
+        row = self._find(number)[0] if number is not None else -1
+        return self._record(row) if row >= 0 else default
+
+    def __contains__(self, member_id) -> bool:
+        number = self.key_number(member_id)
+        return number is not None and self._find(number)[0] >= 0
+
+    def __setitem__(self, member_id: str, record: InviteeRecord):
+        number = self.key_number(member_id, create=True)
+        inviter = self.key_number(record.inviter_id, create=True) if record.inviter_id is not None else NO_INVITER
+        left = record.left_at if record.left_at is not None else NOT_LEFT
+        flags = (CREDITED if record.credited else 0) | (LEFT if record.left_at is not None else 0)
+
+        row, position = self._find(number)
+        if row < 0:
+            position = self._insert_position(number, position)
+            self._keys.append(number)
+            self._inviters.append(inviter)
+            self._joined.append(int(record.joined_at))
+            self._left.append(int(left))
+            self._rejoins.append(record.rejoins)
+            self._flags.append(flags)
+            self._link(position)
+            return
+        self._inviters[row] = inviter
+        self._joined[row] = int(record.joined_at)
+        self._left[row] = int(left)
+        self._rejoins[row] = record.rejoins
+        self._flags[row] = flags
+
+    def __delitem__(self, member_id: str):
+        number = self.key_number(member_id)
+        if number is None or not self._discard(number):
+            raise KeyError(member_id)
+
+    def __iter__(self) -> Iterator[str]:
+        for number in self._keys:
+            yield self.key_name(number)
+
+    def clear(self):
+        self._clear_rows()
+        self._inviters, self._joined, self._left, self._rejoins = array('q'), array('q'), array('q'), array('q')
+        self._flags = array('b')
+        self._names = {}
+        self._aliases = {}
+
+    def __repr__(self) -> str:
+        return f"InviteeTable({len(self)} members)"
+
+    # === Column scans ===
+
+    def for_inviter(self, inviter_id: str) -> Iterator[InviteeRecord]:
+        """Records of every member brought in by ``inviter_id``"""
+        number = self.key_number(inviter_id)
+        if number is None:
+            return
+        for row, inviter in enumerate(self._inviters):
+            if inviter == number:
+                yield self._record(row)
+
+    def waiting(self, valid_after: float) -> Iterator[Tuple[float, int, int]]:
+        """(due_at, member number, joined_at) of present, uncredited members with an inviter"""
+        flags = self._flags.tobytes()
+        row = flags.find(b"\0")
+        # Most members are credited or gone, so the scan jumps between zero flag bytes
+        while row >= 0:
+            if self._inviters[row] != NO_INVITER:
+                joined_at = self._joined[row]
+                yield joined_at + valid_after, self._keys[row], joined_at
+            row = flags.find(b"\0", row + 1)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns and index, not counting the stand-in names"""
+        return self.index_nbytes + len(self._keys) * 33
+
+    # === Binary form ===
+
+    def columns(self) -> Tuple[List[bytes], Dict[str, str]]:
+        """Little-endian key, inviter, joined, left, rejoins, flags and index columns, plus stand-in names"""
+        parts = pack_columns(self._keys, self._inviters, self._joined, self._left, self._rejoins, self._flags,
+                             self._index)
+        return parts, {str(number): name for number, name in self._names.items()}
+
+    @classmethod
+    def from_columns(cls, buffers, names: Dict[str, str]) -> "InviteeTable":
+        """Rebuild a table from columns(); buffers are copied once, members are not visited"""
+        typecodes = ('q', 'q', 'q', 'q', 'q', 'b', 'q')
+        columns = [unpack_column(typecode, buffer) for typecode, buffer in zip(typecodes, buffers)]
+        keys, index = columns[0], columns[-1]
+        capacity = len(index)
+        if (len(columns) != len(typecodes) or any(len(column) != len(keys) for column in columns[1:-1])
+                or capacity < 8 or capacity & (capacity - 1)):
+            raise ValueError("inconsistent snapshot columns")
+
+        table = cls()
+        table._keys = keys
+        table._inviters, table._joined, table._left, table._rejoins, table._flags = columns[1:-1]
+        table._set_index(index)
+        table._names = {int(number): name for number, name in names.items()}
+        table._aliases = {name: number for number, name in table._names.items()}
+        return table
+
+class InviteeLedger:
+    """Per-guild invitee history that decides when an invite counts.
+
+    Each member has one record, so leaving and rejoining never produces a
+    second invite: a rejoin reuses the record, takes back any credit still
+    held by the previous inviter (for example after a leave missed while
+    offline) and starts the stay over. A member is credited to their
+    inviter once they have stayed ``valid_after`` seconds. Pending credits
+    wait in array columns ordered by due time, so every event and every
+    matured credit costs O(1).
+    """
+
+    def __init__(self, records: InviteeTable, valid_after: float = 0.0,
+                 on_change: Optional[Callable[[str], None]] = None):
+        self.records = records
+        self.valid_after = valid_after
+        self.on_change = on_change
+        # Queued credits from _head on: due time, member number and the join
+        # they belong to; stale entries are skipped when due
+        self._due_at = array('d')
+        self._due_member = array('q')
+        self._due_joined = array('q')
+        self._head = 0
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute the pending credits from the records"""
+        waiting = sorted(self.records.waiting(self.valid_after))
+        self._due_at = array('d', [entry[0] for entry in waiting])
+        self._due_member = array('q', [entry[1] for entry in waiting])
+        self._due_joined = array('q', [entry[2] for entry in waiting])
+        self._head = 0
+
+    @property
+    def pending(self) -> int:
+        """Queued credits, including ones made stale by a leave"""
+        return len(self._due_at) - self._head
+
+    @property
+    def next_due(self) -> Optional[float]:
+        """When the earliest queued credit is due, or None if nothing waits"""
+        return self._due_at[self._head] if self.pending else None
+
+    def _changed(self, member_id: str):
+        if self.on_change is not None:
+            self.on_change(member_id)
+
+    def _queue(self, member_id: str, due_at: float, joined_at: int):
+        member = self.records.key_number(member_id)
+        if self.pending and due_at < self._due_at[-1]:
+            # Only joins recorded after the fact (backfill) arrive out of order
+            position = bisect_right(self._due_at, due_at, self._head)
+            self._due_at.insert(position, due_at)
+            self._due_member.insert(position, member)
+            self._due_joined.insert(position, joined_at)
+        else:
+            self._due_at.append(due_at)
+            self._due_member.append(member)
+            self._due_joined.append(joined_at)
+
+    def join(self, member_id: str, inviter_id: Optional[str], joined_at: Optional[float] = None,
+             now: Optional[float] = None) -> Deltas:
+        """Record a join or rejoin; returns the count changes it causes"""
+        now = time.time() if now is None else now
+        joined = int(now if joined_at is None else joined_at)
+        deltas: Deltas = []
+
+        record = self.records.get(member_id)
+        if record is None:
+            record = InviteeRecord(inviter_id, joined)
+        else:
+            if record.credited:
+                deltas.append((record.inviter_id, -1))
+            record.inviter_id = inviter_id
+            record.joined_at = joined
+            record.left_at = None
+            record.rejoins += 1
+            record.credited = False
+
+        due_at = joined + self.valid_after
+        if inviter_id is not None and due_at <= now:
+            record.credited = True
+            deltas.append((inviter_id, 1))
+        self.records[member_id] = record
+        if inviter_id is not None and not record.credited:
+            self._queue(member_id, due_at, joined)
+        self._changed(member_id)
+        return deltas
+
+    def leave(self, member_id: str, now: Optional[float] = None) -> Optional[Deltas]:
+        """Record a leave; returns the count changes, or None for an unknown member"""
+        record = self.records.get(member_id)
+        if record is None:
+            return None
+        deltas: Deltas = []
+        if record.credited:
+            record.credited = False
+            deltas.append((record.inviter_id, -1))
+        record.left_at = int(time.time() if now is None else now)
+        self.records[member_id] = record
+        self._changed(member_id)
+        return deltas
+
+    def mature(self, now: Optional[float] = None) -> Deltas:
+        """Credit every member whose stay reached ``valid_after``"""
+        now = time.time() if now is None else now
+        deltas: Deltas = []
+        while self.pending and self._due_at[self._head] <= now:
+            member_id = self.records.key_name(self._due_member[self._head])
+            joined_at = self._due_joined[self._head]
+            self._head += 1
+            record = self.records.get(member_id)
+            # Skip members who left or rejoined since the credit was queued
+            if (record is None or record.joined_at != joined_at or not record.present
+                    or record.credited or record.inviter_id is None):
+                continue
+            record.credited = True
+            self.records[member_id] = record
+            deltas.append((record.inviter_id, 1))
+            self._changed(member_id)
+
+        if self._head and (self._head >= 4096 or not self.pending):
+            # Drop the consumed front of the queue in one step
+            del self._due_at[:self._head]
+            del self._due_member[:self._head]
+            del self._due_joined[:self._head]
+            self._head = 0
+        return deltas
+
+    def summary(self, inviter_id: str) -> Dict[str, int]:
+        """Counted, pending and departed invitees of one inviter, and their rejoins"""
+        summary = {"counted": 0, "pending": 0, "left": 0, "rejoins": 0}
+        for record in self.records.for_inviter(inviter_id):
+            if record.credited:
+                summary["counted"] += 1
+            elif record.present:
+                summary["pending"] += 1
+            else:
+                summary["left"] += 1
+            summary["rejoins"] += record.rejoins
+        return summary
+
+    def clear(self):
+        self.records.clear()
+        self._due_at = array('d')
+        self._due_member = array('q')
+        self._due_joined = array('q')
+        self._head = 0
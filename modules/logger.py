@@ -0,0 +1,146 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line, including fields passed through ``extra``"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ConsoleFormatter(logging.Formatter):
+    """Console output in the bot's familiar emoji style"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if record.levelno >= logging.ERROR and not message.startswith("❌"):
+            message = f"❌ {message}"
+        if record.exc_info:
+            message += "\n" + self.formatException(record.exc_info)
+        return message
+
+class DurableRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotating file handler with a configurable fsync policy.
+
+    Rotates when the file exceeds ``max_bytes`` or is older than
+    ``rotate_seconds``. Data is fsynced every ``fsync_every`` records or
+    ``fsync_interval_ms`` milliseconds, whichever comes first, and
+    immediately for ERROR and above. Runs on the queue listener thread, so
+    none of this blocks the event loop.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 rotate_seconds: float = 0.0, fsync_every: int = 100, fsync_interval_ms: float = 1000.0):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.rotate_seconds = rotate_seconds
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self._opened_at = time.time()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        self._sync()
+        super().doRollover()
+        self._opened_at = time.time()
+
+    def emit(self, record: logging.LogRecord):
+        super().emit(record)
+        self._unsynced += 1
+        if (record.levelno >= logging.ERROR
+                or self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self._sync()
+
+    def _sync(self):
+        if self.stream is not None and self._unsynced:
+            try:
+                self.stream.flush()
+                os.fsync(self.stream.fileno())
+            except (OSError, ValueError):
+                pass
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        self._sync()
+        super().close()
+
+def _level(name: str, default: str) -> int:
+    level = logging.getLevelName(os.getenv(name, default).upper())
+    return level if isinstance(level, int) else logging.getLevelName(default)
+
+def setup_logging(log_dir: str = "logs"):
+    """Route the ``bot`` logger through a queue to a background writer thread.
+
+    Configured from the environment: LOG_LEVEL and LOG_CONSOLE_LEVEL,
+    LOG_FSYNC_EVERY, LOG_FSYNC_INTERVAL_MS, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+    and LOG_ROTATE_HOURS. Files are written as JSON lines to bot.log, or
+    bot.<CLUSTER_ID>.log in a shard cluster.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    os.makedirs(log_dir, exist_ok=True)
+    file_handler = DurableRotatingFileHandler(
+        os.path.join(log_dir, f"bot.{os.getenv('CLUSTER_ID')}.log" if os.getenv("CLUSTER_ID") else "bot.log"),
+        max_bytes=int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+        backup_count=int(os.getenv("LOG_BACKUP_COUNT", 5)),
+        rotate_seconds=float(os.getenv("LOG_ROTATE_HOURS", 0)) * 3600,
+        fsync_every=int(os.getenv("LOG_FSYNC_EVERY", 100)),
+        fsync_interval_ms=float(os.getenv("LOG_FSYNC_INTERVAL_MS", 1000))
+    )
+    file_handler.setFormatter(JsonLinesFormatter())
+    file_handler.setLevel(_level("LOG_LEVEL", "INFO"))
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(ConsoleFormatter())
+    console_handler.setLevel(_level("LOG_CONSOLE_LEVEL", "INFO"))
+
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger("bot")
+    logger.setLevel(min(file_handler.level, console_handler.level))
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    # Make sure queued records are written even on sys.exit()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Drain the log queue and fsync the log file"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from bisect import bisect_right
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from modules.dispatcher import ActionDispatcher, Priority
+
+logger = logging.getLogger("bot.invites.roles")
+
+class MilestoneRoles:
+    """Invite-count thresholds and the roles they grant.
+
+    Thresholds are cumulative: a member keeps every role whose threshold
+    their count reaches. The earned set for each threshold is precomputed,
+    so a lookup is one binary search.
+    """
+
+    def __init__(self, thresholds: Dict[int, int]):
+        self.thresholds: Tuple[int, ...] = tuple(sorted(thresholds))
+        self.role_ids: FrozenSet[int] = frozenset(thresholds.values())
+        earned: List[FrozenSet[int]] = [frozenset()]
+        for count in self.thresholds:
+            earned.append(earned[-1] | {thresholds[count]})
+        self._earned = tuple(earned)
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "MilestoneRoles":
+        """Parse ``count:role_id`` pairs separated by commas"""
+        thresholds = {}
+        for role_info in (spec or "").split(','):
+            if not role_info.strip():
+                continue
+            try:
+                count, role_id = role_info.split(':')
+                thresholds[int(count)] = int(role_id)
+            except ValueError:
+                logger.warning(f"⚠️ Invalid INVITER_ROLES format: {role_info}")
+        return cls(thresholds)
+
+    def __bool__(self) -> bool:
+        return bool(self.thresholds)
+
+    def earned(self, count: int) -> FrozenSet[int]:
+        """Milestone role IDs a member with ``count`` invites should hold"""
+        return self._earned[bisect_right(self.thresholds, count)]
+
+    def target_roles(self, member, count: int) -> Optional[List]:
+        """The member's full role list with milestones applied, or None if unchanged"""
+        guild = member.guild
+        current = [role for role in member.roles if not role.is_default()]
+        current_ids = {role.id for role in current}
+        wanted = {role_id for role_id in self.earned(count) if guild.get_role(role_id) is not None}
+        managed = {role_id for role_id in self.role_ids if role_id in current_ids}
+        if managed == wanted:
+            return None
+        roles = [role for role in current if role.id not in self.role_ids or role.id in wanted]
+        roles.extend(guild.get_role(role_id) for role_id in wanted - managed)
+        return roles
+
+class MilestoneRoleEngine:
+    """Keep inviters' milestone roles in line with their invite counts.
+
+    Updates go through the dispatcher's role lane as a single
+    ``member.edit(roles=...)`` per member. The target set is computed when
+    the request runs, so several count changes queued for one member
+    collapse into one request with the latest count.
+    """
+
+    def __init__(self, milestones: MilestoneRoles, dispatcher: ActionDispatcher,
+                 count_of: Callable[[int, int], Awaitable[int]]):
+        self.milestones = milestones
+        self.dispatcher = dispatcher
+        self.count_of = count_of
+        self._queued: Set[Tuple[int, int]] = set()
+
+    def schedule(self, member):
+        """Queue a role update for a member unless one is already queued"""
+        if not self.milestones:
+            return
+        key = (member.guild.id, member.id)
+        if key in self._queued:
+            return
+        self._queued.add(key)
+        if not self.dispatcher.submit(Priority.ROLE, f"roles:{member.guild.id}", lambda: self._apply(member),
+                                      "milestone_roles"):
+            self._queued.discard(key)
+
+    async def _apply(self, member) -> bool:
+        """Edit the member's roles if they differ; returns whether a change was made"""
+        self._queued.discard((member.guild.id, member.id))
+        count = await self.count_of(member.guild.id, member.id)
+        roles = self.milestones.target_roles(member, count)
+        if roles is None:
+            return False
+        await member.edit(roles=roles, reason=f"Invite milestones ({count} invites)")
+        logger.debug(f"✅ Updated milestone roles of {member.name} for {count} invites")
+        return True
+
+    def candidates(self, guild, user_ids) -> List:
+        """Cached members that hold a milestone role or have invites"""
+        members = {}
+        for role_id in self.milestones.role_ids:
+            role = guild.get_role(role_id)
+            if role is not None:
+                for member in role.members:
+                    members[member.id] = member
+        for user_id in user_ids:
+            member = guild.get_member(int(user_id))
+            if member is not None:
+                members[member.id] = member
+        return [member for member in members.values() if not member.bot]
+
+    async def reconcile(self, guild, user_ids, chunk_size: int = 50) -> Dict[str, int]:
+        """Bring every inviter's milestone roles in line with their count.
+
+        Members are processed in chunks through the dispatcher's role lane,
+        whose route budget paces the requests; each chunk finishes before
+        the next one is queued.
+        """
+        members = self.candidates(guild, user_ids)
+        stats = {"checked": 0, "changed": 0, "failed": 0}
+        if not self.milestones:
+            return stats
+
+        route = f"roles:{guild.id}"
+        for start in range(0, len(members), chunk_size):
+            chunk = members[start:start + chunk_size]
+            changes = [self.milestones.target_roles(member, await self.count_of(guild.id, member.id)) is not None
+                       for member in chunk]
+            pending = [self.dispatcher.call(Priority.ROLE, route, lambda member=member: self._apply(member),
+                                            "milestone_sync")
+                       for member, changed in zip(chunk, changes) if changed]
+            results = await asyncio.gather(*pending, return_exceptions=True)
+
+            stats["checked"] += len(chunk)
+            for result in results:
+                if isinstance(result, BaseException):
+                    stats["failed"] += 1
+                    logger.error(f"❌ Error syncing milestone roles on server {guild.id}: {result}")
+                elif result:
+                    stats["changed"] += 1
+
+        logger.info(f"✅ Milestone roles synced on server {guild.id}", extra={
+            "event": "milestone_sync",
+            "guild_id": guild.id,
+            **stats
+        })
+        return stats
@@ -0,0 +1,385 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from modules.compact_map import SnowflakeMap
+from modules.ledger import InviteeRecord, InviteeTable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id INTEGER PRIMARY KEY,
+    generation INTEGER NOT NULL DEFAULT 0,
+    cleared_at INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS invite_counts (
+    guild_id INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS invite_counts_generation ON invite_counts (guild_id, generation);
+CREATE TABLE IF NOT EXISTS invited_by (
+    guild_id INTEGER NOT NULL,
+    member_id TEXT NOT NULL,
+    inviter_id TEXT,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, member_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS invited_by_generation ON invited_by (guild_id, generation);
+CREATE TABLE IF NOT EXISTS invitees (
+    guild_id INTEGER NOT NULL,
+    member_id TEXT NOT NULL,
+    record TEXT,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, member_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS invitees_generation ON invitees (guild_id, generation);
+"""
+
+class StoreChanges(NamedTuple):
+    """What refresh() picked up from other processes"""
+    full: bool
+    # user_id -> count before the refresh
+    counts: Dict[str, int]
+    invitees: bool
+
+class SharedInviteDB:
+    """SQLite database in WAL mode shared by every bot process.
+
+    Writes go through one connection under a lock, each flush in a
+    ``BEGIN IMMEDIATE`` transaction, so processes never interleave partial
+    flushes; a second connection serves reads, which WAL lets run while
+    another process writes.
+    """
+
+    def __init__(self, path: str = "data/invites.db", busy_timeout: float = 10.0):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self._writer = self._connect(busy_timeout)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.executescript(SCHEMA)
+        self._reader = self._connect(busy_timeout)
+
+    def _connect(self, busy_timeout: float) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly
+        connection = sqlite3.connect(self.path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Exclusive write transaction across processes"""
+        with self.lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+
+    def read(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return self._reader.execute(sql, params).fetchall()
+
+    def store(self, guild_id: int) -> "SQLiteInviteStore":
+        return SQLiteInviteStore(self, guild_id)
+
+    def has_guild(self, guild_id: int) -> bool:
+        return bool(self.read("SELECT 1 FROM guilds WHERE guild_id = ?", (guild_id,)))
+
+    def close(self):
+        with self.lock:
+            self._reader.close()
+            self._writer.close()
+
+class SQLiteInviteStore:
+    """One guild's invite data in the shared database, with the InviteStore interface.
+
+    Data is cached in memory and changes are written behind, like the file
+    store. Count changes are flushed as deltas that the database adds to
+    whatever is stored, so increments from several processes never
+    overwrite each other; resets and imports are flushed as absolute
+    values. Every flush bumps the guild's generation and stamps the rows it
+    touched with it, so ``refresh()`` can reload only the rows other
+    processes changed since the last look.
+    """
+
+    def __init__(self, db: SharedInviteDB, guild_id: int):
+        self.db = db
+        self.guild_id = guild_id
+        self.data_dir = f"{db.path}#{guild_id}"
+
+        self.invite_counts = SnowflakeMap()
+        self.invited_by = SnowflakeMap(str_values=True)
+        self.invitees = InviteeTable()
+        self.generation = 0
+
+        # user_id -> (absolute, value): a value to store, or a delta to add
+        self._count_ops: Dict[str, Tuple[bool, int]] = {}
+        self._dirty_members: Set[str] = set()
+        self._dirty_invitees: Set[str] = set()
+        self._pending_clear = False
+        self._retry_records: List[Dict] = []
+        # Flushes taken but not committed yet; refresh() waits for them
+        self._flushing = 0
+        self._flush_state = threading.Lock()
+        self.on_dirty: Optional[Callable[["SQLiteInviteStore"], None]] = None
+
+    # === Loading and refreshing ===
+
+    def load(self):
+        """Read the guild's rows; dicts are refilled in place so holders keep valid references"""
+        self._read_all()
+        self._count_ops = {}
+        self._dirty_members = set()
+        self._dirty_invitees = set()
+        self._pending_clear = False
+        self._retry_records = []
+
+    def _read_all(self):
+        rows = self.db.read("SELECT generation FROM guilds WHERE guild_id = ?", (self.guild_id,))
+        self.generation = rows[0][0] if rows else 0
+        self.invite_counts.clear()
+        self.invited_by.clear()
+        self.invitees.clear()
+        self._merge_rows(0)
+
+    def _merge_rows(self, since: int) -> StoreChanges:
+        """Overlay rows newer than ``since``, keeping changes not flushed yet"""
+        counts: Dict[str, int] = {}
+        for user_id, count in self.db.read(
+                "SELECT user_id, count FROM invite_counts WHERE guild_id = ? AND generation > ?",
+                (self.guild_id, since)):
+            absolute, value = self._count_ops.get(user_id, (False, 0))
+            counts.setdefault(user_id, self.invite_counts.get(user_id, 0))
+            self.invite_counts[user_id] = value if absolute else max(0, count + value)
+
+        for member_id, inviter_id in self.db.read(
+                "SELECT member_id, inviter_id FROM invited_by WHERE guild_id = ? AND generation > ?",
+                (self.guild_id, since)):
+            if member_id in self._dirty_members:
+                continue
+            if inviter_id is None:
+                self.invited_by.pop(member_id, None)
+            else:
+                self.invited_by[member_id] = inviter_id
+
+        invitees = False
+        for member_id, record in self.db.read(
+                "SELECT member_id, record FROM invitees WHERE guild_id = ? AND generation > ?",
+                (self.guild_id, since)):
+            if member_id in self._dirty_invitees:
+                continue
+            invitees = True
+            if record is None:
+                self.invitees.pop(member_id, None)
+            else:
+                self.invitees[member_id] = InviteeRecord.from_list(json.loads(record))
+        return StoreChanges(False, counts, invitees)
+
+    def refresh(self) -> Optional[StoreChanges]:
+        """Pick up rows written since the generation seen last; None if nothing changed"""
+        if self._flushing:
+            # Rows read now would not include the changes being written and
+            # would briefly roll the counts back; try again after the commit
+            return None
+        rows = self.db.read("SELECT generation, cleared_at FROM guilds WHERE guild_id = ?", (self.guild_id,))
+        if not rows or rows[0][0] == self.generation:
+            return None
+        generation, cleared_at = rows[0]
+        if cleared_at > self.generation:
+            # Cleared elsewhere: start over from the database, then reapply local changes
+            members = {member_id: self.invited_by.get(member_id) for member_id in self._dirty_members}
+            invitees = {member_id: self.invitees.get(member_id) for member_id in self._dirty_invitees}
+            self.invite_counts.clear()
+            self.invited_by.clear()
+            self.invitees.clear()
+            for user_id, (absolute, value) in self._count_ops.items():
+                self.invite_counts[user_id] = value if absolute else max(0, value)
+            self._merge_rows(0)
+            for member_id, inviter_id in members.items():
+                if inviter_id is not None:
+                    self.invited_by[member_id] = inviter_id
+            for member_id, record in invitees.items():
+                if record is not None:
+                    self.invitees[member_id] = record
+            changes = StoreChanges(True, {}, True)
+        else:
+            changes = self._merge_rows(self.generation)
+        self.generation = generation
+        return changes
+
+    # === Mutations ===
+
+    def increment(self, user_id: str, delta: int = 1) -> int:
+        """Adjust a user's invite count, clamped at zero, and return the new value"""
+        old = self.invite_counts.get(user_id, 0)
+        value = max(0, old + delta)
+        absolute, pending = self._count_ops.get(user_id, (False, 0))
+        # Only the change that survived clamping is sent, so the database clamps the same way
+        self._count_ops[user_id] = (True, value) if absolute else (False, pending + value - old)
+        self.invite_counts[user_id] = value
+        self._mark_dirty()
+        return value
+
+    def set_count(self, user_id: str, count: int):
+        """Set a user's invite count, overriding changes from other processes"""
+        self.invite_counts[user_id] = count
+        self._count_ops[user_id] = (True, count)
+        self._mark_dirty()
+
+    def set_inviter(self, member_id: str, inviter_id: Optional[str]):
+        if inviter_id is None:
+            self.invited_by.pop(member_id, None)
+        else:
+            self.invited_by[member_id] = inviter_id
+        self._dirty_members.add(member_id)
+        self._mark_dirty()
+
+    def touch_invitee(self, member_id: str):
+        self._dirty_invitees.add(member_id)
+        self._mark_dirty()
+
+    def clear(self):
+        self.invite_counts.clear()
+        self.invited_by.clear()
+        self.invitees.clear()
+        self._count_ops = {}
+        self._dirty_members = set()
+        self._dirty_invitees = set()
+        self._pending_clear = True
+        self._mark_dirty()
+
+    def apply_batch(self, invite_counts: Dict[str, int], invited_by: Dict[str, str], replace: bool = False):
+        """Apply many changes at once; they are flushed in a single transaction"""
+        if replace:
+            self.clear()
+        for user_id, count in invite_counts.items():
+            self.invite_counts[user_id] = count
+            self._count_ops[user_id] = (True, count)
+        self.invited_by.update(invited_by)
+        self._dirty_members.update(invited_by)
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        if self.on_dirty is not None:
+            self.on_dirty(self)
+
+    @property
+    def pending_count(self) -> int:
+        return (len(self._count_ops) + len(self._dirty_members) + len(self._dirty_invitees)
+                + len(self._retry_records) + int(self._pending_clear))
+
+    # === Persistence ===
+
+    def take_pending(self) -> Tuple[List[Dict], None]:
+        """Turn dirty state into records; called on the event loop like InviteStore.take_pending"""
+        records = self._retry_records
+        self._retry_records = []
+        if self._pending_clear:
+            records.append({"clear": True})
+        for user_id, (absolute, value) in self._count_ops.items():
+            records.append({"c": user_id, "v": value, "abs": absolute})
+        for member_id in self._dirty_members:
+            records.append({"m": member_id, "i": self.invited_by.get(member_id)})
+        for member_id in self._dirty_invitees:
+            invitee = self.invitees.get(member_id)
+            records.append({"l": member_id, "r": invitee.to_list() if invitee is not None else None})
+
+        self._pending_clear = False
+        self._count_ops = {}
+        self._dirty_members = set()
+        self._dirty_invitees = set()
+        if records:
+            with self._flush_state:
+                self._flushing += 1
+        return records, None
+
+    def write_pending(self, records: List[Dict], snapshot: None = None):
+        """Apply records in one transaction; safe to run in a worker thread"""
+        if not records:
+            return
+        guild_id = self.guild_id
+        with self.db.transaction() as connection:
+            row = connection.execute("SELECT generation FROM guilds WHERE guild_id = ?", (guild_id,)).fetchone()
+            previous = row[0] if row else 0
+            connection.execute(
+                "INSERT INTO guilds (guild_id, generation) VALUES (?, 1) "
+                "ON CONFLICT (guild_id) DO UPDATE SET generation = generation + 1", (guild_id,))
+            generation = previous + 1
+
+            for record in records:
+                if record.get("clear"):
+                    for table in ("invite_counts", "invited_by", "invitees"):
+                        connection.execute(f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,))
+                    connection.execute("UPDATE guilds SET cleared_at = ? WHERE guild_id = ?", (generation, guild_id))
+
+            connection.executemany(
+                "INSERT INTO invite_counts (guild_id, user_id, count, generation) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET count = excluded.count, generation = excluded.generation",
+                [(guild_id, r["c"], r["v"], generation) for r in records if "c" in r and r["abs"]])
+            connection.executemany(
+                "INSERT INTO invite_counts (guild_id, user_id, count, generation) VALUES (?, ?, MAX(0, ?), ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET "
+                "count = MAX(0, invite_counts.count + ?), generation = excluded.generation",
+                [(guild_id, r["c"], r["v"], generation, r["v"]) for r in records if "c" in r and not r["abs"]])
+            # Removals are kept as NULL rows so other processes see them on refresh
+            connection.executemany(
+                "INSERT OR REPLACE INTO invited_by (guild_id, member_id, inviter_id, generation) VALUES (?, ?, ?, ?)",
+                [(guild_id, r["m"], r["i"], generation) for r in records if "m" in r])
+            connection.executemany(
+                "INSERT OR REPLACE INTO invitees (guild_id, member_id, record, generation) VALUES (?, ?, ?, ?)",
+                [(guild_id, r["l"], json.dumps(r["r"]) if r["r"] is not None else None, generation)
+                 for r in records if "l" in r])
+
+        with self._flush_state:
+            # Memory already holds what was just written; only skip ahead when no
+            # other process committed in between, so refresh() still reads theirs
+            if previous == self.generation:
+                self.generation = generation
+            self._flushing -= 1
+
+    def requeue(self, records: List[Dict], snapshot: None = None):
+        """Give back records whose transaction was rolled back so the next flush retries them"""
+        if records:
+            with self._flush_state:
+                self._flushing -= 1
+        self._retry_records = records + self._retry_records
+
+    def flush(self):
+        records, snapshot = self.take_pending()
+        try:
+            self.write_pending(records, snapshot)
+        except Exception:
+            self.requeue(records, snapshot)
+            raise
+
+    def compact(self):
+        """Nothing to compact per guild; flush pending changes"""
+        self.flush()
+
+    def adopt(self, source) -> bool:
+        """Copy a file partition's data in, unless the database already has this guild"""
+        with self.db.transaction() as connection:
+            if connection.execute("SELECT 1 FROM guilds WHERE guild_id = ?", (self.guild_id,)).fetchone():
+                return False
+            connection.execute("INSERT INTO guilds (guild_id, generation) VALUES (?, 1)", (self.guild_id,))
+            connection.executemany(
+                "INSERT INTO invite_counts (guild_id, user_id, count, generation) VALUES (?, ?, ?, 1)",
+                [(self.guild_id, user_id, count) for user_id, count in source.invite_counts.items()])
+            connection.executemany(
+                "INSERT INTO invited_by (guild_id, member_id, inviter_id, generation) VALUES (?, ?, ?, 1)",
+                [(self.guild_id, member_id, inviter_id) for member_id, inviter_id in source.invited_by.items()])
+            connection.executemany(
+                "INSERT INTO invitees (guild_id, member_id, record, generation) VALUES (?, ?, ?, 1)",
+                [(self.guild_id, member_id, json.dumps(record.to_list()))
+                 for member_id, record in source.invitees.items()])
+        return True
+
+    def close(self):
+        """The connection belongs to the shared database"""
@@ -0,0 +1,136 @@
+import random
+from string import Formatter
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+class TemplateError(ValueError):
+    """A message template uses placeholders that cannot be rendered"""
+
+# Placeholders each kind of template is rendered with
+MEMBER_FIELDS = frozenset({"user", "inviter", "count"})
+MESSAGE_FIELDS: Dict[str, FrozenSet[str]] = {
+    "default_greeting": frozenset({"user"}),
+    "default_leave_message": frozenset({"user"}),
+    "invite_count_message": frozenset({"user", "count"}),
+    "inviter_unknown": frozenset({"user"}),
+    "invited_by_message": frozenset({"user", "inviter"}),
+    "inviter_not_found": frozenset({"user"}),
+    "user_invites_reset": frozenset({"user", "count"}),
+    "all_invites_reset": frozenset({"count"}),
+    "rank_message": frozenset({"user", "rank", "count"}),
+    "rank_unranked": frozenset({"user"}),
+    "join_summary": frozenset({"count"}),
+    "join_summary_more": frozenset({"count"}),
+    "sync_roles_done": frozenset({"checked", "changed", "failed"}),
+    "backfill_done": frozenset({"scanned", "high", "low", "unattributed"}),
+    "export_too_large": frozenset({"command"}),
+    "export_done": frozenset({"rows"}),
+    "import_problems_more": frozenset({"count"}),
+    "import_done": frozenset({"counts", "inviters", "mode"}),
+    "period_stats_title": frozenset({"period"}),
+    "period_stats": frozenset({"joins", "attributed", "leaves", "net"}),
+    "retention_line": frozenset({"days", "percent", "measured"}),
+    "retention_not_enough_data": frozenset({"days"}),
+}
+# Messages not listed above are plain text
+PLAIN_FIELDS: FrozenSet[str] = frozenset()
+
+# Used when a style leaves these empty
+MESSAGE_DEFAULTS = {
+    "default_greeting": "Welcome {user}!",
+    "default_leave_message": "Goodbye {user}!",
+}
+
+_formatter = Formatter()
+
+class CompiledTemplate:
+    """A ``str.format`` template parsed once into literal text and fields.
+
+    Only bare named placeholders from an allowed set are accepted, so
+    attribute or index lookups such as ``{user.guild}`` are rejected when the
+    style is loaded instead of when a member joins.
+    """
+
+    __slots__ = ("source", "fields", "_parts")
+
+    def __init__(self, source: str, allowed: FrozenSet[str], name: str = "template"):
+        self.source = source
+        parts: List[Tuple[str, Optional[Tuple[str, Optional[str], str]]]] = []
+        fields = set()
+        try:
+            parsed = list(_formatter.parse(source))
+        except ValueError as e:
+            raise TemplateError(f"{name}: {e}") from None
+
+        for literal, field, format_spec, conversion in parsed:
+            if field is None:
+                parts.append((literal, None))
+                continue
+            if not field.isidentifier():
+                raise TemplateError(f"{name}: unsupported placeholder {{{field}}}")
+            if field not in allowed:
+                expected = ", ".join(f"{{{f}}}" for f in sorted(allowed)) or "none"
+                raise TemplateError(f"{name}: unknown placeholder {{{field}}} (allowed: {expected})")
+            if "{" in format_spec:
+                raise TemplateError(f"{name}: nested placeholders are not supported in {{{field}}}")
+            if format_spec:
+                try:
+                    format(0 if field in ("count", "rank") else "", format_spec)
+                except ValueError as e:
+                    raise TemplateError(f"{name}: bad format spec in {{{field}}}: {e}") from None
+            fields.add(field)
+            parts.append((literal, (field, conversion, format_spec)))
+
+        self.fields = frozenset(fields)
+        self._parts = tuple(parts)
+
+    def render(self, values: Mapping[str, object]) -> str:
+        out = []
+        for literal, field in self._parts:
+            if literal:
+                out.append(literal)
+            if field is None:
+                continue
+            name, conversion, format_spec = field
+            value = values[name]
+            if conversion:
+                value = _formatter.convert_field(value, conversion)
+            out.append(format(value, format_spec) if format_spec else str(value))
+        return "".join(out)
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate({self.source!r})"
+
+class StyleTemplates(NamedTuple):
+    """Every renderable template of one style"""
+    greetings: Tuple[CompiledTemplate, ...]
+    leave_messages: Tuple[CompiledTemplate, ...]
+    messages: Mapping[str, CompiledTemplate]
+
+    def random_greeting(self) -> CompiledTemplate:
+        return random.choice(self.greetings)
+
+    def random_leave_message(self) -> CompiledTemplate:
+        return random.choice(self.leave_messages)
+
+def _compile_list(sources: Iterable[str], fallback: str, name: str) -> Tuple[CompiledTemplate, ...]:
+    templates = tuple(CompiledTemplate(source, MEMBER_FIELDS, f"{name}[{i}]") for i, source in enumerate(sources))
+    return templates or (CompiledTemplate(fallback, MEMBER_FIELDS, name),)
+
+def compile_style(style_name: str, style: Mapping) -> StyleTemplates:
+    """Compile a style's greetings, leave messages and messages.
+
+    Raises TemplateError naming the first template that cannot be rendered.
+    """
+    greetings = _compile_list(style.get("greetings", []), style.get("default_greeting", "Welcome {user}!"),
+                              f"{style_name}.greetings")
+    leave_messages = _compile_list(style.get("leave_messages", []), "Goodbye {user}!",
+                                   f"{style_name}.leave_messages")
+
+    messages = {}
+    sources = dict(style.get("messages", {}))
+    for key, default in MESSAGE_DEFAULTS.items():
+        sources[key] = sources.get(key) or default
+    for key, source in sources.items():
+        messages[key] = CompiledTemplate(source, MESSAGE_FIELDS.get(key, PLAIN_FIELDS), f"{style_name}.messages.{key}")
+    return StyleTemplates(greetings, leave_messages, MappingProxyType(messages))
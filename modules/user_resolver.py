@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import discord
+
+from modules.dispatcher import ActionDispatcher, Priority
+
+logger = logging.getLogger("bot.users")
+
+class UserProfile(NamedTuple):
+    """Display data needed to render a user in embeds"""
+    id: int
+    name: str
+    mention: str
+    avatar_url: str
+
+def _profile(user) -> UserProfile:
+    return UserProfile(user.id, user.name, user.mention, user.display_avatar.url)
+
+class UserResolver:
+    """Resolve user IDs to profiles with as few REST calls as possible.
+
+    Lookups try the gateway cache (``guild.get_member``/``bot.get_user``)
+    first, then a TTL+LRU cache of profiles that also remembers users that
+    no longer exist. Remaining misses are fetched concurrently under a
+    semaphore, and concurrent lookups of the same ID share one request.
+    With a dispatcher, fetches run in its lowest-priority lookup lane.
+    """
+
+    def __init__(self, bot, ttl: float = 3600.0, negative_ttl: float = 600.0,
+                 max_size: int = 10000, concurrency: int = 4, dispatcher: Optional[ActionDispatcher] = None):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+
+        self._cache: "OrderedDict[int, Tuple[Optional[UserProfile], float]]" = OrderedDict()
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+        # Metrics
+        self.gateway_hits = 0
+        self.cache_hits = 0
+        self.negative_hits = 0
+        self.fetches = 0
+        self.fetch_failures = 0
+
+    def _lookup_local(self, guild, user_id: int) -> Tuple[bool, Optional[UserProfile]]:
+        user = (guild.get_member(user_id) if guild is not None else None) or self.bot.get_user(user_id)
+        if user is not None:
+            self.gateway_hits += 1
+            return True, _profile(user)
+
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            profile, expires_at = cached
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(user_id)
+                if profile is None:
+                    self.negative_hits += 1
+                else:
+                    self.cache_hits += 1
+                return True, profile
+            del self._cache[user_id]
+        return False, None
+
+    def _store(self, user_id: int, profile: Optional[UserProfile]):
+        ttl = self.ttl if profile is not None else self.negative_ttl
+        self._cache[user_id] = (profile, time.monotonic() + ttl)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, user_id: int) -> Optional[UserProfile]:
+        future = self._inflight.get(user_id)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        profile = None
+        try:
+            async with self._semaphore:
+                self.fetches += 1
+                if self.dispatcher is not None:
+                    user = await self.dispatcher.call(Priority.LOOKUP, "users", lambda: self.bot.fetch_user(user_id),
+                                                      "fetch_user")
+                else:
+                    user = await self.bot.fetch_user(user_id)
+            profile = _profile(user)
+            self._store(user_id, profile)
+        except discord.NotFound:
+            # Deleted account; remember it so it is not fetched again soon
+            self._store(user_id, None)
+        except Exception as e:
+            self.fetch_failures += 1
+            logger.error(f"❌ Error fetching user {user_id}: {e}")
+        finally:
+            del self._inflight[user_id]
+            future.set_result(profile)
+        return profile
+
+    async def resolve(self, guild, user_id: int) -> Optional[UserProfile]:
+        """Resolve one user ID; returns None for unknown or deleted users"""
+        found, profile = self._lookup_local(guild, user_id)
+        if found:
+            return profile
+        return await self._fetch(user_id)
+
+    async def resolve_many(self, guild, user_ids: Iterable[int]) -> Dict[int, Optional[UserProfile]]:
+        """Resolve several user IDs, fetching the misses concurrently"""
+        results: Dict[int, Optional[UserProfile]] = {}
+        misses = []
+        for user_id in user_ids:
+            found, profile = self._lookup_local(guild, user_id)
+            if found:
+                results[user_id] = profile
+            else:
+                misses.append(user_id)
+
+        if misses:
+            fetched = await asyncio.gather(*(self._fetch(user_id) for user_id in misses))
+            results.update(zip(misses, fetched))
+        return results
+
+    def metrics(self) -> Dict:
+        """Lookup counters and overall hit rate"""
+        hits = self.gateway_hits + self.cache_hits + self.negative_hits
+        total = hits + self.fetches
+        return {
+            "gateway_hits": self.gateway_hits,
+            "cache_hits": self.cache_hits,
+            "negative_hits": self.negative_hits,
+            "fetches": self.fetches,
+            "fetch_failures": self.fetch_failures,
+            "cached_profiles": len(self._cache),
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from modules.guild_state import GuildStateRegistry
+from modules.invite_store import InviteStore
+
+logger = logging.getLogger("bot.invites.store")
+
+def _write_batch(batch: List[Tuple[InviteStore, List[Dict], Optional[Dict]]]) -> List[int]:
+    """Write taken records for several stores; returns indexes that failed"""
+    failed = []
+    for index, (store, records, snapshot) in enumerate(batch):
+        try:
+            store.write_pending(records, snapshot)
+        except Exception as e:
+            logger.error(f"❌ Error writing invite data to {store.data_dir}: {e}")
+            failed.append(index)
+    return failed
+
+class WriteBehindFlusher:
+    """Background task that flushes coalesced invite changes off the event loop.
+
+    Handlers only mutate guild stores in memory. This task wakes up every
+    ``interval`` seconds, or early once a store has ``batch_size`` records
+    pending, and writes every dirty partition from a thread executor.
+    """
+
+    def __init__(self, registry: GuildStateRegistry, interval: float = 2.0, batch_size: int = 500):
+        self.registry = registry
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        # Metrics
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.records_written = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.registry.set_on_dirty(self.notify)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def notify(self, store: InviteStore):
+        """Wake the flusher early once enough changes are pending"""
+        if self._wake is not None and store.pending_count >= self.batch_size:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write all pending changes from a worker thread"""
+        async with self._flush_lock:
+            batch = [(store, *store.take_pending()) for store in self.registry.dirty_stores()]
+            due = self.registry.take_due()
+            if due is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.registry.write_due, due)
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            failed = await asyncio.get_running_loop().run_in_executor(None, _write_batch, batch)
+            for index in failed:
+                store, records, snapshot = batch[index]
+                store.requeue(records, snapshot)
+            if failed:
+                self.flush_errors += len(failed)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.records_written += sum(len(records) for i, (_, records, _) in enumerate(batch) if i not in failed)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+            # Clean partitions can now be paged out
+            self.registry.evict_idle()
+
+    async def stop(self):
+        """Cancel the background task and flush whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> Dict:
+        """Pending-write depth and flush latency statistics"""
+        return {
+            "pending_writes": self.registry.pending_count,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "records_written": self.records_written,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+        }